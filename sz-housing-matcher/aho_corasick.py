@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Aho-Corasick 多模式匹配
+一次扫描文本即可找出所有出现的关键词，耗时与文本长度和匹配数成正比，与关键词数量无关；
+用于地名索引（地址中的地标、已知地点）和公告标题分类
+"""
+
+import threading
+from collections import deque
+
+
+class AhoCorasick:
+    """
+    多模式子串匹配自动机：先 add 全部关键词，再 find_all / first
+    构建完成后查询是线程安全的（首次查询时的构建有锁保护）；add 不能与查询并发
+    """
+
+    def __init__(self):
+        self._goto = [{}]      # 状态 -> {字符: 下一状态}
+        self._fail = [0]
+        self._own = [[]]       # 状态 -> 在该状态结束的 [(关键词, 值)]
+        self._output = [[]]    # 状态 -> 包括沿失败链继承的 [(关键词, 值)]
+        self._built = True
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return sum(len(own) for own in self._own)
+
+    def add(self, pattern, value=None):
+        """添加关键词（空串忽略）；value 默认为关键词本身"""
+        if not pattern:
+            return
+        state = 0
+        for char in pattern:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._own.append([])
+            state = next_state
+        self._own[state].append((pattern, pattern if value is None else value))
+        self._built = False
+
+    def build(self):
+        """
+        按广度优先计算失败指针，并合并输出（首次查询时自动调用，多个线程共用时可提前调用）
+        在局部变量中完成后再一起替换，其他线程看到 _built 时失败指针和输出都已完整
+        """
+        with self._lock:
+            if self._built:
+                return
+            fail_links = [0] * len(self._goto)
+            output = [list(own) for own in self._own]
+            queue = deque(self._goto[0].values())
+            while queue:
+                state = queue.popleft()
+                for char, next_state in self._goto[state].items():
+                    queue.append(next_state)
+                    fail = fail_links[state]
+                    while fail and char not in self._goto[fail]:
+                        fail = fail_links[fail]
+                    fail_links[next_state] = self._goto[fail].get(char, 0)
+                    # 失败状态更浅，其输出已合并完毕
+                    output[next_state] = output[next_state] + output[fail_links[next_state]]
+            self._fail = fail_links
+            self._output = output
+            self._built = True
+
+    def find_all(self, text):
+        """返回文本中所有匹配 [(起始位置, 关键词, 值)]，按结束位置排序"""
+        if not self._built:
+            self.build()
+        matches = []
+        state = 0
+        for i, char in enumerate(text):
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+            for pattern, value in self._output[state]:
+                matches.append((i - len(pattern) + 1, pattern, value))
+        return matches
+
+    def first(self, text):
+        """第一个结束的匹配 (起始位置, 关键词, 值)，没有匹配返回 None"""
+        if not self._built:
+            self.build()
+        state = 0
+        for i, char in enumerate(text):
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+            if self._output[state]:
+                pattern, value = self._output[state][0]
+                return i - len(pattern) + 1, pattern, value
+        return None
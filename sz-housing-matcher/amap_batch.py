@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+高德批量地理编码
+一次报告中需要解析的地址先集中起来，按每组最多 10 个、以 "|" 分隔，
+用 batch=true 调用地理编码接口，再按顺序把结果对应回各个地址并写入地理编码缓存
+"""
+
+from amap_cache import get_geocode_cache, normalize_address
+from amap_client import get_amap_client
+from gazetteer import get_gazetteer
+from settings import load_settings
+
+# 高德地理编码接口 batch=true 时单次最多支持的地址数
+AMAP_BATCH_LIMIT = 10
+
+
+class BatchGeocoder:
+    """批量地理编码（本地地名索引命中或已缓存的地址不再请求）"""
+
+    def __init__(self, amap_key, client=None, cache=None, batch_size=None, gazetteer=None):
+        self.client = client or get_amap_client(amap_key)
+        self.cache = cache or get_geocode_cache()
+        self.gazetteer = gazetteer or get_gazetteer()
+        batch_size = batch_size or load_settings().get('amap', {}).get('geocode_batch_size', AMAP_BATCH_LIMIT)
+        self.batch_size = max(1, min(batch_size, AMAP_BATCH_LIMIT))
+        self.requests_sent = 0
+
+    @staticmethod
+    def _key(address):
+        # "|" 是批量分隔符，不能出现在地址中
+        return normalize_address(address.replace('|', ' '))
+
+    def _request(self, addresses):
+        """请求一组地址，返回与 addresses 等长的坐标列表（无法解析的为 None）"""
+        self.requests_sent += 1
+        return self.client.geocode_batch(addresses)
+
+    def geocode_many(self, addresses):
+        """
+        解析一批地址，返回 {地址: 坐标或 None}
+        规范化后相同的地址只请求一次；成功的结果写入缓存，之后的单个 geocode 直接命中
+        """
+        results = {}
+        pending = {}  # 规范化地址 -> 原始地址（按首次出现的顺序）
+        for address in addresses:
+            if not address or address in results:
+                continue
+            location = self.gazetteer.lookup(address) or self.cache.get(address)
+            if location is not None:
+                results[address] = location
+                continue
+            results[address] = None
+            pending.setdefault(self._key(address), address.replace('|', ' '))
+
+        queued = list(pending.values())
+        resolved = {}
+        for start in range(0, len(queued), self.batch_size):
+            group = queued[start:start + self.batch_size]
+            for address, location in zip(group, self._request(group)):
+                if location:
+                    self.cache.set(address, location)
+                    resolved[self._key(address)] = location
+
+        for address, location in results.items():
+            if location is None:
+                results[address] = resolved.get(self._key(address))
+        return results
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+高德地图结果缓存
+地理编码结果按规范化后的地址、路径规划结果按吸附到网格的坐标对，
+持久化到 ~/.sz-housing/amap_cache.db（带有效期），进程内再加一层 LRU；
+房源、公司和交通枢纽的位置基本不变，重复生成报告时不再请求高德接口
+"""
+
+import json
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+from settings import load_settings
+
+CONFIG_DIR = os.path.expanduser("~/.sz-housing")
+DEFAULT_DB_FILE = os.path.join(CONFIG_DIR, "amap_cache.db")
+
+# 每度纬度对应的米数（经度方向按纬度余弦缩放）
+METERS_PER_DEGREE = 111320
+
+WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_address(address):
+    """地址规范化：全角转半角（NFKC）、去除所有空白、英文小写"""
+    return WHITESPACE.sub('', unicodedata.normalize('NFKC', address or '')).lower()
+
+
+def snap_location(location, grid_meters):
+    """将 "经度,纬度" 吸附到边长约 grid_meters 米的网格中心"""
+    lng, lat = (float(v) for v in location.split(','))
+    lat_step = grid_meters / METERS_PER_DEGREE
+    snapped_lat = (math.floor(lat / lat_step) + 0.5) * lat_step
+    # 经度步长按网格中心的纬度计算，同一网格内的点得到相同的键
+    lng_step = lat_step / max(math.cos(math.radians(snapped_lat)), 0.01)
+    snapped_lng = (math.floor(lng / lng_step) + 0.5) * lng_step
+    return f"{snapped_lng:.6f},{snapped_lat:.6f}"
+
+
+class _TtlCache:
+    """磁盘（SQLite 表，带有效期）+ 进程内 LRU 的键值缓存，值以 JSON 保存"""
+
+    table = None
+
+    def __init__(self, db_file=DEFAULT_DB_FILE, ttl_days=90, memory_entries=1024):
+        self.db_file = db_file
+        self.ttl = ttl_days * 86400
+        self.memory_entries = memory_entries
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()  # 键 -> (值, 过期时间)
+        os.makedirs(os.path.dirname(db_file), exist_ok=True)
+        self._conn = sqlite3.connect(db_file, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(f"CREATE TABLE IF NOT EXISTS {self.table} "
+                               "(key TEXT PRIMARY KEY, value TEXT NOT NULL, cached_at REAL NOT NULL)")
+
+    def _remember(self, key, value, expires_at):
+        self._memory[key] = (value, expires_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if entry[1] > now:
+                    self._memory.move_to_end(key)
+                    return entry[0]
+                del self._memory[key]
+
+            row = self._conn.execute(f"SELECT value, cached_at FROM {self.table} WHERE key = ?",
+                                     (key,)).fetchone()
+            if row is None or row[1] + self.ttl <= now:
+                return None
+            value = json.loads(row[0])
+            self._remember(key, value, row[1] + self.ttl)
+            return value
+
+    def _set(self, key, value):
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(f"INSERT OR REPLACE INTO {self.table} (key, value, cached_at) VALUES (?, ?, ?)",
+                               (key, json.dumps(value, ensure_ascii=False), now))
+            self._remember(key, value, now + self.ttl)
+
+
+class GeocodeCache(_TtlCache):
+    """地理编码缓存，按规范化后的地址保存坐标"""
+
+    table = "geocode"
+
+    @classmethod
+    def from_settings(cls, settings):
+        """从 settings.amap_cache 配置段创建"""
+        cache_settings = settings.get('amap_cache', {})
+        return cls(ttl_days=cache_settings.get('geocode_ttl_days', 90),
+                   memory_entries=cache_settings.get('memory_entries', 1024))
+
+    def get(self, address):
+        """返回缓存的坐标 "经度,纬度"，未命中或已过期返回 None"""
+        return self._get(normalize_address(address))
+
+    def set(self, address, location):
+        """缓存地址的坐标"""
+        self._set(normalize_address(address), location)
+
+    def geocode(self, address, fetch):
+        """
+        命中缓存直接返回，否则调用 fetch(address) 请求高德接口
+        只缓存成功的结果（失败可能是临时的网络或限流问题）
+        """
+        location = self.get(address)
+        if location is None:
+            location = fetch(address)
+            if location:
+                self.set(address, location)
+        return location
+
+
+class RouteCache(_TtlCache):
+    """路径规划缓存，按吸附到网格的 (起点, 终点) 坐标对保存距离（米）和时间（秒）"""
+
+    table = "route"
+
+    def __init__(self, db_file=DEFAULT_DB_FILE, ttl_days=30, memory_entries=1024, grid_meters=100):
+        super().__init__(db_file, ttl_days, memory_entries)
+        self.grid_meters = grid_meters
+
+    @classmethod
+    def from_settings(cls, settings):
+        """从 settings.amap_cache 配置段创建"""
+        cache_settings = settings.get('amap_cache', {})
+        return cls(ttl_days=cache_settings.get('route_ttl_days', 30),
+                   memory_entries=cache_settings.get('memory_entries', 1024),
+                   grid_meters=cache_settings.get('route_grid_meters', 100))
+
+    def _key(self, origin, destination, mode):
+        # 驾车路线有方向性（单行道、出入口），起终点不互换
+        return f"{mode}:{snap_location(origin, self.grid_meters)};{snap_location(destination, self.grid_meters)}"
+
+    def get(self, origin, destination, mode="driving"):
+        """返回缓存的 (距离米, 时间秒)，未命中或已过期返回 None"""
+        value = self._get(self._key(origin, destination, mode))
+        return tuple(value) if value else None
+
+    def set(self, origin, destination, distance, duration, mode="driving"):
+        """缓存路线的距离（米）和时间（秒）"""
+        self._set(self._key(origin, destination, mode), [distance, duration])
+
+    def route(self, origin, destination, fetch, mode="driving"):
+        """
+        命中缓存直接返回 (距离米, 时间秒)，否则调用 fetch(origin, destination)
+        fetch 失败时返回 None，且不缓存
+        """
+        cached = self.get(origin, destination, mode)
+        if cached is not None:
+            return cached
+        result = fetch(origin, destination)
+        if result:
+            self.set(origin, destination, result[0], result[1], mode)
+        return result
+
+
+_shared_caches = {}
+_shared_lock = threading.Lock()
+
+
+def _shared(cache_class):
+    with _shared_lock:
+        if cache_class not in _shared_caches:
+            _shared_caches[cache_class] = cache_class.from_settings(load_settings())
+        return _shared_caches[cache_class]
+
+
+def get_geocode_cache():
+    """获取进程内共享的地理编码缓存"""
+    return _shared(GeocodeCache)
+
+
+def get_route_cache():
+    """获取进程内共享的路径规划缓存"""
+    return _shared(RouteCache)
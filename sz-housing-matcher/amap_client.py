@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+高德 Web 服务客户端
+所有高德接口调用共用一个带连接池的 requests.Session（keep-alive，避免每次请求重新 TLS 握手），
+连接错误由连接池按配置自动重试（请求未发出，不消耗配额）；429/5xx 在 get 中重试，
+每次请求（包括重试）都先经配额调度器（amap_governor）获取跨进程的 QPS / 每日配额名额，
+再经共享限速器发出，并按接口统计请求数
+"""
+
+import sqlite3
+import threading
+from collections import Counter
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from amap_governor import PRIORITY_COMMUTE, PRIORITY_NAMES, PRIORITY_POI, get_governor
+from rate_limiter import RETRYABLE_STATUS, get_rate_limiter
+from settings import DEFAULT_AMAP_BASE_URL, amap_url, load_settings
+
+# 高德返回的限流类错误码（单位时间访问过多 / 并发超限），暂停后重试
+AMAP_THROTTLE_INFOCODES = {'10004', '10019', '10020', '10021'}
+
+# 高德返回的当日配额用尽错误码，今天不再请求
+AMAP_EXHAUSTED_INFOCODES = {'10003', '10044'}
+
+# 被限流后最多重试的次数
+THROTTLE_RETRIES = 3
+
+
+class AmapClient:
+    """高德 Web 服务客户端（线程安全）"""
+
+    def __init__(self, amap_key, settings=None, rate_limiter=None, governor=None):
+        settings = load_settings() if settings is None else settings
+        amap_settings = settings.get('amap', {})
+        self.amap_key = amap_key
+        self.settings = settings
+        self.timeout = amap_settings.get('timeout', 10)
+        self.daily_quota = amap_settings.get('daily_quota', 5000)
+        self.retries = amap_settings.get('retries', 2)
+        self.rate_limiter = rate_limiter or get_rate_limiter()
+        self.governor = governor or get_governor()
+        # 限速按请求的站点生效：base_url 指向其他地址且没有单独配置时，沿用 restapi.amap.com 的配置
+        self.rate_limiter.share_host_settings(amap_url('', settings), DEFAULT_AMAP_BASE_URL)
+
+        # 连接池只重试连接错误；已发出的请求（读超时、429/5xx）由 get 重新获取名额后重试
+        retry = Retry(total=self.retries, connect=self.retries, read=0, status=0, other=0,
+                      backoff_factor=amap_settings.get('backoff_factor', 0.5),
+                      allowed_methods=frozenset(['GET']),
+                      raise_on_status=False)
+        pool_size = amap_settings.get('pool_size', 10)
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        self._lock = threading.Lock()
+        self.requests = Counter()  # 接口路径 -> 本进程请求数
+        self.errors = Counter()    # 接口路径 -> 本进程失败数
+        self.skipped = Counter()   # 优先级名称 -> 因配额不足跳过的请求数
+
+    def get(self, path, params, priority=PRIORITY_COMMUTE):
+        """
+        调用高德接口，返回响应 JSON（包括 status 为 '0' 的业务错误）
+        网络错误、HTTP 错误、响应不是 JSON 对象、多次被限流、该优先级的配额已用完或配额计数库被锁住时返回 None
+        429/5xx 最多重试 retries 次，退避（包括 Retry-After）由共享限速器完成，每次重试都计入配额
+        """
+        url = amap_url(path, self.settings)
+        throttled = status_retries = 0
+        while True:
+            try:
+                acquired = self.governor.acquire(path, priority)
+            except sqlite3.Error as e:
+                # 其他进程长时间占用配额计数库（database is locked）：只放弃这一次请求
+                self._count_error(path)
+                print(f"  ⚠️ 高德接口 {path} 未能获取配额名额: {e}")
+                return None
+            if not acquired:
+                self._count_skipped(priority)
+                return None
+            self.rate_limiter.acquire(url)
+            self._count(path)
+            try:
+                response = self.session.get(url, params=dict(params, key=self.amap_key), timeout=self.timeout)
+                if response.status_code in RETRYABLE_STATUS and status_retries < self.retries:
+                    status_retries += 1
+                    self.rate_limiter.record_failure(url, response)
+                    self._count_error(path)
+                    continue
+                response.raise_for_status()
+                data = response.json()
+            except (requests.RequestException, ValueError) as e:
+                self.rate_limiter.record_failure(url, getattr(e, 'response', None))
+                self._count_error(path)
+                # 异常信息中的 URL 带有 Key，只输出异常类型
+                print(f"  ⚠️ 高德接口 {path} 请求失败: {type(e).__name__}")
+                return None
+            if not isinstance(data, dict):
+                self._count_error(path)
+                print(f"  ⚠️ 高德接口 {path} 返回格式异常")
+                return None
+
+            infocode = data.get('infocode')
+            if infocode in AMAP_THROTTLE_INFOCODES:
+                # 所有进程一起暂停，再按优先级重新排队
+                self.rate_limiter.record_failure(url)
+                self.governor.record_throttled()
+                self._count_error(path)
+                throttled += 1
+                if throttled > THROTTLE_RETRIES:
+                    print(f"  ⚠️ 高德接口 {path} 多次被限流，已跳过")
+                    return None
+                continue
+            if infocode in AMAP_EXHAUSTED_INFOCODES:
+                self.governor.record_exhausted()
+                self._count_error(path)
+                print(f"  ⚠️ 高德今日配额已用尽: {data.get('info')}")
+                return None
+            self.rate_limiter.record_success(url)
+            return data
+
+    def geocode(self, address):
+        """地理编码，返回 "经度,纬度"，失败返回 None（其他请求都依赖坐标，按最高优先级）"""
+        data = self.get("/v3/geocode/geo", {"address": address}, PRIORITY_COMMUTE)
+        if data and data.get('status') == '1' and data.get('geocodes'):
+            return data['geocodes'][0]['location']
+        return None
+
+    def geocode_batch(self, addresses):
+        """批量地理编码（最多10个），返回与 addresses 等长的坐标列表，无法解析的为 None"""
+        data = self.get("/v3/geocode/geo", {"address": "|".join(addresses), "batch": "true"}, PRIORITY_COMMUTE)
+        geocodes = data.get('geocodes') if data and data.get('status') == '1' else None
+        # 批量模式下每个地址对应一条结果，无法解析的地址其 location 为空
+        if not geocodes or len(geocodes) != len(addresses):
+            return [None] * len(addresses)
+        return [g.get('location') if isinstance(g.get('location'), str) and g.get('location') else None
+                for g in geocodes]
+
+    def driving(self, origin, destination, priority=PRIORITY_COMMUTE):
+        """驾车路径规划，返回 (距离米, 时间秒)，失败返回 None；到交通枢纽的路线传 PRIORITY_HUB"""
+        data = self.get("/v3/direction/driving", {
+            "origin": origin,
+            "destination": destination,
+            "extensions": "base"
+        }, priority)
+        if data and data.get('status') == '1' and data.get('route', {}).get('paths'):
+            path = data['route']['paths'][0]
+            return float(path['distance']), float(path['duration'])
+        return None
+
+    def distance(self, origins, destination, priority=PRIORITY_COMMUTE):
+        """
+        驾车距离测量（最多100个起点、一个终点），返回与 origins 等长的 [(距离米, 时间秒) 或 None]
+        """
+        data = self.get("/v3/distance", {
+            "origins": "|".join(origins),
+            "destination": destination,
+            "type": "1"
+        }, priority)
+        results = [None] * len(origins)
+        if data and data.get('status') == '1':
+            for item in data.get('results') or []:
+                # origin_id 从 1 开始，对应 origins 中的顺序；无法计算的起点没有 distance
+                index = int(item.get('origin_id', 0)) - 1
+                if 0 <= index < len(origins) and item.get('distance') and item.get('duration'):
+                    results[index] = (float(item['distance']), float(item['duration']))
+        return results
+
+    def around(self, location, keywords, radius=1000):
+        """周边搜索，返回 POI 列表（失败时为空列表）"""
+        data = self.get("/v3/place/around", {
+            "location": location,
+            "keywords": keywords,
+            "radius": radius
+        }, PRIORITY_POI)
+        if data and data.get('status') == '1' and data.get('pois'):
+            return data['pois']
+        return []
+
+    def place_text(self, keywords, types, city, page=1, offset=25):
+        """关键字搜索（限定城市），返回 POI 列表（失败时为空列表）"""
+        data = self.get("/v3/place/text", {
+            "keywords": keywords,
+            "types": types,
+            "city": city,
+            "citylimit": "true",
+            "offset": offset,
+            "page": page,
+            "extensions": "base"
+        }, PRIORITY_POI)
+        if data and data.get('status') == '1' and data.get('pois'):
+            return data['pois']
+        return []
+
+    def _count(self, path):
+        with self._lock:
+            self.requests[path] += 1
+
+    def _count_error(self, path):
+        with self._lock:
+            self.errors[path] += 1
+
+    def _count_skipped(self, priority):
+        name = PRIORITY_NAMES.get(priority, str(priority))
+        with self._lock:
+            self.skipped[name] += 1
+            first = self.skipped[name] == 1
+        if first:
+            print(f"  ⚠️ 高德今日配额不足，跳过 {name} 类请求（相关结果显示为暂无数据）")
+
+    def daily_usage(self, day=None):
+        """某天（默认今天）各接口的请求数（所有进程合计）"""
+        return self.governor.daily_usage(day)
+
+    def stats(self):
+        """本进程各接口的请求数、失败数、跳过数，以及今天已用的配额"""
+        used = sum(self.daily_usage().values())
+        with self._lock:
+            return {
+                "requests": dict(self.requests),
+                "errors": dict(self.errors),
+                "skipped": dict(self.skipped),
+                "daily_used": used,
+                "daily_quota": self.daily_quota
+            }
+
+
+_shared_clients = {}
+_shared_lock = threading.Lock()
+
+
+def get_amap_client(amap_key):
+    """获取进程内共享的高德客户端（每个 Key 一个，复用连接池）"""
+    with _shared_lock:
+        if amap_key not in _shared_clients:
+            _shared_clients[amap_key] = AmapClient(amap_key)
+        return _shared_clients[amap_key]
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+高德配额调度
+同一个 Key 的每秒请求数（QPS）和每日配额由 ~/.sz-housing/amap_governor.db 跨进程计数，
+多个进程 / 多个用户共用一个 Key 时也不会超限。进程内等待的请求按优先级排队：
+公司通勤（以及所有请求依赖的地理编码）优先，其次交通枢纽，周边搜索最后；
+配额紧张时低优先级请求先停止（按 priority_budget_share 预留），报告降级而不是中途被限流
+"""
+
+import heapq
+import itertools
+import os
+import sqlite3
+import threading
+import time
+from datetime import date
+
+from settings import load_settings
+
+CONFIG_DIR = os.path.expanduser("~/.sz-housing")
+DEFAULT_DB_FILE = os.path.join(CONFIG_DIR, "amap_governor.db")
+
+PRIORITY_COMMUTE = 0  # 公司通勤路线、地理编码
+PRIORITY_HUB = 1      # 深圳北站、宝安机场等交通枢纽
+PRIORITY_POI = 2      # 周边设施搜索
+
+PRIORITY_NAMES = {PRIORITY_COMMUTE: "commute", PRIORITY_HUB: "hub", PRIORITY_POI: "poi"}
+
+# 各优先级可使用的每日配额比例（低优先级为高优先级预留余量）
+DEFAULT_BUDGET_SHARE = {"commute": 1.0, "hub": 0.9, "poi": 0.7}
+
+# QPS 超限后全部进程暂停的秒数
+THROTTLE_PAUSE_SECONDS = 1.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS qps (
+    second INTEGER PRIMARY KEY,
+    count INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS usage (
+    day TEXT NOT NULL,
+    endpoint TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (day, endpoint)
+);
+CREATE TABLE IF NOT EXISTS state (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+class AmapGovernor:
+    """跨进程的高德 QPS / 每日配额调度器（进程内按优先级排队）"""
+
+    def __init__(self, qps=3, daily_quota=5000, budget_share=None, db_file=DEFAULT_DB_FILE, lock_timeout=30):
+        self.qps = qps
+        self.daily_quota = daily_quota
+        self.budget_share = dict(DEFAULT_BUDGET_SHARE, **(budget_share or {}))
+        self.db_file = db_file
+        os.makedirs(os.path.dirname(db_file), exist_ok=True)
+        # isolation_level=None：手动 BEGIN IMMEDIATE，跨进程互斥地读写计数；
+        # 等待其他进程释放锁超过 lock_timeout 秒时抛出 sqlite3.OperationalError
+        self._conn = sqlite3.connect(db_file, timeout=lock_timeout, check_same_thread=False, isolation_level=None)
+        self._conn.executescript(SCHEMA)
+        self._cond = threading.Condition()
+        self._waiting = []  # (优先级, 序号) 小顶堆，堆顶的请求才能尝试获取名额
+        self._seq = itertools.count()
+
+    @classmethod
+    def from_settings(cls, settings):
+        """从 settings.amap 配置段创建"""
+        amap_settings = settings.get('amap', {})
+        return cls(qps=amap_settings.get('qps', 3),
+                   daily_quota=amap_settings.get('daily_quota', 5000),
+                   budget_share=amap_settings.get('priority_budget_share'))
+
+    def acquire(self, endpoint, priority=PRIORITY_COMMUTE):
+        """
+        等待直到可以发出一次请求并计入用量，返回 True
+        该优先级可用的每日配额已用完时立即返回 False（调用方应降级处理）
+        计数库被其他进程长时间锁住时抛出 sqlite3.Error
+        """
+        with self._cond:
+            entry = (priority, next(self._seq))
+            heapq.heappush(self._waiting, entry)
+            try:
+                while True:
+                    if self._waiting[0] != entry:
+                        self._cond.wait()
+                        continue
+                    wait = self._try_acquire(endpoint, priority)
+                    if wait is None:
+                        return False
+                    if wait <= 0:
+                        return True
+                    self._cond.wait(wait)
+            finally:
+                self._waiting.remove(entry)
+                heapq.heapify(self._waiting)
+                self._cond.notify_all()
+
+    def _try_acquire(self, endpoint, priority):
+        """在一个写事务中检查并占用名额；返回 0（成功）、需等待的秒数或 None（配额不足）"""
+        now = time.time()
+        second = int(now)
+        today = date.today().isoformat()
+        conn = self._conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            blocked_until = float(self._state('blocked_until') or 0)
+            if now < blocked_until:
+                return blocked_until - now
+
+            share = self.budget_share.get(PRIORITY_NAMES.get(priority, "poi"), 1.0)
+            if self._state('exhausted_day') == today or self._used(today) >= self.daily_quota * share:
+                return None
+
+            row = conn.execute("SELECT count FROM qps WHERE second = ?", (second,)).fetchone()
+            if row and row[0] >= self.qps:
+                return second + 1 - now
+
+            conn.execute("INSERT INTO qps (second, count) VALUES (?, 1) "
+                         "ON CONFLICT(second) DO UPDATE SET count = count + 1", (second,))
+            conn.execute("DELETE FROM qps WHERE second < ?", (second - 60,))
+            conn.execute("INSERT INTO usage (day, endpoint, count) VALUES (?, ?, 1) "
+                         "ON CONFLICT(day, endpoint) DO UPDATE SET count = count + 1", (today, endpoint))
+            return 0
+        finally:
+            conn.execute("COMMIT")
+
+    def _state(self, key):
+        row = self._conn.execute("SELECT value FROM state WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_state(self, key, value):
+        self._conn.execute("INSERT OR REPLACE INTO state (key, value) VALUES (?, ?)", (key, str(value)))
+
+    def _used(self, day):
+        return self._conn.execute("SELECT COALESCE(SUM(count), 0) FROM usage WHERE day = ?", (day,)).fetchone()[0]
+
+    def record_throttled(self, pause=THROTTLE_PAUSE_SECONDS):
+        """服务器返回 QPS 超限：所有进程暂停一小段时间（计数库被锁住时只能跳过）"""
+        with self._cond:
+            try:
+                self._set_state('blocked_until', time.time() + pause)
+            except sqlite3.Error:
+                pass
+            self._cond.notify_all()
+
+    def record_exhausted(self):
+        """服务器返回当日配额用尽：今天剩余时间不再发出请求（计数库被锁住时只能跳过）"""
+        with self._cond:
+            try:
+                self._set_state('exhausted_day', date.today().isoformat())
+            except sqlite3.Error:
+                pass
+
+    def daily_usage(self, day=None):
+        """某天（默认今天）各接口的请求数"""
+        day = (day or date.today()).isoformat()
+        with self._cond:
+            rows = self._conn.execute("SELECT endpoint, count FROM usage WHERE day = ?", (day,)).fetchall()
+        return dict(rows)
+
+
+_shared_governor = None
+_shared_lock = threading.Lock()
+
+
+def get_governor():
+    """获取进程内共享的配额调度器"""
+    global _shared_governor
+    with _shared_lock:
+        if _shared_governor is None:
+            _shared_governor = AmapGovernor.from_settings(load_settings())
+        return _shared_governor
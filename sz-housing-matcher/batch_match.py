@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+多画像批量匹配
+一次加载多个用户画像（家庭成员、为员工服务的人事部门等），政策只转换一次列式数组，
+并按 (区名, 房源类型) 建立倒排索引；每个画像只对其期望区域 × 住房类型的候选政策判断申请条件和计分，
+每个画像写出一份按分数排序的结果
+
+通勤分使用政策文件中已有的 transport_info（与画像无关），不为每个画像单独规划路线
+
+用法：
+  python batch_match.py 画像文件或目录 政策文件 [输出目录]
+  python batch_match.py demo [画像数] [政策数]   生成模拟数据，对比逐个画像全量匹配的耗时并校验结果一致
+
+画像文件：{"profiles": {"名称": user_profile, ...}}；
+画像目录：每个 *.json 为一个画像（user_profile，或包含 user_profile 的 config.json），文件名为名称。
+政策文件：政策列表，或 {"policies": [...]}。
+结果默认写入 ~/.sz-housing/batch_results/<名称>.json
+"""
+
+import json
+import os
+import random
+import sys
+import time
+from itertools import chain
+
+from batch_scorer import BatchScorer, PolicyColumns, random_policies
+from settings import load_settings
+
+CONFIG_DIR = os.path.expanduser("~/.sz-housing")
+DEFAULT_OUTPUT_DIR = os.path.join(CONFIG_DIR, "batch_results")
+
+# 面向全市的政策对所有期望区域都是候选
+CITYWIDE = '全市'
+
+
+class PolicyIndex:
+    """政策的列式数组和 (区名, 房源类型) -> [政策序号] 倒排索引，可供任意多个画像共用"""
+
+    def __init__(self, policies):
+        self.columns = PolicyColumns(policies)
+        self.postings = {}
+        for i, policy in enumerate(self.columns.policies):
+            key = (policy.get('district', ''), policy.get('housing_type', ''))
+            self.postings.setdefault(key, []).append(i)
+        self.districts = {district for district, _ in self.postings}
+        self.housing_types = {housing_type for _, housing_type in self.postings}
+
+    def __len__(self):
+        return len(self.columns)
+
+    def candidates(self, districts, housing_types):
+        """
+        期望区域（含全市）× 住房类型的候选政策序号（升序）
+        未填写期望区域或住房类型时不按该项筛选；房源类型未知的政策对所有住房类型都是候选
+        """
+        districts = set(districts) | {CITYWIDE} if districts else self.districts
+        housing_types = set(housing_types) | {''} if housing_types else self.housing_types
+        postings = [self.postings[(d, t)] for d in districts for t in housing_types if (d, t) in self.postings]
+        return sorted(chain.from_iterable(postings))
+
+    def match(self, user_profile, limit=None):
+        """单个画像：返回 (按分数降序的前 limit 个 [(政策, 分数)], 符合条件的政策数)"""
+        preferences = user_profile.get('preferences', {})
+        indexes = self.candidates(preferences.get('preferred_districts'), preferences.get('housing_types'))
+        ranked, total = BatchScorer(user_profile).rank(self.columns, indexes, limit)
+        policies = self.columns.policies
+        return [(policies[i], score) for i, score in ranked], total
+
+
+def match_profiles(profiles, policies, limit=None):
+    """批量匹配：返回 {画像名称: ([(政策, 分数)], 符合条件的政策数)}，每个画像最多 limit 条"""
+    index = policies if isinstance(policies, PolicyIndex) else PolicyIndex(policies)
+    return {name: index.match(profile, limit) for name, profile in profiles.items()}
+
+
+def _read_json(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def check_profile_name(name):
+    """画像名称用作结果文件名，不能为空或包含路径分隔符（不允许写到输出目录之外）"""
+    if not name or name in ('.', '..') or any(sep and sep in name for sep in ('/', '\\', os.sep, os.altsep)):
+        raise ValueError(f"画像名称不能用作文件名：{name!r}")
+    return name
+
+
+def load_profiles(path):
+    """从画像文件或目录加载 {名称: user_profile}；画像文件中的名称不能包含路径分隔符"""
+    if os.path.isdir(path):
+        profiles = {}
+        for filename in sorted(os.listdir(path)):
+            if filename.endswith('.json'):
+                data = _read_json(os.path.join(path, filename))
+                profiles[filename[:-len('.json')]] = data.get('user_profile', data)
+        return profiles
+    return {check_profile_name(name): data.get('user_profile', data)
+            for name, data in _read_json(path).get('profiles', {}).items()}
+
+
+def load_policies(path):
+    data = _read_json(path)
+    return data.get('policies', []) if isinstance(data, dict) else data
+
+
+def write_results(results, output_dir=DEFAULT_OUTPUT_DIR):
+    """每个画像写出一份按分数降序的结果"""
+    os.makedirs(output_dir, exist_ok=True)
+    for name, (ranked, total) in results.items():
+        check_profile_name(name)
+        entries = [dict(policy, match_score=score) for policy, score in ranked]
+        tmp_file = os.path.join(output_dir, f"{name}.json.tmp")
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump({"profile": name, "total": total, "results": entries}, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_file, os.path.join(output_dir, f"{name}.json"))
+
+
+def _random_profiles(count, seed=0):
+    """生成模拟画像"""
+    rng = random.Random(seed)
+    districts = ['福田区', '南山区', '罗湖区', '宝安区', '龙岗区', '龙华区', '光明区', '坪山区']
+    housing_types = ['安居房', '人才房', '公租房', '保障性租赁住房']
+    profiles = {}
+    for i in range(count):
+        profiles[f"画像{i}"] = {
+            "basic_info": {"hukou": rng.choice(['深圳户籍', '非深户']), "age": rng.randint(22, 50),
+                           "social_insurance_years": rng.randint(0, 12), "education": rng.choice(['本科', '大专', '硕士']),
+                           "family_type": rng.choice(['单身', '已婚'])},
+            "assets": {"annual_income": rng.choice([100000, 300000, 600000]), "has_shenzhen_property": False},
+            "preferences": {"preferred_districts": rng.sample(districts, rng.randint(1, 3)),
+                            "housing_types": rng.sample(housing_types, rng.randint(1, 2))}
+        }
+    return profiles
+
+
+def demo(profile_count, policy_count, limit=10):
+    profiles = _random_profiles(profile_count)
+    policies = random_policies(policy_count)
+
+    start = time.perf_counter()
+    index = PolicyIndex(policies)
+    build_time = time.perf_counter() - start
+    start = time.perf_counter()
+    results = match_profiles(profiles, index, limit)
+    match_time = time.perf_counter() - start
+
+    # 对照：每个画像对全部政策匹配后再按期望区域和住房类型筛选
+    start = time.perf_counter()
+    consistent = True
+    for name, profile in list(profiles.items())[:20]:
+        preferences = profile['preferences']
+        districts = set(preferences['preferred_districts']) | {CITYWIDE}
+        housing_types = set(preferences['housing_types'])
+        expected = [(p['title'], p['match_score']) for p in BatchScorer(profile).match(policies)
+                    if p['district'] in districts and p['housing_type'] in housing_types]
+        ranked, total = results[name]
+        consistent = consistent and total == len(expected) and expected[:limit] == [(p['title'], s) for p, s in ranked]
+    loop_time = (time.perf_counter() - start) / min(20, len(profiles)) * len(profiles)
+
+    print(f"画像数: {profile_count}，政策数: {policy_count}（{'NumPy' if index.columns.use_numpy else '标准库 array'}）")
+    print(f"建立索引          : {build_time * 1000:8.1f} ms")
+    print(f"批量匹配全部画像  : {match_time * 1000:8.1f} ms（每个画像取前 {limit} 名）")
+    print(f"逐个画像全量匹配  : {loop_time * 1000:8.1f} ms（按前 20 个画像估算）")
+    print(f"结果一致: {'是' if consistent else '否'}")
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "demo":
+        demo(int(sys.argv[2]) if len(sys.argv) > 2 else 500, int(sys.argv[3]) if len(sys.argv) > 3 else 10000)
+        return
+    if len(sys.argv) not in (3, 4):
+        print("用法：python batch_match.py 画像文件或目录 政策文件 [输出目录] | demo [画像数] [政策数]")
+        sys.exit(1)
+
+    try:
+        profiles = load_profiles(sys.argv[1])
+    except ValueError as e:
+        print(f"错误：{e}")
+        sys.exit(1)
+    policies = load_policies(sys.argv[2])
+    output_dir = sys.argv[3] if len(sys.argv) > 3 else DEFAULT_OUTPUT_DIR
+
+    start = time.perf_counter()
+    results = match_profiles(profiles, policies, load_settings().get('max_results'))
+    elapsed = time.perf_counter() - start
+    write_results(results, output_dir)
+
+    print(f"已匹配 {len(profiles)} 个画像 × {len(policies)} 条政策，耗时 {elapsed * 1000:.0f} 毫秒")
+    for name, (ranked, total) in results.items():
+        best = f"，最高分：{ranked[0][0].get('project_name', ranked[0][0].get('title'))}（{ranked[0][1]:.0f}分）" if ranked else ""
+        print(f"  • {name}：{total} 条符合条件{best}")
+    print(f"结果已写入 {output_dir}")
+
+
+if __name__ == "__main__":
+    main()
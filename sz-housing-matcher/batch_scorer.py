@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+"""
+批量匹配评分
+把候选政策转换为列式数组（PolicyColumns，可对多个用户画像重复使用），
+按列一次性计算申请条件（户籍、社保、年龄、收入，由 eligibility 编译，每种条件组合只判断一次）和各项评分（区域、通勤、发布时间、房源数量）；
+安装了 NumPy 时使用 NumPy 向量运算，否则使用标准库 array 逐列计算。
+结果与 HousingMatcher._check_requirements / _calculate_score 逐条计算完全一致
+
+用法：python batch_scorer.py [政策数量]   生成模拟政策，对比逐条计算与批量计算的耗时和结果
+"""
+
+import heapq
+import random
+import sys
+import time
+from array import array
+from datetime import date, datetime, timedelta
+
+from eligibility import compile_requirements, normalize_profile, requirements_key
+
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
+# 通勤分的上限（20分钟以内）
+MAX_COMMUTE_POINTS = 25
+
+
+def commute_points(policy):
+    """通勤分：只取决于政策自身的 transport_info，转换时预先计算"""
+    if 'transport_info' not in policy:
+        return 0
+    commute_time = policy['transport_info'].get('to_company', {}).get('duration_min', 999)
+    return 25 if commute_time <= 20 else 20 if commute_time <= 40 else 15 if commute_time <= 60 else 10
+
+
+def unit_points(units):
+    return 15 if units >= 500 else 12 if units >= 200 else 10 if units >= 100 else 8
+
+
+def recency_points(days_ago):
+    return 20 if days_ago <= 7 else 15 if days_ago <= 30 else 10 if days_ago <= 90 else 5
+
+
+class PolicyColumns:
+    """
+    政策的列式表示
+    区名、发布日期、申请条件组合的取值很少，各自编码为整数列，按画像计算时只需对少量取值求值再查表；
+    通勤分和房源数量分与画像无关，转换时合并为 base_points 列
+    """
+
+    def __init__(self, policies, use_numpy=HAS_NUMPY):
+        self.policies = list(policies)
+        self.use_numpy = use_numpy and HAS_NUMPY
+
+        self.districts = []         # 区名编码 -> 区名
+        self.publish_ordinals = []  # 日期编码 -> 发布日期序数
+        self.requirements = []      # 条件编码 -> 编译后的申请条件（CompiledRequirements）
+        district_codes = array('l')
+        date_codes = array('l')
+        requirement_codes = array('l')
+        base_points = array('d')
+        districts, dates, requirements = {}, {}, {}
+
+        for policy in self.policies:
+            reqs = policy.get('requirements', {})
+            key = requirements_key(reqs)
+            code = requirements.get(key) if key is not None else None
+            if code is None:
+                code = len(self.requirements)
+                if key is not None:
+                    requirements[key] = code
+                self.requirements.append(compile_requirements(reqs))
+            requirement_codes.append(code)
+
+            district = policy['district']
+            code = districts.get(district)
+            if code is None:
+                code = districts[district] = len(self.districts)
+                self.districts.append(district)
+            district_codes.append(code)
+
+            published = policy['publish_date']
+            code = dates.get(published)
+            if code is None:
+                code = dates[published] = len(self.publish_ordinals)
+                self.publish_ordinals.append(datetime.strptime(published, '%Y-%m-%d').toordinal())
+            date_codes.append(code)
+
+            base_points.append(commute_points(policy) + unit_points(policy.get('total_units', 0)))
+
+        if self.use_numpy:
+            self.district_codes = np.asarray(district_codes, dtype=np.intp)
+            self.date_codes = np.asarray(date_codes, dtype=np.intp)
+            self.requirement_codes = np.asarray(requirement_codes, dtype=np.intp)
+            self.base_points = np.asarray(base_points)
+        else:
+            self.district_codes = district_codes
+            self.date_codes = date_codes
+            self.requirement_codes = requirement_codes
+            self.base_points = base_points
+
+    def __len__(self):
+        return len(self.policies)
+
+
+class BatchScorer:
+    """按用户画像批量判断申请条件并计算匹配分数"""
+
+    def __init__(self, user_profile, today=None):
+        self.applicant = normalize_profile(user_profile)
+        self.preferred_districts = user_profile.get('preferences', {}).get('preferred_districts', [])
+        # 与 (datetime.now() - 发布日期零点).days 相同
+        self.today_ord = (today or date.today()).toordinal()
+
+    def district_points(self, district):
+        if district in self.preferred_districts:
+            return 40 - self.preferred_districts.index(district) * 5
+        return 0
+
+    def eligible(self, columns):
+        """符合申请条件的掩码"""
+        table = [requirement.check(self.applicant) for requirement in columns.requirements]
+        if columns.use_numpy:
+            return np.asarray(table, dtype=bool)[columns.requirement_codes]
+        return [table[code] for code in columns.requirement_codes]
+
+    def scores(self, columns):
+        """全部政策的匹配分数"""
+        district_table = [float(self.district_points(d)) for d in columns.districts]
+        recency_table = [float(recency_points(self.today_ord - o)) for o in columns.publish_ordinals]
+        if columns.use_numpy:
+            if not len(columns):
+                return np.zeros(0)
+            return (np.asarray(district_table)[columns.district_codes]
+                    + np.asarray(recency_table)[columns.date_codes] + columns.base_points)
+        return array('d', [district_table[d] + recency_table[p] + b for d, p, b in
+                           zip(columns.district_codes, columns.date_codes, columns.base_points)])
+
+    def match(self, policies):
+        """
+        与 HousingMatcher.match_policies 相同：返回符合条件的政策（写入 match_score），按分数降序
+        policies 可以是政策列表或已转换的 PolicyColumns
+        """
+        columns = policies if isinstance(policies, PolicyColumns) else PolicyColumns(policies)
+        mask = self.eligible(columns)
+        scores = self.scores(columns)
+        if columns.use_numpy:
+            indexes = np.flatnonzero(mask)
+            # 稳定排序：分数相同的政策保持原有顺序，与 list.sort(reverse=True) 一致
+            indexes = indexes[np.argsort(-scores[indexes], kind='stable')].tolist()
+            scores = scores.tolist()
+        else:
+            indexes = sorted((i for i, ok in enumerate(mask) if ok), key=scores.__getitem__, reverse=True)
+
+        matched = []
+        for i in indexes:
+            policy = columns.policies[i]
+            policy['match_score'] = scores[i]
+            matched.append(policy)
+        return matched
+
+    def rank(self, columns, indexes, limit=None):
+        """
+        只对 indexes（升序的政策序号）判断申请条件并计分，不写入政策；
+        返回 (按分数降序的前 limit 个 [(序号, 分数)], 符合条件的政策数)。
+        供多个画像共用同一份 PolicyColumns（batch_match.py），同分时的顺序与 match 一致
+        """
+        ok_table = [requirement.check(self.applicant) for requirement in columns.requirements]
+        district_table = [float(self.district_points(d)) for d in columns.districts]
+        recency_table = [float(recency_points(self.today_ord - o)) for o in columns.publish_ordinals]
+        if columns.use_numpy:
+            indexes = np.asarray(indexes, dtype=np.intp)
+            if not len(indexes):
+                return [], 0
+            indexes = indexes[np.asarray(ok_table, dtype=bool)[columns.requirement_codes[indexes]]]
+            scores = (np.asarray(district_table)[columns.district_codes[indexes]]
+                      + np.asarray(recency_table)[columns.date_codes[indexes]] + columns.base_points[indexes])
+            order = np.argsort(-scores, kind='stable')[:limit]
+            return list(zip(indexes[order].tolist(), scores[order].tolist())), len(indexes)
+
+        district_codes, date_codes = columns.district_codes, columns.date_codes
+        requirement_codes, base_points = columns.requirement_codes, columns.base_points
+        ranked = [(i, district_table[district_codes[i]] + recency_table[date_codes[i]] + base_points[i])
+                  for i in indexes if ok_table[requirement_codes[i]]]
+        ranked.sort(key=lambda x: x[1], reverse=True)
+        return ranked[:limit], len(ranked)
+
+    def top_k(self, policies, k, attach=None):
+        """
+        分支定界取前 k 名，返回 (前 k 名, 符合条件的政策数)
+        先按不需要外部数据的分项（区域、发布时间、房源数量）计分，尚无 transport_info 的政策通勤分按上限估计；
+        候选按上限从高到低处理，当前前 k 名保存在最小堆中，上限已无法进入前 k 名时停止，
+        只有仍可能进入的候选才调用 attach(policy) 写入 transport_info 后计入实际通勤分。
+        attach 对每个政策的结果确定时，结果与先为全部政策写入交通信息再 match(policies)[:k] 一致
+        """
+        columns = policies if isinstance(policies, PolicyColumns) else PolicyColumns(policies)
+        mask = self.eligible(columns)
+        scores = self.scores(columns)
+        if columns.use_numpy:
+            mask, scores = mask.tolist(), scores.tolist()
+
+        # (-上限, 序号)：上限高的先处理，同分时序号小的在前，与 match 的稳定排序一致
+        candidates = []
+        for i, ok in enumerate(mask):
+            if ok:
+                exact = 'transport_info' in columns.policies[i] or attach is None
+                candidates.append((-(scores[i] + (0 if exact else MAX_COMMUTE_POINTS)), i))
+        heapq.heapify(candidates)
+        eligible_count = len(candidates)
+
+        top = []  # 最小堆 (分数, -序号)
+        while candidates and k > 0:
+            bound, i = heapq.heappop(candidates)
+            if len(top) == k and (-bound, -i) <= top[0]:
+                break  # 剩余候选的上限都不高于此，不可能再进入前 k 名
+            policy = columns.policies[i]
+            score = scores[i]
+            if 'transport_info' not in policy and attach is not None:
+                attach(policy)
+                score += commute_points(policy)
+            if len(top) < k:
+                heapq.heappush(top, (score, -i))
+            elif (score, -i) > top[0]:
+                heapq.heapreplace(top, (score, -i))
+
+        matched = []
+        for score, i in sorted(top, reverse=True):
+            policy = columns.policies[-i]
+            policy['match_score'] = score
+            matched.append(policy)
+        return matched, eligible_count
+
+
+def random_policies(count, seed=0):
+    """生成模拟政策（覆盖各评分分档和申请条件）"""
+    rng = random.Random(seed)
+    districts = ['福田区', '南山区', '罗湖区', '宝安区', '龙岗区', '龙华区', '光明区', '坪山区', '全市']
+    today = date.today()
+    policies = []
+    for i in range(count):
+        policy = {
+            "title": f"模拟政策{i}",
+            "district": rng.choice(districts),
+            "housing_type": rng.choice(['安居房', '人才房', '公租房', '保障性租赁住房']),
+            "publish_date": (today - timedelta(days=rng.randint(-3, 400))).isoformat(),
+            "total_units": rng.choice([0, 50, 100, 150, 200, 350, 500, 1200]),
+            "requirements": {
+                "hukou": rng.choice(['深圳户籍', '不限', '', None]),
+                "social_insurance": rng.choice([0, 1, 3, 5, 10, None]),
+                "age_min": rng.choice([0, 18, 35, None]),
+                "income_max": rng.choice([0, 150000, 400000, 1000000, None])
+            }
+        }
+        transport = rng.random()
+        if transport < 0.6:
+            policy['transport_info'] = {"to_company": {"duration_min": rng.randint(5, 90)}}
+        elif transport < 0.7:
+            policy['transport_info'] = {"to_company": {"error": "无法计算路线"}}
+        policies.append(policy)
+    return policies
+
+
+def main():
+    from sz_housing_matcher import HousingMatcher
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    profile = {
+        "basic_info": {"hukou": "非深户", "age": 30, "social_insurance_years": 4},
+        "assets": {"annual_income": 300000},
+        "preferences": {"preferred_districts": ["南山区", "福田区", "龙华区"]}
+    }
+    # 借用 HousingMatcher 的逐条计算方法作为对照（不加载配置文件）
+    matcher = HousingMatcher.__new__(HousingMatcher)
+    matcher.config = {"user_profile": profile}
+    matcher._applicant = None
+
+    policies = random_policies(count)
+    start = time.perf_counter()
+    expected = [(p['title'], matcher._calculate_score(p)) for p in policies if matcher._check_requirements(p)]
+    expected.sort(key=lambda x: x[1], reverse=True)
+    loop_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    columns = PolicyColumns(policies)
+    build_time = time.perf_counter() - start
+    scorer = BatchScorer(profile)
+    start = time.perf_counter()
+    matched = scorer.match(columns)
+    batch_time = time.perf_counter() - start
+    result = [(p['title'], p['match_score']) for p in matched]
+
+    print(f"政策数: {count}，符合条件: {len(matched)}（{'NumPy' if columns.use_numpy else '标准库 array'}）")
+    print(f"逐条计算      : {loop_time * 1000:8.1f} ms")
+    print(f"转换为列式数组: {build_time * 1000:8.1f} ms（可对多个用户画像复用）")
+    print(f"批量计算      : {batch_time * 1000:8.1f} ms")
+    print(f"结果一致: {'是' if result == expected else '否'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+列表页解析性能对比：bs4（html.parser）vs lxml（预编译 XPath）
+使用本地生成的列表页，不访问网络；同时校验两种引擎的解析结果一致
+
+用法：python benchmark_parser.py [页数]
+"""
+
+import contextlib
+import io
+import sys
+import time
+
+from link_extractor import HAS_LXML, Bs4Engine, LxmlEngine
+from robust_fetcher import HousingDataFetcher
+
+# 覆盖 link_extractor.SELECTORS 中各种列表结构以及关键词兜底
+LAYOUTS = [
+    '<ul class="list">{items}</ul>',
+    '<div class="notice-list">{items}</div>',
+    '<div class="article-list"><ul>{items}</ul></div>',
+    '<ul class="list-txt">{items}</ul>',
+    '<div class="txt-list"><ul>{items}</ul></div>',
+    '<table>{rows}</table>',
+]
+
+TITLES = ['关于安居型商品房配售的通告', '人才住房配租公告', '公共租赁住房申请须知', '2025年度部门预算公开', '住房保障工作会议通知']
+
+
+def build_page(layout, items=40, nav_links=60):
+    """生成一个接近真实规模的政府网站列表页"""
+    nav = ''.join(f'<li><a href="/col/{i}/">栏目{i}</a></li>' for i in range(nav_links))
+    lis, rows = [], []
+    for i in range(items):
+        title = TITLES[i % len(TITLES)]
+        href = f'./content/post_{1200000 + i}.html'
+        lis.append(f'<li><a href="{href}" target="_blank"><em>{title}</em>（第{i}期）</a>'
+                   f'<span class="date">2025-0{i % 9 + 1}-1{i % 10}</span></li>')
+        rows.append(f'<tr><td><a href="/zfbz/{i}.html">{title}</a></td><td><div class="time">2025年3月{i % 28 + 1}日</div></td></tr>')
+    body = layout.format(items=''.join(lis), rows=''.join(rows))
+    return (f'<html><head><meta charset="utf-8"><title>通知公告</title></head><body>'
+            f'<div class="header"><ul class="nav">{nav}</ul></div>'
+            f'<div class="main">{body}</div>'
+            f'<div class="footer"><p>主办单位：深圳市住房和建设局</p></div></body></html>')
+
+
+def strip_volatile(notices):
+    return [{k: v for k, v in n.items() if k != 'fetched_at'} for n in notices]
+
+
+def run(fetcher, engine, pages, limit=None):
+    fetcher.parser = engine
+    start = time.perf_counter()
+    results = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for html in pages:
+            results.append(strip_volatile(fetcher.parse_notice_list(html, "https://zjj.sz.gov.cn", limit=limit)))
+    return time.perf_counter() - start, results
+
+
+def main():
+    if not HAS_LXML:
+        print("未安装 lxml，无法对比（pip install lxml）")
+        sys.exit(1)
+
+    page_count = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    pages = [build_page(LAYOUTS[i % len(LAYOUTS)]) for i in range(page_count)]
+    fetcher = HousingDataFetcher()
+
+    bs4_time, bs4_results = run(fetcher, Bs4Engine(), pages)
+    lxml_time, lxml_results = run(fetcher, LxmlEngine(), pages)
+
+    print(f"页面数: {page_count}（每页约 {len(pages[0]) // 1024} KB）")
+    print(f"bs4  (html.parser): {page_count / bs4_time:8.1f} 页/秒")
+    print(f"lxml (XPath)      : {page_count / lxml_time:8.1f} 页/秒")
+    print(f"加速比: {bs4_time / lxml_time:.1f}x")
+    print(f"结果一致: {'是' if bs4_results == lxml_results else '否'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+抓取状态持久化
+按数据源记录增量抓取的高水位（最新 post_<id>、最新日期、上次抓取时间等）
+"""
+
+import json
+import os
+import re
+import threading
+
+DEFAULT_STATE_FILE = os.path.join(os.path.expanduser("~/.sz-housing"), "crawl_state.json")
+
+POST_ID_PATTERN = re.compile(r'post_(\d+)')
+
+
+def extract_post_id(url):
+    """从公告链接中提取 post_<id> 编号，没有则返回 None"""
+    match = POST_ID_PATTERN.search(url)
+    return int(match.group(1)) if match else None
+
+
+class CrawlState:
+    """各数据源的抓取状态"""
+
+    def __init__(self, state_file=DEFAULT_STATE_FILE):
+        self.state_file = state_file
+        self._lock = threading.Lock()
+        self._state = self._load()
+
+    def _load(self):
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def get(self, source_key):
+        """获取数据源状态（返回副本）"""
+        with self._lock:
+            return dict(self._state.get(source_key, {}))
+
+    def update(self, source_key, **fields):
+        """更新数据源状态并立即保存"""
+        with self._lock:
+            self._state.setdefault(source_key, {}).update(fields)
+            self._save()
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.state_file), exist_ok=True)
+        tmp_file = self.state_file + ".tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(self._state, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_file, self.state_file)
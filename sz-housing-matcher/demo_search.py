@@ -4,16 +4,24 @@
 """
 
 import json
-import requests
 import os
 from datetime import datetime
 
+from amap_batch import BatchGeocoder
+from amap_cache import get_geocode_cache, get_route_cache
+from amap_client import get_amap_client
+from amap_governor import PRIORITY_COMMUTE, PRIORITY_HUB
+from gazetteer import get_gazetteer
+from transport_executor import analyze_projects
+
 # 加载配置
 config_file = os.path.expanduser("~/.sz-housing/config.json")
 with open(config_file, 'r', encoding='utf-8') as f:
     config = json.load(f)
 
 amap_key = config['api_keys']['amap']
+geocode_cache = get_geocode_cache()
+route_cache = get_route_cache()
 company = config['user_profile']['transportation']['company_address']
 
 # 模拟真实房源数据（基于搜索结果）
@@ -81,49 +89,24 @@ policies = [
     }
 ]
 
-def calculate_transport(origin, destination, amap_key):
-    """计算交通信息"""
-    geocode_url = "https://restapi.amap.com/v3/geocode/geo"
-    driving_url = "https://restapi.amap.com/v3/direction/driving"
-
-    try:
-        # 获取起点坐标
-        origin_resp = requests.get(geocode_url, params={"key": amap_key, "address": origin})
-        origin_coord = json.loads(origin_resp.text)
-        if not origin_coord.get('geocodes'):
-            return {"error": "无法解析起点地址"}
-        origin_location = origin_coord['geocodes'][0]['location']
-
-        # 获取终点坐标
-        dest_resp = requests.get(geocode_url, params={"key": amap_key, "address": destination})
-        dest_coord = json.loads(dest_resp.text)
-        if not dest_coord.get('geocodes'):
-            return {"error": "无法解析终点地址"}
-        dest_location = dest_coord['geocodes'][0]['location']
-
-        # 路径规划
-        route_resp = requests.get(driving_url, params={
-            "key": amap_key,
-            "origin": origin_location,
-            "destination": dest_location,
-            "extensions": "base"
-        })
-
-        route_data = json.loads(route_resp.text)
-
-        if route_data.get('status') == '1' and route_data.get('route'):
-            route = route_data['route']['paths'][0]
-            return {
-                "distance_km": round(int(route['distance']) / 1000, 1),
-                "duration_min": round(int(route['duration']) / 60),
-                "distance": int(route['distance']),
-                "duration": int(route['duration'])
-            }
-        else:
-            return {"error": "无法计算路线"}
-
-    except Exception as e:
-        return {"error": str(e)}
+def geocode(address, amap_key):
+    """地理编码（先查本地地名索引和缓存），失败返回 None"""
+    return get_gazetteer().lookup(address) or geocode_cache.geocode(address, get_amap_client(amap_key).geocode)
+
+def driving_route(origin_location, dest_location, amap_key, priority=PRIORITY_COMMUTE):
+    """驾车路径规划（优先使用本地缓存），返回 (距离米, 时间秒)，失败返回 None"""
+    client = get_amap_client(amap_key)
+    return route_cache.route(origin_location, dest_location, lambda o, d: client.driving(o, d, priority))
+
+def transport_info(route):
+    """(距离米, 时间秒) 转换为展示用的交通信息"""
+    distance, duration = (int(v) for v in route)
+    return {
+        "distance_km": round(distance / 1000, 1),
+        "duration_min": round(duration / 60),
+        "distance": distance,
+        "duration": duration
+    }
 
 def get_commute_score(duration_min):
     """根据通勤时间返回评分"""
@@ -144,6 +127,23 @@ print(f"找到 {len(policies)} 个匹配房源\n")
 medals = ['🥇', '🥈', '🥉']
 labels = ['[强烈推荐]', '[推荐]', '[备选]']
 
+# 先批量解析全部地址（每次请求最多10个），之后逐个计算路线时直接命中缓存
+BatchGeocoder(amap_key, cache=geocode_cache).geocode_many(
+    [company, "深圳北站", "深圳宝安国际机场"] + [p['location'] for p in policies if p.get('location')])
+
+# 并行计算所有房源的交通信息（路线方向为地标 -> 房源）
+def landmark_route(housing_location, landmark_location, landmark):
+    priority = PRIORITY_COMMUTE if landmark == "company" else PRIORITY_HUB
+    route = driving_route(landmark_location, housing_location, amap_key, priority)
+    return transport_info(route) if route else None
+
+locations = [p['location'] for p in policies if p.get('location')]
+analyses = analyze_projects([(location, None) for location in locations],
+                            {"company": company, "north": "深圳北站", "airport": "深圳宝安国际机场"},
+                            lambda address: geocode(address, amap_key), landmark_route)
+transport = dict(zip(locations, analyses))
+route_error = {"error": "无法计算路线"}
+
 # 计算每个房源的交通信息并排序
 for i, policy in enumerate(policies):
     print(f"{medals[i]} {labels[i]} {policy['project_name']} - {policy['district']}区")
@@ -166,7 +166,8 @@ for i, policy in enumerate(policies):
         print(f"\n🚗 交通便利性分析")
 
         # 到公司
-        to_company = calculate_transport(company, location, amap_key)
+        routes = transport[location]['routes']
+        to_company = routes['company'] or route_error
         if 'error' not in to_company:
             print(f"┌─────────────────────────────────────┐")
             print(f"│  🏢 到公司（坂田天安云谷）")
@@ -176,7 +177,7 @@ for i, policy in enumerate(policies):
             print(f"└─────────────────────────────────────┘")
 
         # 到深圳北
-        to_north = calculate_transport("深圳北站", location, amap_key)
+        to_north = routes['north'] or route_error
         if 'error' not in to_north:
             print(f"┌─────────────────────────────────────┐")
             print(f"│  🚄 到深圳北站")
@@ -186,7 +187,7 @@ for i, policy in enumerate(policies):
             print(f"└─────────────────────────────────────┘")
 
         # 到宝安机场
-        to_airport = calculate_transport("深圳宝安国际机场", location, amap_key)
+        to_airport = routes['airport'] or route_error
         if 'error' not in to_airport:
             print(f"┌─────────────────────────────────────┐")
             print(f"│  ✈️  到宝安机场")
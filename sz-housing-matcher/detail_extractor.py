@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+公告详情页结构化提取
+从配售/配租通告正文中提取项目名称、位置、房源套数、户型、申请时间和申请队列，
+并以有限的并发批量处理新公告；已提取过的公告不会再次请求
+"""
+
+import re
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from bs4 import BeautifulSoup
+
+from link_extractor import HAS_LXML, LxmlEngine
+from notice_store import NoticeStore
+from settings import load_settings
+
+HOUSING_TYPE_PATTERN = r'(?:安居型商品房|安居房|人才住房|人才房|公共租赁住房|公租房|保障性租赁住房)'
+PROJECT_IN_TITLE = re.compile(r'([一-龥A-Za-z0-9·]{2,20}?)(?:项目)?' + HOUSING_TYPE_PATTERN)
+TITLE_PREFIX = re.compile(r'^.*?(?:关于|市级|区级|\d{4}年)')
+PROJECT_LABEL = re.compile(r'项目名称[：:]\s*([^\s，,。；;]{2,30})')
+LOCATION = re.compile(r'(?:项目地址|项目位置|房源位置|房源坐落|坐落于|位于)[：:]?\s*([^\s，,。；;（(]{4,40})')
+BATCH = re.compile(r'住保[售租]〔\d{4}〕\d+号')
+TOTAL_UNITS = re.compile(r'(?:共|合计|总计|房源)\s*(\d+)\s*套')
+LAYOUT = re.compile(r'(单间|一房|两房|二房|三房|四房)[^，,。；;\d]{0,12}?(\d+(?:\.\d+)?)\s*(?:㎡|平方米)[^，,。；;\d]{0,8}?(\d+)\s*套')
+APPLY_WINDOW = re.compile(
+    r'(\d{4})年(\d{1,2})月(\d{1,2})日[^至到\d]{0,12}(?:\d{1,2}[:：时]\d{0,2}分?)?\s*(?:至|到|—|－|-)\s*'
+    r'(?:(\d{4})年)?(\d{1,2})月(\d{1,2})日\s*(?:(\d{1,2})[:：时](\d{2})?)?'
+)
+QUEUE = re.compile(r'(第[一二三四五]队列)[为是：:，,\s]*([^。；;\n]{2,40})')
+
+# 只在这些关键词附近寻找申请时间，避免误取公示期、选房期
+APPLY_CONTEXT = ('申请', '认购', '受理', '报名')
+
+
+def page_text(html):
+    """提取正文纯文本（逐行）"""
+    if HAS_LXML:
+        doc = LxmlEngine().load(html)
+        for element in doc.xpath('//script|//style'):
+            element.drop_tree()
+        return '\n'.join(line.strip() for line in doc.text_content().splitlines() if line.strip())
+    return BeautifulSoup(html, 'html.parser').get_text('\n', strip=True)
+
+
+def _date(year, month, day):
+    return f"{year}-{int(month):02d}-{int(day):02d}"
+
+
+def _application_window(text):
+    for match in APPLY_WINDOW.finditer(text):
+        context = text[max(0, match.start() - 30):match.start()]
+        if not any(kw in context for kw in APPLY_CONTEXT):
+            continue
+        start_year, start_month, start_day, end_year, end_month, end_day, hour, minute = match.groups()
+        end = _date(end_year or start_year, end_month, end_day)
+        if hour:
+            end += f" {int(hour):02d}:{minute or '00'}"
+        return _date(start_year, start_month, start_day), end
+    return None, None
+
+
+def extract_notice_detail(html, title=""):
+    """从详情页提取结构化字段，未识别的字段不出现在结果中"""
+    text = page_text(html)
+    detail = {}
+
+    match = PROJECT_LABEL.search(text) or PROJECT_IN_TITLE.search(TITLE_PREFIX.sub('', title))
+    if match:
+        detail['project_name'] = match.group(1)
+
+    match = LOCATION.search(text)
+    if match:
+        detail['location'] = match.group(1)
+
+    match = BATCH.search(text) or BATCH.search(title)
+    if match:
+        detail['batch'] = match.group(0)
+
+    layouts = [{"type": kind.replace('二房', '两房'), "area": f"{area}㎡", "count": int(count)}
+               for kind, area, count in LAYOUT.findall(text)]
+    if layouts:
+        detail['layouts'] = layouts
+
+    match = TOTAL_UNITS.search(text)
+    if match:
+        detail['total_units'] = int(match.group(1))
+    elif layouts:
+        detail['total_units'] = sum(layout['count'] for layout in layouts)
+
+    start, end = _application_window(text)
+    if start:
+        detail['application_start'] = start
+        detail['application_end'] = end
+
+    queues = {}
+    for name, desc in QUEUE.findall(text):
+        queues.setdefault(name, desc.strip())
+    if queues:
+        detail['queues'] = queues
+
+    return detail
+
+
+class DetailPipeline:
+    """新公告详情批量提取"""
+
+    def __init__(self, fetcher, max_workers=None):
+        self.fetcher = fetcher
+        crawler_settings = load_settings().get('crawler', {})
+        self.max_workers = max_workers or crawler_settings.get('detail_workers', 4)
+
+    def _extract(self, notice):
+        """返回 (详情, 页面是否不存在)，获取失败时详情为 None"""
+        # 详情页发布后基本不变，且提取后不会再请求，不必进入条件请求缓存
+        html, _, gone = self.fetcher.fetch_page_status(notice['url'], use_cache=False)
+        if not html:
+            return None, gone
+        return extract_notice_detail(html, notice.get('title', '')), False
+
+    def run(self, notices):
+        """
+        为尚未提取过详情的公告抓取详情页并写入 notice['detail']
+        抓取失败的公告写入 detail_failed_at（页面不存在时另写 detail_gone），由公告库记录失败次数；
+        返回本次提取成功的数量
+        """
+        pending = [n for n in notices if 'detail' not in n]
+        if not pending:
+            return 0
+
+        print(f"\n📄 提取 {len(pending)} 条新公告的详情...")
+        extracted = 0
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for notice, (detail, gone) in zip(pending, executor.map(self._extract, pending)):
+                if detail is None:
+                    notice['detail_failed_at'] = datetime.now().isoformat()
+                    notice['detail_gone'] = gone
+                    continue
+                notice['detail'] = detail
+                notice['detail_extracted_at'] = datetime.now().isoformat()
+                extracted += 1
+
+        gone = sum(1 for n in pending if n.get('detail_gone'))
+        print(f"   成功提取 {extracted} 条，失败 {len(pending) - extracted} 条（其中 {gone} 条页面不存在，不再重试）")
+        return extracted
+
+
+def load_projects(start=None, store=None, days=None):
+    """
+    读取已提取详情且识别出项目名称的公告（新公告在前）
+    可按起始日期过滤，或只取最近 days 天（与 NoticeStore.recent 相同，含今天）
+    """
+    store = store or NoticeStore()
+    if days is not None:
+        notices = store.recent(days)
+    else:
+        notices = store.query(start=start) if start else store.with_detail()
+    return [n for n in notices if n.get('detail', {}).get('project_name')]
@@ -7,8 +7,11 @@ import json
 import os
 from datetime import datetime
 
-# 项目详情
-key_projects = [
+from detail_extractor import load_projects
+from eligibility import compile_requirements, normalize_profile
+
+# 人工整理的项目详情（尚无自动提取的公告详情时使用）
+fallback_projects = [
     {
         "name": "缙熙园安居房",
         "batch": "住保售〔2026〕005号",
@@ -60,37 +63,46 @@ user_conditions = {
     "资产": "年收入60万，有车，无房"
 }
 
-def check_eligibility(project, user):
-    """检查用户是否符合条件"""
-    requirements = project.get("requirements", {})
-
-    # 检查户籍
-    if requirements.get("户籍") == "深圳户籍":
-        if user["户籍"] != "深圳户籍":
-            return False, "户籍不符合"
-
-    # 检查社保
-    社保要求 = requirements.get("社保", "")
-    if "本科" in 社保要求:
-        if user["学历"] in ["本科", "硕士", "博士"] and "5年" in user["社保"]:
-            pass  # 符合
-        elif user["学历"] in ["本科", "硕士", "博士"] and int(user["社保"].split("年")[0]) >= 3:
-            pass  # 符合
-        else:
-            return False, "社保年限不符合"
-
-    # 检查年龄
-    if requirements.get("age"):
-        age_min = int(requirements["age"].replace("单身需年满", "").replace("周岁", ""))
-        if user["家庭"] == "单身" and user["年龄"] < age_min:
-            return False, "年龄不符合（单身需35岁以上）"
-
-    # 检查房产
-    if requirements.get("房产") == "无房且5年内未转让过住房":
-        if "无房" not in user["资产"]:
-            return False, "已有住房"
-
-    return True, "符合条件"
+def application_status(start, end):
+    """根据申请时间判断申请状态"""
+    today = datetime.now().strftime('%Y-%m-%d')
+    if not start:
+        return "详见公告"
+    if today < start:
+        return "即将开始"
+    if today <= end.split(' ')[0]:
+        return "正在申请中"
+    return "已截止"
+
+def project_from_notice(notice):
+    """将抓取时提取的公告详情转换为报告使用的项目信息"""
+    detail = notice['detail']
+    project = {
+        "name": detail['project_name'],
+        "batch": detail.get('batch', '详见公告'),
+        "url": notice['url'],
+        "application_status": application_status(detail.get('application_start'), detail.get('application_end'))
+    }
+    if 'location' in detail:
+        project['location'] = detail['location']
+    if 'layouts' in detail:
+        project['total_units'] = detail.get('total_units', sum(l['count'] for l in detail['layouts']))
+        project['layouts'] = detail['layouts']
+        project['price'] = "待定（详见公告）"
+    if 'application_start' in detail:
+        project['application_period'] = f"{detail['application_start']} 至 {detail['application_end']}"
+    if 'queues' in detail:
+        project['queues'] = detail['queues']
+    return project
+
+def load_key_projects(days=7):
+    """最近N天已提取详情的公告；没有时使用人工整理的项目"""
+    projects = [project_from_notice(n) for n in load_projects(days=days)]
+    return projects or fallback_projects
+
+def check_eligibility(project, applicant):
+    """检查用户是否符合条件，返回 (是否符合, 原因)；applicant 为 normalize_profile 的结果或中文条件"""
+    return compile_requirements(project.get("requirements", {})).explain(normalize_profile(applicant))
 
 def generate_report():
     """生成详细报告"""
@@ -109,6 +121,9 @@ def generate_report():
     print("⭐ 重点推荐房源详情")
     print("=" * 100)
 
+    key_projects = load_key_projects()
+    applicant = normalize_profile(user_conditions)
+
     for i, project in enumerate(key_projects, 1):
         print(f"\n\n{'🔥' if project['application_status'] == '正在申请中' else '📌'} 推荐 {i}: {project['name']}")
         print("=" * 100)
@@ -149,7 +164,7 @@ def generate_report():
 
         # 用户匹配情况
         if 'requirements' in project:
-            eligible, reason = check_eligibility(project, user_conditions)
+            eligible, reason = check_eligibility(project, applicant)
             print(f"\n✅ 你的匹配情况：{reason}")
 
             if eligible:
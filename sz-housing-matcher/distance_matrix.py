@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+高德距离矩阵
+/v3/distance 一次请求支持多个起点、一个终点：把所有房源坐标集中起来，
+每个地标（公司、深圳北站、宝安机场）只需 ceil(房源数 / 100) 次请求即可得到全部驾车距离和时间；
+结果写入路线缓存（mode 为 "distance"，与逐条路径规划的结果分开保存）
+"""
+
+from amap_cache import get_route_cache
+from amap_client import get_amap_client
+from amap_governor import PRIORITY_COMMUTE
+from settings import load_settings
+
+# 高德距离测量接口单次最多支持的起点数
+AMAP_DISTANCE_LIMIT = 100
+
+CACHE_MODE = "distance"
+
+
+class DistanceMatrix:
+    """多起点、单终点的批量驾车距离（已缓存的起点不再请求）"""
+
+    def __init__(self, amap_key, client=None, cache=None, batch_size=None):
+        self.client = client or get_amap_client(amap_key)
+        self.cache = cache or get_route_cache()
+        batch_size = batch_size or load_settings().get('amap', {}).get('distance_batch_size', AMAP_DISTANCE_LIMIT)
+        self.batch_size = max(1, min(batch_size, AMAP_DISTANCE_LIMIT))
+        self.requests_sent = 0
+
+    def to_destination(self, origins, destination, priority=PRIORITY_COMMUTE):
+        """
+        计算每个起点到 destination 的驾车距离和时间，返回 {起点坐标: (距离米, 时间秒) 或 None}
+        相同的起点只请求一次；成功的结果写入路线缓存
+        """
+        results = {}
+        pending = []
+        for origin in origins:
+            if not origin or origin in results:
+                continue
+            results[origin] = self.cache.get(origin, destination, CACHE_MODE)
+            if results[origin] is None:
+                pending.append(origin)
+
+        for start in range(0, len(pending), self.batch_size):
+            group = pending[start:start + self.batch_size]
+            self.requests_sent += 1
+            for origin, result in zip(group, self.client.distance(group, destination, priority)):
+                if result:
+                    self.cache.set(origin, destination, result[0], result[1], CACHE_MODE)
+                    results[origin] = result
+        return results
@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+申请条件规则引擎
+政策的申请条件（英文键，如 hukou / social_insurance / age_min / income_max；
+或公告详情中的中文键，如 户籍 / 社保 / 年龄 / 房产）只编译一次为规则对象，相同的条件共用编译结果；
+用户信息（配置文件中的 user_profile，或报告脚本中的中文条件）也只规范化一次为 Applicant。
+判断时依次调用各条规则，供匹配器、每周报告和详情报告共用
+"""
+
+import re
+from abc import ABC, abstractmethod
+from functools import lru_cache
+
+SZ_HUKOU = '深圳户籍'
+DEGREES = ('本科', '硕士', '博士', '研究生')
+
+NUMBER = re.compile(r'\d+(?:\.\d+)?')
+
+# 安居房的一般申请条件（公告未提供结构化条件时使用）
+ANJUFANG_REQUIREMENTS = {
+    "户籍": "深圳户籍",
+    "社保": "本科及以上学历3年，其他5年",
+    "年龄": "单身需年满35周岁",
+    "房产": "无房且5年内未转让过住房"
+}
+
+
+def _leading_number(text, default=0):
+    """文本中的第一个数字，如 "5年（2019年8月至今）" -> 5"""
+    match = NUMBER.search(str(text or ''))
+    if not match:
+        return default
+    value = float(match.group())
+    return int(value) if value.is_integer() else value
+
+
+class Applicant:
+    """规范化后的申请人信息"""
+
+    __slots__ = ('hukou', 'is_sz_hukou', 'age', 'social_insurance_years', 'education', 'has_degree',
+                 'family_type', 'is_single', 'has_property', 'annual_income')
+
+    def __init__(self, hukou='', age=0, social_insurance_years=0, education='', family_type='',
+                 has_property=False, annual_income=0):
+        self.hukou = hukou or ''
+        self.is_sz_hukou = self.hukou == SZ_HUKOU
+        self.age = age or 0
+        self.social_insurance_years = social_insurance_years or 0
+        self.education = education or ''
+        self.has_degree = any(degree in self.education for degree in DEGREES)
+        self.family_type = family_type or ''
+        self.is_single = '单身' in self.family_type
+        self.has_property = bool(has_property)
+        self.annual_income = annual_income or 0
+
+    @classmethod
+    def from_profile(cls, user_profile):
+        """配置文件中的 user_profile"""
+        basic = user_profile.get('basic_info', {})
+        assets = user_profile.get('assets', {})
+        return cls(hukou=basic.get('hukou'),
+                   age=basic.get('age'),
+                   social_insurance_years=basic.get('social_insurance_years'),
+                   education=basic.get('education'),
+                   family_type=basic.get('family_type'),
+                   has_property=assets.get('has_shenzhen_property'),
+                   annual_income=assets.get('annual_income'))
+
+    @classmethod
+    def from_conditions(cls, conditions):
+        """报告脚本中的中文条件，如 {"年龄": "31岁", "社保": "5年（...）", "资产": "年收入60万，有车，无房"}"""
+        assets = conditions.get('资产', '')
+        income = re.search(r'年收入\s*(\d+(?:\.\d+)?)\s*万', assets)
+        return cls(hukou=conditions.get('户籍'),
+                   age=_leading_number(conditions.get('年龄')),
+                   social_insurance_years=_leading_number(conditions.get('社保')),
+                   education=conditions.get('学历'),
+                   family_type=conditions.get('家庭'),
+                   has_property='无房' not in assets,
+                   annual_income=float(income.group(1)) * 10000 if income else 0)
+
+
+def normalize_profile(user):
+    """user_profile、中文条件或已规范化的 Applicant 统一转换为 Applicant"""
+    if isinstance(user, Applicant):
+        return user
+    if 'basic_info' in user:
+        return Applicant.from_profile(user)
+    return Applicant.from_conditions(user)
+
+
+class Rule(ABC):
+    """一条申请条件：item 为条件名称，reason 为不符合时的简短原因"""
+
+    item = ""
+    reason = ""
+
+    @abstractmethod
+    def __call__(self, applicant):
+        """申请人是否满足该条件"""
+
+    @abstractmethod
+    def status(self, applicant, ok):
+        """条件清单中的一行，如 "✓ 深圳户籍" """
+
+
+class HukouRule(Rule):
+    item = "户籍"
+    reason = "户籍不符合"
+
+    def __call__(self, applicant):
+        return applicant.is_sz_hukou
+
+    def status(self, applicant, ok):
+        return "✓ 深圳户籍" if ok else "✗ 非深户"
+
+
+class SocialInsuranceRule(Rule):
+    """社保年限；degree_years 为本科及以上学历的年限要求（没有单独要求时为 None）"""
+
+    item = "社保"
+    reason = "社保年限不符合"
+
+    def __init__(self, years, degree_years=None):
+        self.years = years
+        self.degree_years = degree_years
+
+    def required_years(self, applicant):
+        if self.degree_years is not None and applicant.has_degree:
+            return min(self.degree_years, self.years)
+        return self.years
+
+    def __call__(self, applicant):
+        return applicant.social_insurance_years >= self.required_years(applicant)
+
+    def status(self, applicant, ok):
+        years = applicant.social_insurance_years
+        if not ok:
+            return f"✗ 社保仅{years}年"
+        if years < self.years:
+            return f"✓ 社保{years}年（{applicant.education}学历）"
+        return f"✓ 社保{years}年"
+
+
+class AgeRule(Rule):
+    """最低年龄；single_only 为 True 时只限制单身申请人"""
+
+    item = "年龄"
+
+    def __init__(self, min_age, single_only=False):
+        self.min_age = min_age
+        self.single_only = single_only
+        self.reason = f"年龄不符合（单身需{min_age}岁以上）" if single_only else f"年龄不符合（需年满{min_age}岁）"
+
+    def __call__(self, applicant):
+        if self.single_only and not applicant.is_single:
+            return True
+        return applicant.age >= self.min_age
+
+    def status(self, applicant, ok):
+        if ok:
+            return f"✓ 年龄{applicant.age}岁符合要求"
+        if self.single_only:
+            return f"✗ 单身需{self.min_age}岁以上（当前{applicant.age}岁）"
+        return f"✗ 需年满{self.min_age}岁（当前{applicant.age}岁）"
+
+
+class PropertyRule(Rule):
+    item = "房产"
+    reason = "已有住房"
+
+    def __call__(self, applicant):
+        return not applicant.has_property
+
+    def status(self, applicant, ok):
+        return "✓ 无深圳房产" if ok else "✗ 已有房产"
+
+
+class IncomeRule(Rule):
+    item = "收入"
+    reason = "收入超出上限"
+
+    def __init__(self, max_income):
+        self.max_income = max_income
+
+    def __call__(self, applicant):
+        return applicant.annual_income <= self.max_income
+
+    def status(self, applicant, ok):
+        return f"✓ 年收入未超过{self.max_income}元" if ok else f"✗ 年收入超过{self.max_income}元上限"
+
+
+class CompiledRequirements:
+    """编译后的申请条件：依次判断各条规则"""
+
+    __slots__ = ('rules',)
+
+    def __init__(self, rules):
+        self.rules = tuple(rules)
+
+    def check(self, applicant):
+        """是否符合全部条件"""
+        for rule in self.rules:
+            if not rule(applicant):
+                return False
+        return True
+
+    def explain(self, applicant):
+        """返回 (是否符合, 原因)，原因为第一条不符合的条件"""
+        for rule in self.rules:
+            if not rule(applicant):
+                return False, rule.reason
+        return True, "符合条件"
+
+    def checklist(self, applicant):
+        """逐条列出 [(条件名称, 状态)]"""
+        result = []
+        for rule in self.rules:
+            result.append((rule.item, rule.status(applicant, rule(applicant))))
+        return result
+
+
+def _compile_structured(requirements, rules):
+    """英文键：hukou / social_insurance / age_min / income_max（值为空或 0 表示不限）"""
+    hukou = requirements.get('hukou')
+    if hukou and '深圳' in hukou:
+        rules.append(HukouRule())
+    if requirements.get('social_insurance'):
+        rules.append(SocialInsuranceRule(requirements['social_insurance']))
+    if requirements.get('age_min'):
+        rules.append(AgeRule(requirements['age_min']))
+    if requirements.get('income_max'):
+        rules.append(IncomeRule(requirements['income_max']))
+
+
+def _compile_text(requirements, rules):
+    """中文键：公告中的文字描述，如 "本科及以上学历3年，其他5年" """
+    hukou = requirements.get('户籍')
+    if hukou and '深圳' in hukou:
+        rules.append(HukouRule())
+
+    social_insurance = requirements.get('社保')
+    if social_insurance:
+        years = [_leading_number(y) for y in re.findall(r'\d+(?:\.\d+)?\s*年', social_insurance)]
+        if any(degree in social_insurance for degree in DEGREES) and len(years) >= 2:
+            rules.append(SocialInsuranceRule(years[1], degree_years=years[0]))
+        elif years:
+            rules.append(SocialInsuranceRule(years[0]))
+
+    if '无房' in (requirements.get('房产') or ''):
+        rules.append(PropertyRule())
+
+    age = requirements.get('年龄')
+    if age and _leading_number(age):
+        rules.append(AgeRule(_leading_number(age), single_only='单身' in age))
+
+
+def _compile(requirements):
+    rules = []
+    _compile_structured(requirements, rules)
+    _compile_text(requirements, rules)
+    return CompiledRequirements(rules)
+
+
+@lru_cache(maxsize=4096)
+def _compile_cached(key):
+    return _compile(dict(key))
+
+
+def requirements_key(requirements):
+    """申请条件的规范化键（相同条件的政策共用编译结果），值不可哈希时返回 None"""
+    key = tuple(sorted((requirements or {}).items()))
+    try:
+        hash(key)
+    except TypeError:
+        return None
+    return key
+
+
+def compile_requirements(requirements):
+    """编译申请条件（缓存编译结果）"""
+    key = requirements_key(requirements)
+    if key is None:
+        return _compile(requirements)
+    return _compile_cached(key)
@@ -9,6 +9,10 @@ from datetime import datetime, timedelta
 import json
 import re
 
+from http_cache import HttpCache
+from notice_classifier import classify, is_relevant
+from rate_limiter import get_rate_limiter
+
 # 官方网站列表
 official_sources = [
     {
@@ -28,27 +32,38 @@ official_sources = [
     }
 ]
 
+http_cache = HttpCache()
+rate_limiter = get_rate_limiter()
+
 def fetch_page(url):
     """获取网页内容"""
+    html, _ = fetch_page_conditional(url)
+    return html
+
+def fetch_page_conditional(url, max_retries=3):
+    """获取网页内容（条件请求，按站点限速），返回 (html, 是否有变化)"""
     headers = {
         'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
     }
-    try:
-        response = requests.get(url, headers=headers, timeout=10)
-        response.encoding = 'utf-8'
-        return response.text
-    except Exception as e:
-        print(f"获取 {url} 失败: {e}")
-        return None
+    for attempt in range(max_retries):
+        rate_limiter.acquire(url)
+        try:
+            result = http_cache.fetch(requests, url, timeout=10, headers=headers)
+            rate_limiter.record_success(url)
+            return result
+        except Exception as e:
+            print(f"获取 {url} 失败: {e}")
+            response = getattr(e, 'response', None)
+            if not rate_limiter.is_retryable(response):
+                break
+            rate_limiter.record_failure(url, response)
+    return None, False
 
 def parse_housing_notices(html, source_name):
     """解析保障房公告"""
     notices = []
     soup = BeautifulSoup(html, 'html.parser')
 
-    # 查找包含安居房、人才房、公租房等关键词的链接
-    keywords = ['安居房', '人才房', '公租房', '保障房', '配售', '配租', '住房']
-
     # 尝试不同的链接选择器
     link_selectors = [
         'a[href*="/xxgk/tzgg/"]',
@@ -71,8 +86,9 @@ def parse_housing_notices(html, source_name):
             title = link.get_text(strip=True)
             href = link.get('href', '')
 
-            # 过滤相关公告
-            if any(keyword in title for keyword in keywords):
+            # 过滤相关公告（安居房、人才房、公租房、配售、配租等）
+            tags = classify(title)
+            if is_relevant(tags):
                 # 构建完整URL
                 if href.startswith('/'):
                     full_url = f"https://zjj.sz.gov.cn{href}"
@@ -92,7 +108,8 @@ def parse_housing_notices(html, source_name):
                     "title": title,
                     "url": full_url,
                     "date": date_str,
-                    "source": source_name
+                    "source": source_name,
+                    "tags": tags
                 })
         except Exception as e:
             continue
@@ -109,9 +126,12 @@ def get_recent_notices(days=30):
         print(f"搜索 {source['name']}...")
 
         # 获取公告列表页
-        html = fetch_page(source['notice_page'])
+        html, changed = fetch_page_conditional(source['notice_page'])
         if html:
-            notices = parse_housing_notices(html, source['name'])
+            notices = None if changed else http_cache.get_parsed(source['notice_page'], 'fetch_real_notices')
+            if notices is None:
+                notices = parse_housing_notices(html, source['name'])
+                http_cache.set_parsed(source['notice_page'], 'fetch_real_notices', notices)
             all_notices.extend(notices)
             print(f"  找到 {len(notices)} 条相关公告")
 
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+本地地名索引
+把 urls.json 中的重要地标、已核实坐标的地点和用户添加的地点（~/.sz-housing/gazetteer.json）
+建成 Aho-Corasick 自动机，地址只需扫描一遍即可找到其中包含的已知地名；
+地理编码先查这里，命中时不请求高德接口
+
+用法：
+  python gazetteer.py add 名称 经度,纬度   添加或更新地点
+  python gazetteer.py remove 名称         删除用户添加的地点
+  python gazetteer.py lookup 地址          查看地址命中的地点
+  python gazetteer.py list                列出全部地点
+"""
+
+import json
+import os
+import re
+import sys
+import threading
+
+from aho_corasick import AhoCorasick
+from amap_cache import normalize_address
+
+CONFIG_DIR = os.path.expanduser("~/.sz-housing")
+USER_PLACES_FILE = os.path.join(CONFIG_DIR, "gazetteer.json")
+URLS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "urls.json")
+
+# 已核实坐标的地点（高德对这些地址的解析结果偏差较大）
+VERIFIED_PLACES = {
+    "龙华区大浪街道": "114.0366,22.6546",
+    "龙华区大浪": "114.0366,22.6546",
+    "龙华大浪": "114.0366,22.6546",
+}
+
+# 同名地点的来源优先级（数字小的优先）
+SOURCE_RANK = {"user": 0, "verified": 1, "landmark": 2}
+
+LOCATION_PATTERN = re.compile(r'^\d{2,3}(\.\d+)?,\d{1,2}(\.\d+)?$')
+
+
+class Gazetteer:
+    """地名 -> 坐标索引；地址中包含多个地名时取最长（最具体）的"""
+
+    def __init__(self):
+        self.places = {}  # 规范化地名 -> (原始地名, 坐标, 来源)
+        self._automaton = AhoCorasick()
+
+    def __len__(self):
+        return len(self.places)
+
+    def add(self, name, location, source="user"):
+        """添加地点；同名地点保留来源优先级高的"""
+        key = normalize_address(name)
+        if not key or not LOCATION_PATTERN.match(location or ''):
+            return False
+        existing = self.places.get(key)
+        if existing and SOURCE_RANK[existing[2]] < SOURCE_RANK[source]:
+            return False
+        if existing is None:
+            self._automaton.add(key)
+        self.places[key] = (name, location, source)
+        return True
+
+    def match(self, address):
+        """返回地址中命中的 (地名, 坐标, 来源)，没有命中返回 None"""
+        if not self.places or not address:
+            return None
+        matches = self._automaton.find_all(normalize_address(address))
+        if not matches:
+            return None
+        _, key, _ = min(matches, key=lambda m: (-len(m[1]), SOURCE_RANK[self.places[m[1]][2]]))
+        return self.places[key]
+
+    def lookup(self, address):
+        """地址对应的已知坐标，没有命中返回 None"""
+        place = self.match(address)
+        return place[1] if place else None
+
+    @classmethod
+    def load(cls, urls_file=URLS_FILE, places_file=USER_PLACES_FILE):
+        """加载重要地标、已核实地点和用户地点"""
+        gazetteer = cls()
+        for landmark in _read_json(urls_file).get('important_landmarks', {}).values():
+            gazetteer.add(landmark.get('name'), landmark.get('coordinates'), "landmark")
+        for name, location in VERIFIED_PLACES.items():
+            gazetteer.add(name, location, "verified")
+        for name, location in load_user_places(places_file).items():
+            gazetteer.add(name, location, "user")
+        return gazetteer
+
+
+def _read_json(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def load_user_places(places_file=USER_PLACES_FILE):
+    """用户添加的地点 {名称: 坐标}"""
+    return _read_json(places_file).get('places', {})
+
+
+def save_user_places(places, places_file=USER_PLACES_FILE):
+    os.makedirs(os.path.dirname(places_file), exist_ok=True)
+    tmp_file = places_file + ".tmp"
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump({"places": places}, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_file, places_file)
+
+
+_shared_gazetteer = None
+_shared_lock = threading.Lock()
+
+
+def get_gazetteer():
+    """获取进程内共享的地名索引"""
+    global _shared_gazetteer
+    with _shared_lock:
+        if _shared_gazetteer is None:
+            _shared_gazetteer = Gazetteer.load()
+        return _shared_gazetteer
+
+
+def add_user_place(name, location):
+    """添加或更新用户地点（写入 gazetteer.json，并更新进程内索引）"""
+    global _shared_gazetteer
+    if not LOCATION_PATTERN.match(location):
+        raise ValueError(f"坐标格式应为 经度,纬度：{location}")
+    places = load_user_places()
+    places[name] = location
+    save_user_places(places)
+    with _shared_lock:
+        _shared_gazetteer = None
+
+
+def remove_user_place(name):
+    """删除用户地点，返回是否存在"""
+    global _shared_gazetteer
+    places = load_user_places()
+    if places.pop(name, None) is None:
+        return False
+    save_user_places(places)
+    with _shared_lock:
+        _shared_gazetteer = None
+    return True
+
+
+def main():
+    command = sys.argv[1] if len(sys.argv) > 1 else None
+    if command == "add" and len(sys.argv) == 4:
+        try:
+            add_user_place(sys.argv[2], sys.argv[3])
+        except ValueError as e:
+            print(f"错误：{e}")
+            sys.exit(1)
+        print(f"已添加：{sys.argv[2]} -> {sys.argv[3]}")
+    elif command == "remove" and len(sys.argv) == 3:
+        print("已删除" if remove_user_place(sys.argv[2]) else "未找到该地点（只能删除用户添加的地点）")
+    elif command == "lookup" and len(sys.argv) == 3:
+        place = get_gazetteer().match(sys.argv[2])
+        print(f"{place[0]} -> {place[1]}（{place[2]}）" if place else "未命中，将使用高德地理编码")
+    elif command == "list":
+        for name, location, source in sorted(get_gazetteer().places.values(), key=lambda p: SOURCE_RANK[p[2]]):
+            print(f"  [{source}] {name} -> {location}")
+    else:
+        print("用法：python gazetteer.py add 名称 经度,纬度 | remove 名称 | lookup 地址 | list")
+
+
+if __name__ == "__main__":
+    main()
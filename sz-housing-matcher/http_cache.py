@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+条件请求 HTTP 缓存
+按 URL 持久化 ETag / Last-Modified / 页面内容，重复抓取时发送
+If-None-Match / If-Modified-Since，页面未变化时直接复用上次的解析结果
+每个 URL 的缓存信息和解析结果是 SQLite（http_cache/index.db）中的独立行，页面内容按 URL 存为单独文件，
+一次 304、更新或保存解析结果只写入该 URL 的行，耗时与缓存的页面数无关
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~/.sz-housing"), "http_cache")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    url TEXT PRIMARY KEY,
+    etag TEXT,
+    last_modified TEXT,
+    sha256 TEXT,
+    fetched_at TEXT,
+    checked_at TEXT
+);
+CREATE TABLE IF NOT EXISTS parsed (
+    url TEXT NOT NULL,
+    parser TEXT NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (url, parser)
+);
+"""
+
+
+class HttpCache:
+    """基于磁盘的 HTTP 条件请求缓存（线程安全）"""
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR):
+        self.cache_dir = cache_dir
+        self.body_dir = os.path.join(cache_dir, "bodies")
+        self.db_file = os.path.join(cache_dir, "index.db")
+        os.makedirs(cache_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_file, check_same_thread=False)
+        with self._conn:
+            self._conn.executescript(SCHEMA)
+
+    def _entry(self, url):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT etag, last_modified, sha256 FROM entries WHERE url = ?", (url,)).fetchone()
+
+    def _body_path(self, url):
+        return os.path.join(self.body_dir, hashlib.sha1(url.encode('utf-8')).hexdigest() + ".html")
+
+    def _read_body(self, url):
+        try:
+            with open(self._body_path(url), 'r', encoding='utf-8') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def conditional_headers(self, url):
+        """生成条件请求头（缓存内容缺失时不发送，避免拿到无法复用的 304）"""
+        entry = self._entry(url)
+        if not entry or not os.path.exists(self._body_path(url)):
+            return {}
+
+        etag, last_modified, _ = entry
+        headers = {}
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+        return headers
+
+    def fetch(self, session, url, timeout=15, headers=None):
+        """
+        发送条件 GET 请求
+        返回 (页面内容, 是否有变化)；304 或内容哈希未变时视为无变化
+        """
+        request_headers = dict(headers or {})
+        request_headers.update(self.conditional_headers(url))
+
+        response = session.get(url, headers=request_headers, timeout=timeout)
+        if response.status_code == 304:
+            body = self._read_body(url)
+            if body is not None:
+                self._touch(url)
+                return body, False
+            # 缓存内容丢失：去掉条件请求头重新获取
+            response = session.get(url, headers=headers, timeout=timeout)
+
+        response.raise_for_status()
+        response.encoding = 'utf-8'
+        body = response.text
+        changed = self._store(url, body, response.headers.get('ETag'), response.headers.get('Last-Modified'))
+        return body, changed
+
+    def _touch(self, url):
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE entries SET checked_at = ? WHERE url = ?", (datetime.now().isoformat(), url))
+
+    def _store(self, url, body, etag, last_modified):
+        content_hash = hashlib.sha256(body.encode('utf-8')).hexdigest()
+        now = datetime.now().isoformat()
+
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT sha256, fetched_at FROM entries WHERE url = ?", (url,)).fetchone()
+            changed = row is None or row[0] != content_hash
+            fetched_at = row[1] if row else now
+            if changed:
+                os.makedirs(self.body_dir, exist_ok=True)
+                with open(self._body_path(url), 'w', encoding='utf-8') as f:
+                    f.write(body)
+                fetched_at = now
+                # 内容变化后旧解析结果作废
+                self._conn.execute("DELETE FROM parsed WHERE url = ?", (url,))
+            self._conn.execute("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?)",
+                               (url, etag, last_modified, content_hash, fetched_at, now))
+
+        return changed
+
+    def get_parsed(self, url, parser):
+        """获取某个解析器对该页面上次的解析结果（内容未变化时可直接复用）"""
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM parsed WHERE url = ? AND parser = ?", (url, parser)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set_parsed(self, url, parser, parsed):
+        """保存解析结果（不同脚本的解析结果按 parser 分开存放）"""
+        with self._lock, self._conn:
+            if self._conn.execute("SELECT 1 FROM entries WHERE url = ?", (url,)).fetchone():
+                self._conn.execute("INSERT OR REPLACE INTO parsed VALUES (?, ?, ?)",
+                                   (url, parser, json.dumps(parsed, ensure_ascii=False)))
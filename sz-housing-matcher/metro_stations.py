@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+深圳地铁站本地数据与空间索引
+站点数据随仓库提供（metro_stations.json，只含部分线路的种子数据，坐标为近似值），
+运行 refresh 后改用 ~/.sz-housing/metro_stations.json 中从高德更新的完整列表；
+站点按网格分桶，最近 k 个站点和半径内站点的查询不需要请求高德接口。
+附近地铁站只查本地索引；配置高德 Key 后应先运行一次 refresh（setup 时会提示），否则只能查到种子数据中的站点
+
+用法：
+  python metro_stations.py refresh           从高德地点搜索更新站点列表
+  python metro_stations.py near 经度,纬度 [k]  查询最近的地铁站
+"""
+
+import json
+import math
+import os
+import re
+import sys
+import threading
+from collections import defaultdict
+from datetime import date
+
+from amap_client import get_amap_client
+
+CONFIG_DIR = os.path.expanduser("~/.sz-housing")
+CONFIG_FILE = os.path.join(CONFIG_DIR, "config.json")
+USER_DATA_FILE = os.path.join(CONFIG_DIR, "metro_stations.json")
+SEED_DATA_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "metro_stations.json")
+
+# 每度纬度对应的米数；深圳范围很小，经度方向统一按 22.6° 的余弦缩放
+METERS_PER_DEGREE = 111320
+REFERENCE_LAT = 22.6
+METERS_PER_DEGREE_LNG = METERS_PER_DEGREE * math.cos(math.radians(REFERENCE_LAT))
+
+# 网格边长（米）
+DEFAULT_CELL_METERS = 1000
+
+# 高德 POI 分类：地铁站
+AMAP_SUBWAY_TYPE = "150500"
+
+# 高德 POI 名称中的后缀，如 "车公庙(地铁站)"
+STATION_SUFFIX = re.compile(r'[(（]地铁站[)）]$|地铁站$')
+
+
+def _project(location):
+    """ "经度,纬度" 投影为以米为单位的平面坐标"""
+    lng, lat = (float(v) for v in location.split(','))
+    return lng * METERS_PER_DEGREE_LNG, lat * METERS_PER_DEGREE
+
+
+class StationIndex:
+    """地铁站网格索引：最近 k 个站点、半径内站点查询"""
+
+    def __init__(self, stations, cell_meters=DEFAULT_CELL_METERS, complete=False):
+        # complete：是否为 refresh 得到的完整站点列表（种子数据只覆盖部分线路）
+        self.complete = complete
+        self.cell = cell_meters
+        self.stations = []
+        self._grid = defaultdict(list)  # (列, 行) -> [(x, y, 站点)]
+        for station in stations:
+            try:
+                x, y = _project(station['location'])
+            except (KeyError, ValueError):
+                continue
+            self.stations.append(station)
+            self._grid[self._cell_of(x, y)].append((x, y, station))
+        if self._grid:
+            cols = [c for c, _ in self._grid]
+            rows = [r for _, r in self._grid]
+            self._bounds = (min(cols), max(cols), min(rows), max(rows))
+
+    def __len__(self):
+        return len(self.stations)
+
+    def _cell_of(self, x, y):
+        return int(x // self.cell), int(y // self.cell)
+
+    def _ring(self, center, r):
+        """与中心网格相距 r 圈的网格"""
+        cx, cy = center
+        if r == 0:
+            yield center
+            return
+        for dx in range(-r, r + 1):
+            yield cx + dx, cy - r
+            yield cx + dx, cy + r
+        for dy in range(-r + 1, r):
+            yield cx - r, cy + dy
+            yield cx + r, cy + dy
+
+    def _max_ring(self, center):
+        """覆盖全部非空网格所需的圈数"""
+        min_col, max_col, min_row, max_row = self._bounds
+        cx, cy = center
+        return max(abs(cx - min_col), abs(cx - max_col), abs(cy - min_row), abs(cy - max_row))
+
+    @staticmethod
+    def _result(station, distance):
+        # 与高德周边搜索返回的 POI 字段一致（distance 为米数字符串）
+        return {
+            "name": station['name'],
+            "distance": str(int(round(distance))),
+            "location": station['location'],
+            "address": ";".join(station.get('lines', [])),
+            "lines": station.get('lines', [])
+        }
+
+    def nearest(self, location, k=3, max_distance=None):
+        """距离最近的 k 个站点（按距离升序），max_distance 米以外的不返回"""
+        if not self.stations or k <= 0:
+            return []
+        x, y = _project(location)
+        center = self._cell_of(x, y)
+        last_ring = self._max_ring(center)
+        if max_distance is not None:
+            last_ring = min(last_ring, int(max_distance // self.cell) + 1)
+
+        found = []
+        for r in range(last_ring + 1):
+            for cell in self._ring(center, r):
+                for sx, sy, station in self._grid.get(cell, ()):
+                    found.append((math.hypot(sx - x, sy - y), station))
+            # 第 r 圈之外的站点距离至少为 r 个网格边长
+            if len(found) >= k and sorted(d for d, _ in found)[k - 1] <= r * self.cell:
+                break
+
+        found.sort(key=lambda item: item[0])
+        if max_distance is not None:
+            found = [item for item in found if item[0] <= max_distance]
+        return [self._result(station, distance) for distance, station in found[:k]]
+
+    def within(self, location, radius):
+        """半径 radius 米内的全部站点（按距离升序）"""
+        if not self.stations:
+            return []
+        x, y = _project(location)
+        cx, cy = self._cell_of(x, y)
+        span = int(radius // self.cell) + 1
+        found = []
+        for col in range(cx - span, cx + span + 1):
+            for row in range(cy - span, cy + span + 1):
+                for sx, sy, station in self._grid.get((col, row), ()):
+                    distance = math.hypot(sx - x, sy - y)
+                    if distance <= radius:
+                        found.append((distance, station))
+        found.sort(key=lambda item: item[0])
+        return [self._result(station, distance) for distance, station in found]
+
+
+def load_stations():
+    """
+    加载站点数据：优先使用 refresh 生成的本地数据，否则使用随仓库提供的种子数据
+    返回的数据中 complete 表示是否为完整站点列表
+    """
+    for path in (USER_DATA_FILE, SEED_DATA_FILE):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            continue
+        data['complete'] = path == USER_DATA_FILE
+        return data
+    return {"stations": [], "complete": False}
+
+
+_shared_index = None
+_shared_lock = threading.Lock()
+
+
+def get_station_index():
+    """获取进程内共享的地铁站索引"""
+    global _shared_index
+    with _shared_lock:
+        if _shared_index is None:
+            data = load_stations()
+            _shared_index = StationIndex(data.get('stations', []), complete=data['complete'])
+        return _shared_index
+
+
+_warned_incomplete = False
+
+
+def nearby_stations(location, radius=1000, limit=3):
+    """半径内最近的 limit 个地铁站（只查本地索引，不请求高德）；只有种子数据时提示一次运行 refresh"""
+    global _warned_incomplete
+    index = get_station_index()
+    if not index.complete and not _warned_incomplete:
+        _warned_incomplete = True
+        print("  ⚠️ 地铁站数据只含部分线路，请先运行 python metro_stations.py refresh 获取完整站点列表")
+    return index.within(location, radius)[:limit]
+
+
+def fetch_stations(client, city="深圳", page_size=25, max_pages=40):
+    """通过高德地点搜索获取全部地铁站，同名站点合并线路"""
+    stations = {}
+    for page in range(1, max_pages + 1):
+        pois = client.place_text("地铁站", AMAP_SUBWAY_TYPE, city, page=page, offset=page_size)
+        if not pois:
+            break
+        for poi in pois:
+            name = STATION_SUFFIX.sub('', poi.get('name', '')).strip()
+            location = poi.get('location')
+            if not name or not isinstance(location, str) or not location:
+                continue
+            station = stations.setdefault(name, {"name": name, "lines": [], "location": location})
+            # 地铁站 POI 的 address 字段为经过的线路，如 "1号线;2号线"
+            address = poi.get('address') if isinstance(poi.get('address'), str) else ''
+            for line in address.split(';'):
+                if line and '线' in line and line not in station['lines']:
+                    station['lines'].append(line)
+        if len(pois) < page_size:
+            break
+    return list(stations.values())
+
+
+def refresh(amap_key, data_file=USER_DATA_FILE):
+    """从高德更新站点列表并写入 data_file，返回站点数（获取失败时不覆盖原有数据）"""
+    global _shared_index
+    stations = fetch_stations(get_amap_client(amap_key))
+    if not stations:
+        return 0
+    data = {
+        "source": f"高德地点搜索（types={AMAP_SUBWAY_TYPE}）",
+        "updated": date.today().isoformat(),
+        "coordinate_system": "GCJ-02",
+        "stations": stations
+    }
+    os.makedirs(os.path.dirname(data_file), exist_ok=True)
+    tmp_file = data_file + ".tmp"
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_file, data_file)
+    with _shared_lock:
+        _shared_index = None
+    return len(stations)
+
+
+def main():
+    command = sys.argv[1] if len(sys.argv) > 1 else None
+    if command == "refresh":
+        try:
+            with open(CONFIG_FILE, 'r', encoding='utf-8') as f:
+                amap_key = json.load(f).get('api_keys', {}).get('amap')
+        except (OSError, ValueError):
+            amap_key = None
+        if not amap_key or amap_key == "YOUR_AMAP_API_KEY_HERE":
+            print("错误：未配置高德地图 API Key，请先运行：python sz_housing_matcher.py setup")
+            sys.exit(1)
+        count = refresh(amap_key)
+        if count:
+            print(f"已更新 {count} 个地铁站：{USER_DATA_FILE}")
+        else:
+            print("未获取到地铁站数据，保留原有数据")
+    elif command == "near" and len(sys.argv) > 2:
+        k = int(sys.argv[3]) if len(sys.argv) > 3 else 3
+        data = load_stations()
+        print(f"数据来源：{data.get('source', '未知')}（{data.get('updated', '未知日期')}）")
+        for station in StationIndex(data.get('stations', [])).nearest(sys.argv[2], k):
+            print(f"  {station['name']}（{station['address']}）约{station['distance']}米")
+    else:
+        print("用法：python metro_stations.py refresh | near 经度,纬度 [k]")
+
+
+if __name__ == "__main__":
+    main()
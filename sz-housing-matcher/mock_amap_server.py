@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+本地模拟高德 Web 服务（离线测试用）
+支持地理编码（含 batch=true 批量模式）、驾车路径规划、距离测量、周边搜索和关键字搜索，
+坐标由地址哈希生成并落在深圳范围内，距离和时间按直线距离估算；同时统计每个接口的请求次数。
+设置了 QPS 上限时，超出的请求与真实接口一样返回 CUQPS_HAS_EXCEEDED_THE_LIMIT
+
+用法：python mock_amap_server.py [端口] [每个请求的模拟延迟秒数] [QPS 上限]
+然后在 ~/.sz-housing/config.json 中设置 settings.amap.base_url 为 http://127.0.0.1:<端口>
+"""
+
+import hashlib
+import json
+import math
+import sys
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# 深圳市大致范围（经度、纬度）
+SZ_BOUNDS = (113.75, 114.60, 22.45, 22.85)
+
+# 关键字搜索返回的结果总数
+MOCK_TEXT_RESULTS = 60
+
+# 地址中包含这些词时模拟无法解析
+UNRESOLVABLE = ('无法解析', 'unknown')
+
+
+def fake_location(address):
+    """由地址哈希生成稳定的坐标"""
+    digest = hashlib.md5(address.encode('utf-8')).digest()
+    min_lng, max_lng, min_lat, max_lat = SZ_BOUNDS
+    lng = min_lng + (max_lng - min_lng) * digest[0] / 255
+    lat = min_lat + (max_lat - min_lat) * digest[1] / 255
+    return f"{lng:.6f},{lat:.6f}"
+
+
+def straight_distance(origin, destination):
+    """两点间直线距离（米）"""
+    lng1, lat1 = (float(v) for v in origin.split(','))
+    lng2, lat2 = (float(v) for v in destination.split(','))
+    dx = (lng2 - lng1) * 111320 * math.cos(math.radians((lat1 + lat2) / 2))
+    dy = (lat2 - lat1) * 111320
+    return math.hypot(dx, dy)
+
+
+class MockAmapHandler(BaseHTTPRequestHandler):
+    # 支持 keep-alive，与真实接口一致
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        params = {k: v[0] for k, v in parse_qs(parsed.query).items()}
+        self.server.counts[parsed.path] += 1
+        if self.server.over_qps():
+            self.server.counts['throttled'] += 1
+            self._send({"status": "0", "info": "CUQPS_HAS_EXCEEDED_THE_LIMIT", "infocode": "10021"})
+            return
+        if self.server.delay:
+            time.sleep(self.server.delay)
+
+        handler = {
+            "/v3/geocode/geo": self._geocode,
+            "/v3/direction/driving": self._driving,
+            "/v3/distance": self._distance,
+            "/v3/place/around": self._around,
+            "/v3/place/text": self._text,
+        }.get(parsed.path)
+        if handler is None:
+            self._send({"status": "0", "info": "INVALID_REQUEST", "infocode": "20000"})
+            return
+        self._send(handler(params))
+
+    def _geocode(self, params):
+        addresses = params.get('address', '')
+        if params.get('batch') == 'true':
+            addresses = addresses.split('|')
+            if len(addresses) > 10:
+                return {"status": "0", "info": "TOO_MANY_ADDRESSES", "infocode": "20003"}
+        else:
+            addresses = [addresses]
+
+        geocodes = []
+        for address in addresses:
+            if any(word in address for word in UNRESOLVABLE):
+                # 与真实接口一致：批量模式下无法解析的地址保留占位，字段为空
+                geocodes.append({"formatted_address": [], "location": []})
+            else:
+                geocodes.append({"formatted_address": address, "location": fake_location(address)})
+        if params.get('batch') != 'true':
+            geocodes = [g for g in geocodes if g['location']]
+        return {"status": "1", "info": "OK", "infocode": "10000",
+                "count": str(len(geocodes)), "geocodes": geocodes}
+
+    def _driving(self, params):
+        # 道路距离按直线距离的 1.3 倍，平均车速 30 公里/小时
+        distance = straight_distance(params['origin'], params['destination']) * 1.3
+        duration = distance / (30000 / 3600)
+        return {"status": "1", "info": "OK", "infocode": "10000",
+                "route": {"paths": [{"distance": str(int(distance)), "duration": str(int(duration))}]}}
+
+    def _distance(self, params):
+        # type=0 为直线距离，其余按驾车估算（与 _driving 一致）
+        origins = params.get('origins', '').split('|')
+        if len(origins) > 100:
+            return {"status": "0", "info": "OVER_DIRECTION_RANGE", "infocode": "20803"}
+        factor = 1.0 if params.get('type') == '0' else 1.3
+        results = []
+        for i, origin in enumerate(origins):
+            distance = straight_distance(origin, params['destination']) * factor
+            results.append({"origin_id": str(i + 1), "dest_id": "1",
+                            "distance": str(int(distance)), "duration": str(int(distance / (30000 / 3600)))})
+        return {"status": "1", "info": "OK", "infocode": "10000", "results": results}
+
+    def _around(self, params):
+        lng, lat = (float(v) for v in params['location'].split(','))
+        keywords = params.get('keywords', '')
+        pois = [{"name": f"{keywords}{i + 1}", "distance": str(200 * (i + 1)),
+                 "location": f"{lng + 0.002 * (i + 1):.6f},{lat:.6f}"} for i in range(3)]
+        return {"status": "1", "info": "OK", "infocode": "10000", "count": str(len(pois)), "pois": pois}
+
+    def _text(self, params):
+        # 共 MOCK_TEXT_RESULTS 条结果，按 offset / page 分页
+        offset, page = int(params.get('offset', 20)), int(params.get('page', 1))
+        keywords = params.get('keywords', '')
+        pois = []
+        for i in range((page - 1) * offset, min(page * offset, MOCK_TEXT_RESULTS)):
+            location = fake_location(f"{keywords}{i}")
+            pois.append({"name": f"模拟{i + 1}({keywords})", "location": location,
+                         "address": f"{i % 5 + 1}号线;{i % 3 + 6}号线"})
+        return {"status": "1", "info": "OK", "infocode": "10000", "count": str(MOCK_TEXT_RESULTS), "pois": pois}
+
+
+class MockAmapServer(ThreadingHTTPServer):
+    def __init__(self, address, delay=0.0, qps_limit=0):
+        super().__init__(address, MockAmapHandler)
+        self.counts = Counter()
+        self.delay = delay
+        self.qps_limit = qps_limit
+        self._second_counts = Counter()
+        self._lock = threading.Lock()
+
+    def over_qps(self):
+        """按当前秒计数，超过 qps_limit（0 为不限制）时返回 True"""
+        if not self.qps_limit:
+            return False
+        second = int(time.time())
+        with self._lock:
+            self._second_counts[second] += 1
+            for old in [s for s in self._second_counts if s < second]:
+                del self._second_counts[old]
+            return self._second_counts[second] > self.qps_limit
+
+
+def create_server(port=0, delay=0.0, qps_limit=0):
+    return MockAmapServer(('127.0.0.1', port), delay, qps_limit)
+
+
+def start_mock_server(port=0, delay=0.0, qps_limit=0):
+    """
+    在后台线程启动模拟服务，返回 (server, base_url)
+    server.counts 记录各接口请求次数（被限流的请求另计在 'throttled'）；
+    delay 模拟每个请求的网络往返耗时，qps_limit 模拟每秒请求上限
+    """
+    server = create_server(port, delay, qps_limit)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def main():
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8899
+    delay = float(sys.argv[2]) if len(sys.argv) > 2 else 0.0
+    qps_limit = int(sys.argv[3]) if len(sys.argv) > 3 else 0
+    server = create_server(port, delay, qps_limit)
+    print(f"模拟高德服务已启动：http://127.0.0.1:{port}（Ctrl+C 退出）")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n请求统计：")
+        for path, count in sorted(server.counts.items()):
+            print(f"  {path}: {count}")
+
+
+if __name__ == "__main__":
+    main()
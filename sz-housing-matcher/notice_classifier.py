@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+公告标题分类
+所有房源类型和公告类型的关键词编译为一个 Aho-Corasick 自动机，标题只扫描一遍即得到全部分类标签；
+公告库写入时保存标签（notices.tags），之后的筛选只需集合判断，不再逐个关键词做子串查找
+
+用法：python notice_classifier.py 标题 [标题 ...]   查看标题的分类标签
+"""
+
+import sys
+import threading
+
+from aho_corasick import AhoCorasick
+
+# 分类标签 -> 关键词（修改后需同时增加 CLASSIFIER_VERSION，公告库会重新计算已有公告的标签）
+CATEGORIES = {
+    # 房源类型
+    "安居房": ["安居房", "安居型商品房"],
+    "人才房": ["人才房", "人才住房"],
+    "公租房": ["公租房", "公共租赁住房"],
+    "保障性租赁住房": ["保障性租赁住房", "保租房"],
+    "保障房": ["保障房", "保障性住房"],
+    # 公告类型
+    "配售": ["配售"],
+    "配租": ["配租"],
+    "认购": ["认购"],
+    "选房": ["选房"],
+    "配售通告": ["配售通告"],
+    # 泛指住房
+    "住房": ["住房"],
+    # 与申请无关
+    "无关": ["采购", "内部", "会议", "培训", "资格考试"],
+}
+CLASSIFIER_VERSION = 1
+
+HOUSING_TYPES = ("安居房", "人才房", "公租房", "保障性租赁住房", "保障房")
+
+# 列表页中视为保障房公告的标签
+RELEVANT_TAGS = frozenset(HOUSING_TYPES + ("配售", "配租", "住房"))
+# 按关键词搜索链接时使用的标签（不含泛指的"住房"）
+LINK_TAGS = frozenset(HOUSING_TYPES + ("配售", "配租"))
+# 正在申请中的公告
+APPLICATION_TAGS = frozenset(("配售通告", "配租", "认购", "选房"))
+IRRELEVANT_TAG = "无关"
+
+_TAG_ORDER = {tag: i for i, tag in enumerate(CATEGORIES)}
+
+
+class NoticeClassifier:
+    """标题 -> 分类标签集合"""
+
+    def __init__(self, categories=CATEGORIES):
+        self._automaton = AhoCorasick()
+        for tag, keywords in categories.items():
+            for keyword in keywords:
+                self._automaton.add(keyword, tag)
+        # 抓取的工作线程共用同一个分类器，创建时（get_classifier 的锁内）就构建完成
+        self._automaton.build()
+
+    def tags(self, title):
+        """标题命中的全部标签（frozenset），一次扫描"""
+        return frozenset(value for _, _, value in self._automaton.find_all(title or ''))
+
+
+_shared_classifier = None
+_shared_lock = threading.Lock()
+
+
+def get_classifier():
+    """获取进程内共享的分类器"""
+    global _shared_classifier
+    with _shared_lock:
+        if _shared_classifier is None:
+            _shared_classifier = NoticeClassifier()
+        return _shared_classifier
+
+
+def classify(title):
+    """标题的分类标签（按 CATEGORIES 中的顺序排列的列表）"""
+    return sorted(get_classifier().tags(title), key=_TAG_ORDER.get)
+
+
+def is_relevant(tags):
+    """是否为保障房相关公告"""
+    return not RELEVANT_TAGS.isdisjoint(tags)
+
+
+def is_application(tags):
+    """是否为配售、配租、认购、选房等正在申请的公告"""
+    return not APPLICATION_TAGS.isdisjoint(tags)
+
+
+def is_sale(tags):
+    """是否为安居房、人才房的配售（认购）公告"""
+    tags = set(tags)
+    return "配售通告" in tags or bool(tags & {"配售", "认购"} and tags & {"安居房", "人才房"})
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("用法：python notice_classifier.py 标题 [标题 ...]")
+        return
+    for title in sys.argv[1:]:
+        print(f"{title}：{'、'.join(classify(title)) or '（无）'}")
+
+
+if __name__ == "__main__":
+    main()
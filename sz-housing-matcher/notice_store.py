@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""
+SQLite 公告库
+替代整体读写的 notices.json：按 URL 唯一约束去重、按日期和来源建立索引，
+每次保存只写入新增或变化的行；写入时按标题计算分类标签（notice_classifier）一并保存
+
+用法：python notice_store.py migrate [notices.json 路径]   # 从旧的 JSON 文件导入
+"""
+
+import json
+import os
+import sqlite3
+import sys
+import threading
+from datetime import date, timedelta
+
+from notice_classifier import CLASSIFIER_VERSION, classify
+
+CONFIG_DIR = os.path.expanduser("~/.sz-housing")
+DEFAULT_DB_FILE = os.path.join(CONFIG_DIR, "notices.db")
+LEGACY_JSON_FILE = os.path.join(CONFIG_DIR, "notices.json")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS notices (
+    id INTEGER PRIMARY KEY,
+    url TEXT NOT NULL UNIQUE,
+    title TEXT NOT NULL,
+    date TEXT NOT NULL,
+    date_ord INTEGER NOT NULL,
+    source TEXT,
+    fetched_at TEXT,
+    detail TEXT,
+    detail_extracted_at TEXT,
+    tags TEXT,
+    detail_attempts INTEGER NOT NULL DEFAULT 0,
+    detail_failed_at TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_notices_date ON notices (date_ord);
+CREATE INDEX IF NOT EXISTS idx_notices_source ON notices (source, date_ord);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+COLUMNS = ("url", "title", "date", "source", "fetched_at", "detail", "detail_extracted_at")
+
+# 详情页提取失败达到该次数（或页面已不存在）后不再尝试
+MAX_DETAIL_ATTEMPTS = 3
+
+# 旧版本公告库缺少的列
+ADDED_COLUMNS = {
+    "tags": "TEXT",
+    "detail_attempts": "INTEGER NOT NULL DEFAULT 0",
+    "detail_failed_at": "TEXT",
+}
+
+
+def date_ordinal(value):
+    """date 或 'YYYY-MM-DD' 转换为日序数，便于按日期范围走索引查询"""
+    if isinstance(value, date):
+        return value.toordinal()
+    try:
+        return date.fromisoformat(value).toordinal()
+    except (TypeError, ValueError):
+        return 0
+
+
+def encode_tags(tags):
+    """标签列表 -> "|安居房|配售|"（便于 instr 查找）"""
+    return "|" + "".join(f"{tag}|" for tag in tags)
+
+
+def decode_tags(value):
+    return [tag for tag in (value or "").split("|") if tag]
+
+
+def recent_start(days, today=None):
+    """最近 N 天的起始日期（含当天），与原先 strptime(date) >= now - N天 的判断一致"""
+    return (today or date.today()) - timedelta(days=days - 1)
+
+
+class NoticeStore:
+    """公告库"""
+
+    def __init__(self, db_file=DEFAULT_DB_FILE, legacy_json=LEGACY_JSON_FILE):
+        self.db_file = db_file
+        os.makedirs(os.path.dirname(db_file), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_file, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._conn:
+            self._conn.executescript(SCHEMA)
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(notices)")}
+            for column, definition in ADDED_COLUMNS.items():
+                if column not in columns:
+                    self._conn.execute(f"ALTER TABLE notices ADD COLUMN {column} {definition}")
+        self._retag_if_outdated()
+
+        # 首次使用时自动从旧的 notices.json 导入（只执行一次）
+        if legacy_json and os.path.exists(legacy_json) and not self._meta('migrated_from'):
+            count = self.migrate_from_json(legacy_json)
+            print(f"已从 {legacy_json} 导入 {count} 条公告到 {db_file}")
+
+    def _meta(self, key):
+        row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _retag_if_outdated(self):
+        """分类关键词变化（或旧库尚无标签）时重新计算全部公告的标签"""
+        if self._meta('classifier_version') == str(CLASSIFIER_VERSION):
+            return
+        with self._lock, self._conn:
+            rows = self._conn.execute("SELECT id, title FROM notices").fetchall()
+            self._conn.executemany("UPDATE notices SET tags = ? WHERE id = ?",
+                                   [(encode_tags(classify(title)), notice_id) for notice_id, title in rows])
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('classifier_version', ?)",
+                               (str(CLASSIFIER_VERSION),))
+
+    @staticmethod
+    def _to_row(notice):
+        detail = notice.get('detail')
+        tags = notice.get('tags')
+        return (notice['url'], notice['title'], notice['date'], date_ordinal(notice['date']),
+                notice.get('source'), notice.get('fetched_at'),
+                json.dumps(detail, ensure_ascii=False) if detail is not None else None,
+                notice.get('detail_extracted_at'),
+                encode_tags(classify(notice['title']) if tags is None else tags))
+
+    @staticmethod
+    def _to_notice(row):
+        notice = {key: row[key] for key in COLUMNS if row[key] is not None}
+        if 'detail' in notice:
+            notice['detail'] = json.loads(notice['detail'])
+        notice['tags'] = decode_tags(row['tags'])
+        return notice
+
+    def upsert_many(self, notices):
+        """
+        批量写入（单个事务）：新 URL 插入，已有 URL 只更新标题（及其标签）
+        首次发现的日期和抓取时间保持不变；返回新增条数
+        """
+        rows = [self._to_row(n) for n in notices]
+        with self._lock, self._conn:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT INTO notices (url, title, date, date_ord, source, fetched_at, detail, detail_extracted_at, tags) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT(url) DO NOTHING", rows)
+            inserted = self._conn.total_changes - before
+            self._conn.executemany(
+                "UPDATE notices SET title = ?, tags = ? WHERE url = ? AND title != ?",
+                [(row[1], row[8], row[0], row[1]) for row in rows])
+        return inserted
+
+    def has_url(self, url):
+        """URL 是否已入库（走唯一索引）"""
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM notices WHERE url = ?", (url,)).fetchone() is not None
+
+    def count(self, source=None, start=None):
+        """公告数量，可按来源和起始日期统计"""
+        sql, params = "SELECT COUNT(*) FROM notices WHERE 1", []
+        if source is not None:
+            sql += " AND source = ?"
+            params.append(source)
+        if start is not None:
+            sql += " AND date_ord >= ?"
+            params.append(date_ordinal(start))
+        with self._lock:
+            return self._conn.execute(sql, params).fetchone()[0]
+
+    def all(self):
+        """全部公告（新日期在前）"""
+        with self._lock:
+            rows = self._conn.execute("SELECT * FROM notices ORDER BY date_ord DESC, id DESC").fetchall()
+        return [self._to_notice(row) for row in rows]
+
+    def query(self, start=None, end=None, source=None, keyword=None, tags=None):
+        """
+        按日期范围（含两端）、来源、标题关键词和分类标签查询公告，新日期在前
+        start/end 为 date 或 'YYYY-MM-DD'；keyword、tags 可以是字符串或列表（任一命中即可）
+        日期条件走 date_ord / (source, date_ord) 索引，耗时与结果数量成正比
+        """
+        clauses, params = [], []
+        if start is not None:
+            clauses.append("date_ord >= ?")
+            params.append(date_ordinal(start))
+        if end is not None:
+            clauses.append("date_ord <= ?")
+            params.append(date_ordinal(end))
+        if source is not None:
+            clauses.append("source = ?")
+            params.append(source)
+        if keyword:
+            keywords = [keyword] if isinstance(keyword, str) else list(keyword)
+            clauses.append("(" + " OR ".join("instr(title, ?) > 0" for _ in keywords) + ")")
+            params.extend(keywords)
+        if tags:
+            tags = [tags] if isinstance(tags, str) else list(tags)
+            clauses.append("(" + " OR ".join("instr(tags, ?) > 0" for _ in tags) + ")")
+            params.extend(f"|{tag}|" for tag in tags)
+
+        sql = "SELECT * FROM notices"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY date_ord DESC, id DESC"
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [self._to_notice(row) for row in rows]
+
+    def recent(self, days, source=None, keyword=None, tags=None):
+        """最近 N 天的公告（含今天）"""
+        return self.query(start=recent_start(days), source=source, keyword=keyword, tags=tags)
+
+    def fetch_hours(self, source):
+        """
+        该来源当天发布、当天抓取到的公告按抓取时刻的小时计数 {小时: 条数}，用于估计网站的发布时段
+        （翻页补抓的历史公告抓取日期晚于发布日期，不计入）
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT CAST(substr(fetched_at, 12, 2) AS INTEGER), COUNT(*) FROM notices "
+                "WHERE source = ? AND substr(fetched_at, 1, 10) = date GROUP BY 1", (source,)).fetchall()
+        return dict(rows)
+
+    def without_detail(self, start=None):
+        """
+        尚未提取详情、且未放弃提取的公告，可按起始日期过滤
+        （失败 MAX_DETAIL_ATTEMPTS 次或页面已不存在的公告不再返回）
+        """
+        sql = "SELECT * FROM notices WHERE detail_extracted_at IS NULL AND detail_attempts < ?"
+        params = [MAX_DETAIL_ATTEMPTS]
+        if start is not None:
+            sql += " AND date_ord >= ?"
+            params.append(date_ordinal(start))
+        with self._lock:
+            rows = self._conn.execute(sql + " ORDER BY date_ord DESC, id DESC", params).fetchall()
+        return [self._to_notice(row) for row in rows]
+
+    def record_detail_failures(self, notices):
+        """
+        记录详情页提取失败（单个事务）：notice['detail_failed_at'] 为失败时间，
+        notice['detail_gone'] 为真（页面不存在等不可重试的错误）时直接放弃，否则失败次数加一
+        """
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "UPDATE notices SET detail_attempts = CASE WHEN ? THEN ? ELSE detail_attempts + 1 END, "
+                "detail_failed_at = ? WHERE url = ?",
+                [(bool(n.get('detail_gone')), MAX_DETAIL_ATTEMPTS, n['detail_failed_at'], n['url'])
+                 for n in notices])
+
+    def with_detail(self, start=None):
+        """已提取详情的公告（新日期在前）；start 限定发布日期不早于该日期（走 date_ord 索引）"""
+        sql = "SELECT * FROM notices WHERE detail_extracted_at IS NOT NULL"
+        params = []
+        if start:
+            sql += " AND date_ord >= ?"
+            params.append(date_ordinal(start))
+        with self._lock:
+            rows = self._conn.execute(sql + " ORDER BY date_ord DESC, id DESC", params).fetchall()
+        return [self._to_notice(row) for row in rows]
+
+    def set_details(self, notices):
+        """保存已提取的详情（单个事务）"""
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "UPDATE notices SET detail = ?, detail_extracted_at = ? WHERE url = ?",
+                [(json.dumps(n['detail'], ensure_ascii=False), n['detail_extracted_at'], n['url'])
+                 for n in notices])
+
+    def migrate_from_json(self, json_file):
+        """从旧的 notices.json 导入，返回新增条数"""
+        with open(json_file, 'r', encoding='utf-8') as f:
+            notices = json.load(f)
+        # JSON 中新公告在前，倒序导入以保持原有的先后顺序
+        inserted = self.upsert_many(reversed(notices))
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('migrated_from', ?)",
+                               (os.path.abspath(json_file),))
+        return inserted
+
+
+def main():
+    if len(sys.argv) >= 2 and sys.argv[1] == "migrate":
+        json_file = sys.argv[2] if len(sys.argv) > 2 else LEGACY_JSON_FILE
+        store = NoticeStore(legacy_json=None)
+        count = store.migrate_from_json(json_file)
+        print(f"已导入 {count} 条公告，公告库共 {store.count()} 条：{store.db_file}")
+    else:
+        print("用法：python notice_store.py migrate [notices.json 路径]")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+按站点限速
+每个站点一个令牌桶；请求失败（429/5xx/网络错误）时指数退避并加随机抖动，
+优先遵守服务器返回的 Retry-After，并临时降低该站点的速率，成功后逐步恢复
+所有抓取脚本和高德地图调用共用同一个限速器
+"""
+
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+from settings import load_settings
+
+# 需要退避重试的 HTTP 状态码（其余 4xx 重试无意义）
+RETRYABLE_STATUS = {408, 425, 429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """令牌桶：rate 为每秒补充的令牌数，capacity 为允许的突发请求数"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def reserve(self, now):
+        """预订一个令牌，返回需要等待的秒数"""
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+
+class _HostState:
+    def __init__(self, rate, burst, min_rate):
+        self.base_rate = rate
+        self.min_rate = min(min_rate, rate)
+        self.bucket = TokenBucket(rate, burst)
+        self.failures = 0
+        self.blocked_until = 0.0
+
+
+class HostRateLimiter:
+    """按站点（host）独立限速"""
+
+    def __init__(self, requests_per_second=0.5, burst=1, backoff_base_seconds=2,
+                 backoff_max_seconds=120, min_requests_per_second=0.05, hosts=None):
+        self.requests_per_second = requests_per_second
+        self.burst = burst
+        self.backoff_base = backoff_base_seconds
+        self.backoff_max = backoff_max_seconds
+        self.min_rate = min_requests_per_second
+        self.host_overrides = dict(hosts or {})
+        self._lock = threading.Lock()
+        self._hosts = {}
+
+    @classmethod
+    def from_settings(cls, settings):
+        """从 settings.rate_limit 配置段创建"""
+        return cls(**settings.get('rate_limit', {}))
+
+    def share_host_settings(self, url, like_url):
+        """url 的站点没有单独配置时沿用 like_url 站点的配置（如高德 base_url 指向代理或本地模拟服务）"""
+        host, like_host = urlparse(url).netloc, urlparse(like_url).netloc
+        with self._lock:
+            if host not in self.host_overrides and like_host in self.host_overrides:
+                self.host_overrides[host] = self.host_overrides[like_host]
+
+    def _state(self, url):
+        host = urlparse(url).netloc
+        state = self._hosts.get(host)
+        if state is None:
+            override = self.host_overrides.get(host, {})
+            state = _HostState(override.get('requests_per_second', self.requests_per_second),
+                               override.get('burst', self.burst),
+                               override.get('min_requests_per_second', self.min_rate))
+            self._hosts[host] = state
+        return state
+
+    def acquire(self, url):
+        """等待直到可以向该站点发出下一个请求"""
+        with self._lock:
+            state = self._state(url)
+            now = time.monotonic()
+            wait = max(state.bucket.reserve(now), state.blocked_until - now)
+        if wait > 0:
+            time.sleep(wait)
+
+    def record_success(self, url):
+        """请求成功：清除退避状态，速率逐步恢复到配置值"""
+        with self._lock:
+            state = self._state(url)
+            state.failures = 0
+            bucket = state.bucket
+            if bucket.rate < state.base_rate:
+                bucket.rate = min(state.base_rate, bucket.rate * 1.25)
+
+    def record_failure(self, url, response=None):
+        """
+        请求失败：按 Retry-After 或指数退避（带抖动）暂停该站点，并降低其速率
+        返回下次请求前的等待秒数
+        """
+        with self._lock:
+            state = self._state(url)
+            state.failures += 1
+            delay = retry_after_seconds(response)
+            if delay is None:
+                ceiling = min(self.backoff_max, self.backoff_base * 2 ** (state.failures - 1))
+                delay = ceiling / 2 + random.uniform(0, ceiling / 2)
+            state.blocked_until = max(state.blocked_until, time.monotonic() + delay)
+            state.bucket.rate = max(state.min_rate, state.bucket.rate / 2)
+            return delay
+
+    @staticmethod
+    def is_retryable(response=None):
+        """网络错误（无响应）和 RETRYABLE_STATUS 中的状态码值得重试"""
+        status = getattr(response, 'status_code', None)
+        return status is None or status in RETRYABLE_STATUS
+
+
+def retry_after_seconds(response):
+    """解析 Retry-After 响应头（秒数或 HTTP 日期），没有则返回 None"""
+    headers = getattr(response, 'headers', None)
+    value = headers.get('Retry-After') if headers else None
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+_shared_limiter = None
+_shared_lock = threading.Lock()
+
+
+def get_rate_limiter():
+    """获取进程内共享的限速器（首次调用时按配置创建）"""
+    global _shared_limiter
+    with _shared_lock:
+        if _shared_limiter is None:
+            _shared_limiter = HostRateLimiter.from_settings(load_settings())
+        return _shared_limiter
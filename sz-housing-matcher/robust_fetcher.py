@@ -5,23 +5,52 @@
 """
 
 import requests
-from bs4 import BeautifulSoup
-from datetime import datetime, timedelta
+from datetime import datetime
 import json
-import time
 import os
-from urllib.parse import urljoin
+import re
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin, urlparse
+
+from crawl_state import CrawlState, extract_post_id
+from detail_extractor import DetailPipeline
+from http_cache import HttpCache
+from link_extractor import SELECTORS, get_engine
+from notice_classifier import LINK_TAGS, classify, get_classifier, is_relevant
+from notice_store import NoticeStore, recent_start
+from rate_limiter import get_rate_limiter
+from settings import load_settings
+
+DATE_PATTERN = re.compile(r'(\d{4})[-年](\d{1,2})[-月](\d{1,2})')
+
+# 学习到的提取方案命中数低于近期平均值的该比例时重新学习
+PLAN_RELEARN_RATIO = 0.5
+PLAN_HISTORY_SIZE = 10
+PLAN_KEYWORD = "keyword"
+
+# _fetch_list_page 的返回值：页面不存在（已超出最后一页）
+PAGE_GONE = object()
 
 class HousingDataFetcher:
     """保障房数据收集器"""
 
-    def __init__(self):
+    def __init__(self, max_workers=None, rate_limiter=None):
+        crawler_settings = load_settings().get('crawler', {})
+        # 总并发（同时抓取的站点数）与单站限速（settings.rate_limit）分开配置
+        self.max_workers = max_workers or crawler_settings.get('max_workers', 4)
+        self.rate_limiter = rate_limiter or get_rate_limiter()
+
         self.config_dir = os.path.expanduser("~/.sz-housing")
-        self.data_file = os.path.join(self.config_dir, "notices.json")
+        self.store = NoticeStore()
         self.session = requests.Session()
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
         })
+        self.http_cache = HttpCache() if crawler_settings.get('http_cache', True) else None
+        self.crawl_state = CrawlState()
+        self.max_pages = crawler_settings.get('max_pages', 50)
+        self.parser = get_engine(crawler_settings.get('parser', 'lxml'))
 
         # 官方数据源配置
         self.sources = {
@@ -44,60 +73,88 @@ class HousingDataFetcher:
             "guangming": {
                 "name": "光明区住建局",
                 "base_url": "https://www.szgm.gov.cn",
-                "notice_url": "https://www.szgm.gov.cn/gmjsj/zcfg/"
+                "notice_url": "https://www.szgm.gov.cn/gmjsj/zcfg/",
+                "page_template": "index_{page}.html"
             }
         }
 
-    def fetch_page(self, url, max_retries=3):
+        if crawler_settings.get('include_all_districts'):
+            self._load_district_sources()
+
+    def _load_district_sources(self):
+        """从 urls.json 追加各区住建局数据源"""
+        urls_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), "urls.json")
+        with open(urls_file, 'r', encoding='utf-8') as f:
+            districts = json.load(f).get('districts', [])
+
+        for district in districts:
+            parsed = urlparse(district['policy_page'])
+            self.sources.setdefault(district['name'], {
+                "name": f"{district['name']}住建局",
+                "base_url": f"{parsed.scheme}://{parsed.netloc}",
+                "notice_url": district['policy_page']
+            })
+
+    def fetch_page(self, url, max_retries=3, use_cache=True):
         """获取网页内容（带重试）"""
+        html, _ = self.fetch_page_conditional(url, max_retries, use_cache)
+        return html
+
+    def fetch_page_conditional(self, url, max_retries=3, use_cache=True):
+        """获取网页内容（带重试和条件请求缓存），返回 (html, 是否有变化)"""
+        html, changed, _ = self.fetch_page_status(url, max_retries, use_cache)
+        return html, changed
+
+    def fetch_page_status(self, url, max_retries=3, use_cache=True):
+        """
+        同 fetch_page_conditional，另返回获取失败时页面是否确实不存在：(html, 是否有变化, 页面不存在)
+        不可重试的 4xx（如超出最后一页的 404）为页面不存在；重试用尽的临时错误不是
+        """
         for attempt in range(max_retries):
+            # 按站点限速；上次失败后的退避等待也在这里完成
+            self.rate_limiter.acquire(url)
             try:
-                response = self.session.get(url, timeout=15)
-                response.raise_for_status()
-                response.encoding = 'utf-8'
-                return response.text
+                if self.http_cache and use_cache:
+                    result = self.http_cache.fetch(self.session, url, timeout=15)
+                else:
+                    response = self.session.get(url, timeout=15)
+                    response.raise_for_status()
+                    response.encoding = 'utf-8'
+                    result = response.text, True
+                self.rate_limiter.record_success(url)
+                return result + (False,)
             except Exception as e:
                 print(f"  获取 {url} 失败（尝试 {attempt + 1}/{max_retries}）: {e}")
-                if attempt < max_retries - 1:
-                    time.sleep(2)
-                else:
-                    return None
-
-    def parse_notice_list(self, html, base_url):
-        """解析公告列表页"""
+                response = getattr(e, 'response', None)
+                if not self.rate_limiter.is_retryable(response):
+                    return None, False, True  # 页面不存在（如超出最后一页），重试无意义
+                self.rate_limiter.record_failure(url, response)
+        return None, False, False
+
+    def page_url(self, source_info, page):
+        """列表页分页地址：第0页为栏目首页，之后为 index_1.shtml、index_2.shtml ..."""
+        if page == 0:
+            return source_info['notice_url']
+        template = source_info.get('page_template', 'index_{page}.shtml')
+        return urljoin(source_info['notice_url'], template.format(page=page))
+
+    def parse_notice_list(self, html, base_url, limit=20, source_key=None):
+        """解析公告列表页（传入 source_key 时使用该数据源学习到的提取方案）"""
         notices = []
-        soup = BeautifulSoup(html, 'html.parser')
-
-        # 多种选择器模式（适应不同网站结构）
-        selectors = [
-            'ul li a[href*="content/post"]',  # 深圳市政府通用模式
-            'a[href*="/tzgg/content/"]',      # 通知公告链接
-            '.notice-list a',                  # 通知列表类
-            '.article-list a',                 # 文章列表类
-            'ul.list-txt li a',                # 文本列表
-            '.txt-list li a'                   # 另一种文本列表
-        ]
-
-        for selector in selectors:
-            links = soup.select(selector)
-            if links:
-                print(f"  使用选择器: {selector}, 找到 {len(links)} 个链接")
-                break
-        else:
-            # 如果都没找到，尝试获取所有包含"配售"、"配租"的链接
-            print("  使用关键词搜索...")
-            all_links = soup.find_all('a', href=True)
-            links = [a for a in all_links if any(kw in a.get_text() for kw in ['配售', '配租', '安居房', '人才房', '公租房', '保障房'])]
+        engine = self.parser
+        doc = engine.load(html)
+
+        links = self._select_links(doc, source_key)
 
         # 提取信息
-        for link in links[:20]:  # 限制最多获取20条
+        for link in links[:limit]:  # 单页模式限制最多获取20条，分页抓取时不限
             try:
-                title = link.get_text(strip=True)
-                href = link.get('href', '')
+                title = engine.text(link)
+                href = engine.href(link)
 
-                # 过滤相关公告
-                keywords = ['安居房', '人才房', '公租房', '保障房', '配售', '配租', '住房']
-                if not any(kw in title for kw in keywords):
+                # 过滤相关公告（分类标签随公告保存）
+                tags = classify(title)
+                if not is_relevant(tags):
                     continue
 
                 # 构建完整URL
@@ -109,38 +166,105 @@ class HousingDataFetcher:
                     full_url = href
 
                 # 尝试从标题或周围元素提取日期
-                date = self.extract_date(link, title)
+                date = self.extract_date(title, lambda: engine.nearby_date_text(link))
 
                 notices.append({
                     "title": title,
                     "url": full_url,
                     "date": date,
                     "source": self.get_source_name(base_url),
-                    "fetched_at": datetime.now().isoformat()
+                    "fetched_at": datetime.now().isoformat(),
+                    "tags": tags
                 })
             except Exception as e:
                 continue
 
         return notices
 
-    def extract_date(self, link_element, title):
-        """提取日期"""
-        import re
-
+    def _run_plan(self, doc, plan):
+        """执行一种提取方案：选择器序号，或 None 表示关键词搜索"""
+        engine = self.parser
+        if plan is not None:
+            return engine.select(doc, plan)
+        # 尝试获取所有包含"配售"、"配租"、房源类型的链接
+        classifier = get_classifier()
+        return [a for a in engine.anchors(doc) if not LINK_TAGS.isdisjoint(classifier.tags(engine.text(a)))]
+
+    def _learn_plan(self, doc):
+        """依次尝试所有选择器，返回 (方案, 链接)"""
+        # 多种选择器模式（适应不同网站结构），见 link_extractor.SELECTORS
+        for index in range(len(SELECTORS)):
+            links = self._run_plan(doc, index)
+            if links:
+                return index, links
+        return None, self._run_plan(doc, None)
+
+    def _select_links(self, doc, source_key=None):
+        """
+        选出列表链接
+        优先使用该数据源上次成功的方案；命中为0或明显少于历史水平时重新学习
+        """
+        state = self.crawl_state.get(source_key) if source_key else {}
+        plan_info = state.get('extraction_plan')
+
+        links = None
+        if plan_info:
+            plan = self._plan_from_selector(plan_info['selector'])
+            links = self._run_plan(doc, plan)
+            recent = plan_info.get('recent_hits') or []
+            baseline = sum(recent) / len(recent) if recent else 0
+            if not links or len(links) < baseline * PLAN_RELEARN_RATIO:
+                links = None
+
+        if links is None:
+            plan, links = self._learn_plan(doc)
+            if source_key:
+                self._record_plan(source_key, state, plan, len(links))
+        elif source_key:
+            recent = (plan_info.get('recent_hits') or [])[-(PLAN_HISTORY_SIZE - 1):] + [len(links)]
+            self.crawl_state.update(source_key, extraction_plan=dict(plan_info, recent_hits=recent))
+
+        print(f"  使用{'选择器: ' + self._plan_selector(plan) if plan is not None else '关键词搜索'}, 找到 {len(links)} 个链接")
+        return links
+
+    def _plan_selector(self, plan):
+        return SELECTORS[plan][0] if plan is not None else PLAN_KEYWORD
+
+    def _plan_from_selector(self, selector):
+        for index, (css, _) in enumerate(SELECTORS):
+            if css == selector:
+                return index
+        return None
+
+    def _record_plan(self, source_key, state, plan, hits):
+        """保存重新学习得到的方案，方案变化时记录网站改版"""
+        now = datetime.now().isoformat()
+        selector = self._plan_selector(plan)
+        previous = state.get('extraction_plan')
+
+        fields = {"extraction_plan": {"selector": selector, "learned_at": now, "recent_hits": [hits]}}
+        if previous and previous['selector'] != selector:
+            print(f"  ⚠️ 页面结构变化：{previous['selector']} -> {selector}")
+            changes = state.get('layout_changes', [])
+            fields["layout_changes"] = changes + [{"at": now, "from": previous['selector'], "to": selector}]
+        elif previous:
+            # 方案未变（如末页条目较少），保留学习时间
+            fields["extraction_plan"]["learned_at"] = previous.get('learned_at', now)
+        self.crawl_state.update(source_key, **fields)
+
+    def extract_date(self, title, nearby_text=None):
+        """提取日期（nearby_text 为惰性获取链接周围日期文本的函数）"""
         # 尝试从标题中提取日期
-        date_match = re.search(r'(\d{4})[-年](\d{1,2})[-月](\d{1,2})', title)
+        date_match = DATE_PATTERN.search(title)
         if date_match:
             return f"{date_match.group(1)}-{date_match.group(2).zfill(2)}-{date_match.group(3).zfill(2)}"
 
         # 尝试从周围的span、time等元素获取
-        parent = link_element.parent
-        if parent:
-            date_element = parent.find(['span', 'time', 'div'], class_=re.compile(r'date|time'))
-            if date_element:
-                date_text = date_element.get_text(strip=True)
-                date_match = re.search(r'(\d{4})[-年](\d{1,2})[-月](\d{1,2})', date_text)
-                if date_match:
-                    return f"{date_match.group(1)}-{date_match.group(2).zfill(2)}-{date_match.group(3).zfill(2)}"
+        date_text = nearby_text() if nearby_text else None
+        if date_text:
+            date_match = DATE_PATTERN.search(date_text)
+            if date_match:
+                return f"{date_match.group(1)}-{date_match.group(2).zfill(2)}-{date_match.group(3).zfill(2)}"
 
         # 默认返回今天
         return datetime.now().strftime('%Y-%m-%d')
@@ -152,41 +276,170 @@ class HousingDataFetcher:
                 return source['name']
         return "未知来源"
 
-    def fetch_all_sources(self):
-        """从所有数据源获取公告"""
+    def fetch_all_sources(self, full_history=False):
+        """从所有数据源获取公告（返回最近90天）"""
+        return self.filter_recent(self.crawl_all_sources(full_history))
+
+    def crawl_all_sources(self, full_history=False):
+        """增量抓取所有数据源，返回去重后的全部公告"""
         all_notices = []
-        cutoff_date = datetime.now() - timedelta(days=90)  # 最近90天
 
         print("\n" + "=" * 80)
         print("开始收集保障房公告信息...")
         print("=" * 80)
 
+        # 按站点分组：同一站点串行（受礼貌间隔约束），不同站点并行
+        host_groups = {}
+        for source_key, source_info in self.sources.items():
+            host = urlparse(source_info['notice_url']).netloc
+            host_groups.setdefault(host, []).append(source_key)
+
+        workers = max(1, min(self.max_workers, len(host_groups)))
+        results = {}
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for group_results in executor.map(lambda keys: self._fetch_host_group(keys, full_history),
+                                              host_groups.values()):
+                results.update(group_results)
+
+        # 按数据源原有顺序汇总，保证输出稳定
         for source_key, source_info in self.sources.items():
+            notices = results.get(source_key)
             print(f"\n【{source_info['name']}】")
             print(f"URL: {source_info['notice_url']}")
-
-            html = self.fetch_page(source_info['notice_url'])
-            if html:
-                notices = self.parse_notice_list(html, source_info['base_url'])
+            if notices is None:
+                print(f"获取失败")
+            else:
                 print(f"找到 {len(notices)} 条相关公告")
                 all_notices.extend(notices)
 
-                # 礼貌性延迟
-                time.sleep(2)
-            else:
-                print(f"获取失败")
+        return self.deduplicate_notices(all_notices)
 
-        # 去重和过滤
-        unique_notices = self.deduplicate_notices(all_notices)
-        recent_notices = [n for n in unique_notices
-                         if datetime.strptime(n['date'], '%Y-%m-%d') >= cutoff_date]
+    def filter_recent(self, notices, days=90):
+        """过滤出最近N天的公告（ISO 日期直接按字符串比较，不逐条解析）"""
+        cutoff = recent_start(days).isoformat()
+        recent_notices = [n for n in notices if n['date'] >= cutoff]
 
         print("\n" + "=" * 80)
-        print(f"总计找到 {len(unique_notices)} 条唯一公告（最近90天: {len(recent_notices)} 条）")
+        print(f"总计找到 {len(notices)} 条唯一公告（最近{days}天: {len(recent_notices)} 条）")
         print("=" * 80)
 
         return recent_notices
 
+    def _fetch_host_group(self, source_keys, full_history=False):
+        """抓取同一站点下的所有数据源（在工作线程中执行）"""
+        return {source_key: self.crawl_source(source_key, full_history) for source_key in source_keys}
+
+    def _fetch_list_page(self, url, base_url, source_key=None):
+        """
+        获取并解析一页列表，页面未变化时直接复用上次解析结果
+        获取失败时返回 None，页面确实不存在（已超出最后一页）时返回 PAGE_GONE
+        """
+        html, changed, gone = self.fetch_page_status(url)
+        if not html:
+            return PAGE_GONE if gone else None
+
+        cached = self.http_cache.get_parsed(url, 'robust_fetcher') if self.http_cache and not changed else None
+        if cached is not None:
+            print(f"  {url} 未变化，跳过解析")
+            return cached
+
+        notices = self.parse_notice_list(html, base_url, limit=None, source_key=source_key)
+        if self.http_cache:
+            self.http_cache.set_parsed(url, 'robust_fetcher', notices)
+        return notices
+
+    def crawl_source(self, source_key, full_history=False):
+        """
+        分页抓取单个数据源
+        日常运行遇到只含已知公告的页面即停止；首次运行或 full_history 时翻到最后一页
+        补抓历史每次最多翻 max_pages 页，停下的页码记入 crawl_state 的 catch_up_page，下次运行先抓最新公告，
+        再从该页继续；确实翻到了最后一页才记录 full_history_at，之后转为日常运行
+        """
+        source_info = self.sources[source_key]
+        state = self.crawl_state.get(source_key)
+        high_water_id = state.get('newest_post_id')
+        catch_up = full_history or not state.get('full_history_at')
+        resume_page = (state.get('catch_up_page') or 0) if catch_up else 0
+
+        result = self._crawl_pages(source_key, 0, not catch_up or resume_page > 0, high_water_id)
+        if result is None:
+            return None
+        notices, pages, reached_end, next_page = result
+
+        if catch_up and resume_page > 0 and not reached_end:
+            print(f"  {source_info['name']} 从第 {resume_page} 页继续补抓历史公告")
+            deep = self._crawl_pages(source_key, resume_page, False, high_water_id)
+            if deep is None:
+                next_page = resume_page  # 续抓的第一页获取失败，下次仍从这里开始
+            else:
+                notices.extend(deep[0])
+                pages += deep[1]
+                reached_end, next_page = deep[2], deep[3]
+
+        if catch_up and not reached_end:
+            print(f"  {source_info['name']} 未翻到最后一页，下次运行从第 {next_page} 页继续补抓历史公告")
+        self._update_high_water_mark(source_key, state, notices, pages, catch_up and reached_end,
+                                     next_page if catch_up and not reached_end else None)
+        return notices
+
+    def _crawl_pages(self, source_key, first_page, stop_at_known, high_water_id):
+        """
+        从 first_page 起最多翻 max_pages 页；stop_at_known 时遇到只含已知公告的页面即停止
+        返回 (公告, 翻页数, 是否翻到了最后一页, 下一页页码)；first_page 获取失败时返回 None
+        """
+        source_info = self.sources[source_key]
+        notices = []
+        previous_urls = None
+        pages = 0
+        reached_end = False
+        for page in range(first_page, first_page + self.max_pages):
+            page_notices = self._fetch_list_page(self.page_url(source_info, page), source_info['base_url'], source_key)
+            if page_notices is None or page_notices is PAGE_GONE:
+                reached_end = page_notices is PAGE_GONE  # 超出最后一页；临时错误时不算翻完
+                if page == first_page and not (reached_end and first_page > 0):
+                    return None
+                break
+            pages += 1
+
+            page_urls = [n['url'] for n in page_notices]
+            if page_urls and page_urls == previous_urls:
+                reached_end = True  # 部分站点越界时返回最后一页的内容
+                break
+            previous_urls = page_urls
+            notices.extend(page_notices)
+
+            new_notices = [n for n in page_notices if not self._is_known(n, high_water_id)]
+            if stop_at_known and not new_notices:
+                break
+        else:
+            print(f"  {source_info['name']} 已达到最大翻页数 {self.max_pages}")
+        return notices, pages, reached_end, first_page + pages
+
+    def _is_known(self, notice, high_water_id):
+        """公告是否已在库中（或不晚于该数据源的高水位）"""
+        if self.store.has_url(notice['url']):
+            return True
+        post_id = extract_post_id(notice['url'])
+        return high_water_id is not None and post_id is not None and post_id <= high_water_id
+
+    def _update_high_water_mark(self, source_key, state, notices, pages, history_complete, catch_up_page=None):
+        post_ids = [pid for pid in (extract_post_id(n['url']) for n in notices) if pid is not None]
+        dates = [n['date'] for n in notices]
+
+        fields = {
+            "last_crawl_at": datetime.now().isoformat(),
+            "last_pages": pages
+        }
+        if post_ids:
+            fields["newest_post_id"] = max(post_ids + [state.get('newest_post_id') or 0])
+        if dates:
+            fields["newest_date"] = max(dates + [state.get('newest_date') or ''])
+        if history_complete:
+            fields["full_history_at"] = fields["last_crawl_at"]
+        if history_complete or catch_up_page is not None:
+            fields["catch_up_page"] = catch_up_page
+        self.crawl_state.update(source_key, **fields)
+
     def deduplicate_notices(self, notices):
         """去重（基于URL）"""
         seen_urls = set()
@@ -200,31 +453,22 @@ class HousingDataFetcher:
         return unique
 
     def save_notices(self, notices):
-        """保存公告到文件"""
-        os.makedirs(self.config_dir, exist_ok=True)
-
-        # 读取已有数据
-        existing = []
-        if os.path.exists(self.data_file):
-            with open(self.data_file, 'r', encoding='utf-8') as f:
-                existing = json.load(f)
-
-        # 合并新数据（基于URL去重）
-        existing_urls = {n['url'] for n in existing}
-        new_count = 0
-
-        for notice in notices:
-            if notice['url'] not in existing_urls:
-                existing.insert(0, notice)  # 新数据放在前面
-                existing_urls.add(notice['url'])
-                new_count += 1
-
-        # 保存
-        with open(self.data_file, 'w', encoding='utf-8') as f:
-            json.dump(existing, f, ensure_ascii=False, indent=2)
-
-        print(f"\n💾 数据已保存到: {self.data_file}")
-        print(f"   新增 {new_count} 条公告，总计 {len(existing)} 条")
+        """保存公告到公告库（按URL去重，只写入新增的行）"""
+        new_count = self.store.upsert_many(notices)
+
+        print(f"\n💾 数据已保存到: {self.store.db_file}")
+        print(f"   新增 {new_count} 条公告，总计 {self.store.count()} 条")
+
+    def extract_details(self):
+        """
+        为已保存但尚未提取详情的公告抓取详情页
+        只处理最近 crawler.detail_days 天的公告（首次补抓的历史公告不逐条请求详情页），失败的记入公告库
+        """
+        days = load_settings().get('crawler', {}).get('detail_days', 90)
+        pending = self.store.without_detail(start=recent_start(days))
+        if DetailPipeline(self).run(pending):
+            self.store.set_details([n for n in pending if 'detail' in n])
+        self.store.record_detail_failures([n for n in pending if 'detail_failed_at' in n])
 
     def display_notices(self, notices, limit=15):
         """显示公告列表"""
@@ -243,20 +487,24 @@ class HousingDataFetcher:
 
         print("\n" + "=" * 80)
 
-    def run(self):
+    def run(self, full_history=False):
         """运行主程序"""
         print("\n" + "🏠" * 40)
         print("\n深圳市保障房数据收集器")
         print(f"执行时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
 
         # 获取数据
-        notices = self.fetch_all_sources()
+        all_notices = self.crawl_all_sources(full_history)
+        notices = self.filter_recent(all_notices)
 
         # 显示结果
         self.display_notices(notices)
 
-        # 保存数据
-        self.save_notices(notices)
+        # 保存数据（包括翻页获取到的历史公告）
+        self.save_notices(all_notices)
+
+        # 提取新公告的详情（项目、户型、申请时间等）
+        self.extract_details()
 
         print("\n✅ 数据收集完成！")
         print("\n💡 提示：")
@@ -267,8 +515,10 @@ class HousingDataFetcher:
 
 def main():
     """主函数"""
+    # --full：忽略高水位，重新翻页抓取全部历史公告
+    full_history = "--full" in sys.argv[1:]
     fetcher = HousingDataFetcher()
-    fetcher.run()
+    fetcher.run(full_history)
 
 if __name__ == "__main__":
     main()
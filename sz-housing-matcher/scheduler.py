@@ -0,0 +1,372 @@
+#!/usr/bin/env python3
+"""
+自适应轮询调度器
+用一个按时间排序的优先队列（heapq）安排两类任务：
+- 数据源列表页：间隔与该来源近期的发布频率成反比（很少发布的来源自动降低频率，最长不超过
+  settings.search_frequency_days），并只在网站的发布时段内轮询（由已入库公告的抓取时刻学习）
+- 申请中的公告详情页：距离 application_end 越近轮询越频繁（间隔为剩余时间的一部分），截止后不再轮询
+发现的新公告写入公告库并提取详情，新的申请自动加入队列；重启后按 crawl_state.json 中的上次抓取时间继续
+
+用法：
+  python scheduler.py                 启动调度器（需开启 settings.auto_search_enabled）
+  python scheduler.py plan [条数]     查看接下来的轮询计划，不发出请求
+  python scheduler.py simulate [天数] 用模拟的发布记录对比固定间隔轮询的请求数和发现延迟
+"""
+
+import heapq
+import itertools
+import random
+import sys
+import time
+from bisect import bisect_left
+from collections import Counter
+from datetime import datetime, timedelta
+
+from notice_store import recent_start
+from settings import load_settings
+
+# 尚未学到发布时段时按工作时间轮询
+DEFAULT_PUBLICATION_HOURS = frozenset(range(9, 18))
+
+# 按最近多少天的公告数估计数据源的发布频率
+RATE_WINDOW_DAYS = 90
+
+SOURCE = "source"
+NOTICE = "notice"
+
+
+def application_deadline(detail):
+    """公告详情中的申请截止时刻；只有日期时按当天结束计"""
+    end = (detail or {}).get('application_end')
+    if not end:
+        return None
+    try:
+        deadline = datetime.fromisoformat(end)
+    except ValueError:
+        return None
+    return deadline if ' ' in end else deadline + timedelta(days=1)
+
+
+class PollPolicy:
+    """轮询间隔的计算规则（settings.scheduler）"""
+
+    def __init__(self, settings=None):
+        settings = load_settings() if settings is None else settings
+        scheduler_settings = settings.get('scheduler', {})
+        self.base_interval = timedelta(hours=scheduler_settings.get('source_interval_hours', 2))
+        self.min_interval = timedelta(minutes=scheduler_settings.get('min_interval_minutes', 30))
+        self.max_interval = timedelta(days=settings.get('search_frequency_days', 7))
+        self.deadline_divisor = scheduler_settings.get('deadline_divisor', 8)
+        self.hour_share = scheduler_settings.get('publication_hour_share', 0.05)
+        self.min_samples = scheduler_settings.get('min_samples', 5)
+        self.application_days = scheduler_settings.get('application_days', 90)
+
+    def publication_hours(self, hour_counts):
+        """
+        发布时段：占已观察公告比例不低于 publication_hour_share 的小时；样本不足时为工作时间
+        发布时刻很分散时可能没有任何小时达到该比例，此时返回空集合，轮询不按时段对齐
+        """
+        total = sum(hour_counts.values())
+        if total < self.min_samples:
+            return DEFAULT_PUBLICATION_HOURS
+        return frozenset(hour for hour, count in hour_counts.items() if count >= total * self.hour_share)
+
+    def _clamp(self, interval):
+        return min(self.max_interval, max(self.min_interval, interval))
+
+    @staticmethod
+    def align(when, hours):
+        """推迟到最近的发布时段内（已在时段内则不变）；没有发布时段时不调整"""
+        if not hours:
+            return when
+        for _ in range(24):
+            if when.hour in hours:
+                return when
+            when = (when + timedelta(hours=1)).replace(minute=0, second=0, microsecond=0)
+        return when
+
+    @staticmethod
+    def window_close(now, hours):
+        """now 之后（含当前）第一个发布时段的结束时刻；全天都是发布时段时返回 None"""
+        when = now.replace(minute=0, second=0, microsecond=0)
+        opened = False
+        for _ in range(48):
+            if when.hour in hours:
+                opened = True
+            elif opened:
+                return when
+            when += timedelta(hours=1)
+        return None
+
+    def next_source_poll(self, now, recent_count, hours):
+        """
+        数据源的下次轮询时刻：间隔为 source_interval_hours × 平均几天发布一条（最近 RATE_WINDOW_DAYS 天有
+        recent_count 条），推迟到发布时段内，但不超过最长间隔
+        每天都要轮询的数据源在每个发布时段结束时至少轮询一次，下午的公告不会拖到第二天才发现
+        """
+        interval = self._clamp(self.base_interval * RATE_WINDOW_DAYS / max(recent_count, 1))
+        close = self.window_close(now, hours) if interval < timedelta(days=1) else None
+        if close and close < now + interval:
+            return close
+        return min(self.align(now + interval, hours), now + self.max_interval)
+
+    def next_deadline_poll(self, now, deadline, hours):
+        """申请中公告的下次轮询时刻：间隔为剩余时间的 1/deadline_divisor；来不及在截止前轮询时返回 None"""
+        when = now + self._clamp((deadline - now) / self.deadline_divisor)
+        if when > deadline:
+            return None
+        aligned = self.align(when, hours)
+        return aligned if aligned <= deadline else when
+
+
+class PollScheduler:
+    """数据源和申请中公告的轮询队列"""
+
+    def __init__(self, fetcher=None, policy=None):
+        if fetcher is None:
+            from robust_fetcher import HousingDataFetcher
+            fetcher = HousingDataFetcher()
+        self.fetcher = fetcher
+        self.store = fetcher.store
+        self.crawl_state = fetcher.crawl_state
+        self.policy = policy or PollPolicy()
+        self._queue = []
+        self._seq = itertools.count()
+        # 已在队列中的申请：url -> 公告
+        self._applications = {}
+
+    def _push(self, when, kind, key):
+        heapq.heappush(self._queue, (when, next(self._seq), kind, key))
+
+    def _hours(self, source_name):
+        return self.policy.publication_hours(self.store.fetch_hours(source_name))
+
+    def _next_source_poll(self, source_name, now):
+        recent_count = self.store.count(source_name, recent_start(RATE_WINDOW_DAYS, now.date()))
+        return self.policy.next_source_poll(now, recent_count, self._hours(source_name))
+
+    def schedule_sources(self, now):
+        """按上次抓取时间安排各数据源，从未抓取过的立即抓取"""
+        for source_key, source_info in self.fetcher.sources.items():
+            last_crawl_at = self.crawl_state.get(source_key).get('last_crawl_at')
+            when = now
+            if last_crawl_at:
+                when = max(now, self._next_source_poll(source_info['name'], datetime.fromisoformat(last_crawl_at)))
+            self._push(when, SOURCE, source_key)
+
+    def schedule_applications(self, now):
+        """
+        为申请尚未截止、且不在队列中的公告安排详情页轮询
+        只查最近 application_days 天发布的公告（更早的公告申请早已截止），耗时与公告库大小无关
+        """
+        for notice in self.store.with_detail(start=recent_start(self.policy.application_days, now.date())):
+            if notice['url'] in self._applications:
+                continue
+            deadline = application_deadline(notice['detail'])
+            when = deadline and self.policy.next_deadline_poll(now, deadline, self._hours(notice.get('source')))
+            if when:
+                self._applications[notice['url']] = notice
+                self._push(when, NOTICE, notice['url'])
+
+    def poll_source(self, source_key, now):
+        """抓取数据源，保存新公告并提取详情，按更新后的发布频率安排下次轮询"""
+        source_info = self.fetcher.sources[source_key]
+        notices = self.fetcher.crawl_source(source_key)
+        inserted = self.store.upsert_many(notices) if notices else 0
+        print(f"[{now:%m-%d %H:%M}] {source_info['name']}：新增 {inserted} 条公告")
+
+        if inserted:
+            self.fetcher.extract_details()
+            self.schedule_applications(now)
+        self._push(self._next_source_poll(source_info['name'], now), SOURCE, source_key)
+
+    def poll_notice(self, url, now):
+        """重新获取申请中公告的详情页（条件请求），内容变化时重新提取详情"""
+        notice = self._applications[url]
+        html, changed = self.fetcher.fetch_page_conditional(url)
+        if html and changed:
+            from detail_extractor import extract_notice_detail
+            detail = extract_notice_detail(html, notice['title'])
+            if detail != notice['detail']:
+                notice['detail'] = detail
+                notice['detail_extracted_at'] = now.isoformat()
+                self.store.set_details([notice])
+                print(f"[{now:%m-%d %H:%M}] 公告有更新：{notice['title'][:40]}")
+
+        deadline = application_deadline(notice['detail'])
+        when = deadline and self.policy.next_deadline_poll(now, deadline, self._hours(notice.get('source')))
+        if when:
+            self._push(when, NOTICE, url)
+        else:
+            del self._applications[url]
+
+    def _reschedule_failed(self, kind, key, now):
+        """轮询出错时重新排队：数据源按基础间隔重试，公告按截止时间计算（不按发布时段对齐）"""
+        if kind == SOURCE:
+            self._push(now + self.policy.base_interval, SOURCE, key)
+            return
+        deadline = application_deadline(self._applications[key]['detail'])
+        when = deadline and self.policy.next_deadline_poll(now, deadline, frozenset())
+        if when:
+            self._push(when, NOTICE, key)
+        else:
+            del self._applications[key]
+
+    def start(self, now=None):
+        now = now or datetime.now()
+        self.schedule_sources(now)
+        self.schedule_applications(now)
+
+    def run(self):
+        """按队列顺序执行轮询，直到手动停止"""
+        self.start()
+        print(f"调度器已启动：{len(self.fetcher.sources)} 个数据源，{len(self._applications)} 个申请中的公告")
+        while self._queue:
+            when, _, kind, key = heapq.heappop(self._queue)
+            delay = (when - datetime.now()).total_seconds()
+            if delay > 0:
+                time.sleep(delay)
+            now = datetime.now()
+            try:
+                if kind == SOURCE:
+                    self.poll_source(key, now)
+                else:
+                    self.poll_notice(key, now)
+            except Exception as e:
+                # 单次轮询失败（网络、解析或数据库错误）不停止调度器
+                print(f"[{now:%m-%d %H:%M}] 轮询失败（{key}）：{e}")
+                self._reschedule_failed(kind, key, now)
+
+    def print_plan(self, limit=20):
+        """显示接下来的轮询计划"""
+        self.start()
+        print(f"{len(self.fetcher.sources)} 个数据源，{len(self._applications)} 个申请中的公告，接下来的轮询：")
+        for when, _, kind, key in sorted(self._queue)[:limit]:
+            if kind == SOURCE:
+                name = self.fetcher.sources[key]['name']
+                print(f"  {when:%Y-%m-%d %H:%M}  数据源 {name}"
+                      f"（最近 {RATE_WINDOW_DAYS} 天 {self.store.count(name, recent_start(RATE_WINDOW_DAYS))} 条公告）")
+            else:
+                notice = self._applications[key]
+                print(f"  {when:%Y-%m-%d %H:%M}  公告 {notice['title'][:30]}"
+                      f"（截止 {notice['detail']['application_end']}）")
+
+
+def _poll_delays(events, polls):
+    """每个事件到其后第一次轮询的间隔（小时）；之后没有轮询的事件返回 None"""
+    delays = []
+    for event in events:
+        i = bisect_left(polls, event)
+        delays.append((polls[i] - event).total_seconds() / 3600 if i < len(polls) else None)
+    return delays
+
+
+def _simulated_world(days, seed=0):
+    """
+    模拟的发布记录：各数据源在固定时段发布新公告（包括开始前 RATE_WINDOW_DAYS 天已入库的历史公告），
+    每周五 18:00 截止一个申请，截止当天有一次补充公告
+    """
+    rng = random.Random(seed)
+    start = datetime(2026, 1, 5)
+    sources = [("深圳市住房和建设局", 0.6, (10, 11, 15)), ("福田区住建局", 0.2, (9, 10)),
+               ("龙华区住建局", 0.1, (16, 17)), ("光明区住建局", 0.03, (14,))]
+    publications = {}
+    for name, probability, hours in sources:
+        publications[name] = [start + timedelta(days=d, hours=rng.choice(hours), minutes=rng.randrange(60))
+                              for d in range(-RATE_WINDOW_DAYS, days)
+                              if (start + timedelta(days=d)).weekday() < 5 and rng.random() < probability]
+    applications = []
+    for week in range(days // 7):
+        deadline = start + timedelta(days=7 * week + 4, hours=18)
+        amended = deadline - timedelta(hours=rng.randrange(1, 10), minutes=rng.randrange(60))
+        applications.append((max(start, deadline - timedelta(days=10)), deadline, amended))
+    return start, start + timedelta(days=days), publications, applications
+
+
+def _fixed_polls(start, end, interval):
+    polls, when = [], start
+    while when < end:
+        polls.append(when)
+        when += interval
+    return polls
+
+
+def _adaptive_polls(policy, start, end, publications, applications):
+    """按 PollPolicy 模拟轮询（发布时段从当天发现的公告中学习），返回各数据源和各申请的轮询时刻"""
+    queue = [(start, i, SOURCE, name) for i, name in enumerate(publications)]
+    queue += [(opened, len(queue) + i, NOTICE, i) for i, (opened, _, _) in enumerate(applications)]
+    heapq.heapify(queue)
+    seq = itertools.count(len(queue))
+    source_polls = {name: [] for name in publications}
+    notice_polls = [[] for _ in applications]
+    hour_counts = {name: Counter() for name in publications}
+
+    while queue and queue[0][0] < end:
+        now, _, kind, key = heapq.heappop(queue)
+        if kind == SOURCE:
+            last = source_polls[key][-1] if source_polls[key] else start
+            new = [t for t in publications[key] if last < t <= now]
+            source_polls[key].append(now)
+            hour_counts[key].update(now.hour for t in new if t.date() == now.date())
+            window_start = now - timedelta(days=RATE_WINDOW_DAYS)
+            recent_count = sum(1 for t in publications[key] if window_start < t <= now)
+            when = policy.next_source_poll(now, recent_count, policy.publication_hours(hour_counts[key]))
+        else:
+            notice_polls[key].append(now)
+            when = policy.next_deadline_poll(now, applications[key][1], DEFAULT_PUBLICATION_HOURS)
+        if when:
+            heapq.heappush(queue, (when, next(seq), kind, key))
+    return source_polls, notice_polls
+
+
+def simulate(days=28):
+    policy = PollPolicy()
+    start, end, publications, applications = _simulated_world(days)
+    # 对照：全天固定间隔轮询，以及每天 9 点运行一次
+    runs = []
+    for label, first, interval in ((f"固定每 {policy.base_interval.total_seconds() / 3600:g} 小时轮询", start,
+                                    policy.base_interval),
+                                   ("每天 9 点运行一次", start + timedelta(hours=9), timedelta(days=1))):
+        runs.append((label, {name: _fixed_polls(first, end, interval) for name in publications},
+                     [[when for when in _fixed_polls(first, deadline, interval) if when >= opened]
+                      for opened, deadline, _ in applications]))
+    runs.append(("自适应轮询",) + _adaptive_polls(policy, start, end, publications, applications))
+
+    published = sum(1 for times in publications.values() for t in times if t >= start)
+    print(f"模拟 {days} 天：{len(publications)} 个数据源共发布 {published} 条新公告，"
+          f"{len(applications)} 个申请在截止当天有补充公告")
+    print(f"{'':<18}{'请求数':>8}{'新公告平均发现延迟':>16}{'截止日补充公告发现延迟':>16}{'截止前未发现':>10}")
+    for label, source_polls, notice_polls in runs:
+        requests = sum(map(len, source_polls.values())) + sum(map(len, notice_polls))
+        found = [d for name, times in publications.items()
+                 for d in _poll_delays([t for t in times if t >= start], source_polls[name]) if d is not None]
+        amended = [_poll_delays([amended], polls)[0] for (_, _, amended), polls in zip(applications, notice_polls)]
+        found_amended = [d for d in amended if d is not None]
+        mean_amended = f"{sum(found_amended) / len(found_amended):.2f} 小时" if found_amended else "—"
+        print(f"{label:<18}{requests:>10}{sum(found) / max(1, len(found)):>20.2f} 小时"
+              f"{mean_amended:>23}{amended.count(None):>12}")
+
+
+def main():
+    command = sys.argv[1] if len(sys.argv) > 1 else "run"
+    if command == "plan":
+        PollScheduler().print_plan(int(sys.argv[2]) if len(sys.argv) > 2 else 20)
+        return
+    if command == "simulate":
+        simulate(int(sys.argv[2]) if len(sys.argv) > 2 else 28)
+        return
+    if command != "run":
+        print("用法：python scheduler.py [run | plan [条数] | simulate [天数]]")
+        sys.exit(1)
+
+    if not load_settings().get('auto_search_enabled'):
+        print("未开启自动搜索（settings.auto_search_enabled），调度器不运行；可用 plan 查看轮询计划")
+        return
+    try:
+        PollScheduler().run()
+    except KeyboardInterrupt:
+        print("\n调度器已停止")
+
+
+if __name__ == "__main__":
+    main()
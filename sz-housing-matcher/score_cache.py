@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+匹配分数缓存
+按 (用户画像指纹, 政策指纹) 把申请条件判断结果和各项分数（区域、通勤、房源数量）分别保存到
+~/.sz-housing/score_cache.db；每天重新运行时只需按发布日期重新计算时间衰减的发布时间分再排序。
+指纹只包含参与评分的字段，修改政策或画像中的这些字段只会使相应的条目失效
+
+用法：
+  python score_cache.py [政策数量]   生成模拟政策，对比首次运行、再次运行和修改一条政策后的耗时并校验结果
+  python score_cache.py clear        清空缓存
+"""
+
+import copy
+import hashlib
+import os
+import sqlite3
+import sys
+import threading
+import time
+from datetime import date, datetime
+
+import batch_scorer
+from batch_scorer import BatchScorer, random_policies
+from eligibility import Applicant, compile_requirements, normalize_profile
+
+CONFIG_DIR = os.path.expanduser("~/.sz-housing")
+DEFAULT_DB_FILE = os.path.join(CONFIG_DIR, "score_cache.db")
+
+# 超过该天数未使用的条目在下次运行时清理
+KEEP_DAYS = 30
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS scores (
+    profile_fp INTEGER NOT NULL,
+    policy_fp INTEGER NOT NULL,
+    eligible INTEGER NOT NULL,
+    district_points REAL NOT NULL,
+    commute_points REAL NOT NULL,
+    unit_points REAL NOT NULL,
+    publish_ord INTEGER NOT NULL,
+    used_ord INTEGER NOT NULL,
+    PRIMARY KEY (profile_fp, policy_fp)
+);
+CREATE INDEX IF NOT EXISTS idx_scores_used ON scores (used_ord);
+"""
+
+
+def _digest(text):
+    """64 位内容指纹，可直接作为 SQLite 整数键"""
+    return int.from_bytes(hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest(), 'big', signed=True)
+
+
+def policy_fingerprint(policy):
+    """
+    政策中参与评分的字段：区名、发布日期、房源数量、申请条件、到公司的通勤时间
+    申请条件按 repr 计入（同一来源的键顺序固定，顺序变化最多导致一次重新计算）
+    """
+    transport = policy.get('transport_info')
+    commute = None if transport is None else transport.get('to_company', {}).get('duration_min', 999)
+    return _digest(f"{policy['district']}|{policy['publish_date']}|{policy.get('total_units', 0)}|"
+                   f"{policy.get('requirements', {})!r}|{commute}")
+
+
+def profile_fingerprint(user_profile):
+    """画像中参与评分的字段：规范化后的申请人信息和期望区域（顺序影响区域分）"""
+    applicant = normalize_profile(user_profile)
+    return _digest(repr(([getattr(applicant, name) for name in Applicant.__slots__],
+                         list(user_profile.get('preferences', {}).get('preferred_districts', [])))))
+
+
+class ScoreCache:
+    """分项分数缓存"""
+
+    def __init__(self, db_file=DEFAULT_DB_FILE):
+        self.db_file = db_file
+        os.makedirs(os.path.dirname(db_file), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_file, check_same_thread=False)
+        with self._conn:
+            self._conn.executescript(SCHEMA)
+        self.last_hits = 0
+        self.last_misses = 0
+
+    def _load(self, profile_fp):
+        """该画像已缓存的 {政策指纹: (是否符合, 区域分, 通勤分, 房源数量分, 发布日期序数, 最近使用日)}"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT policy_fp, eligible, district_points, commute_points, unit_points, publish_ord, used_ord "
+                "FROM scores WHERE profile_fp = ?", (profile_fp,)).fetchall()
+        return {row[0]: row[1:] for row in rows}
+
+    def match(self, policies, user_profile, today=None):
+        """
+        与 HousingMatcher.match_policies 相同：返回符合条件的政策（写入 match_score），按分数降序
+        未命中的政策按分项计算后写入缓存；命中的只重新计算发布时间分
+        """
+        today_ord = (today or date.today()).toordinal()
+        profile_fp = profile_fingerprint(user_profile)
+        cached = self._load(profile_fp)
+
+        scorer = None
+        applicant = None
+        new_rows, touched = [], []
+        scored = []
+        for policy in policies:
+            policy_fp = policy_fingerprint(policy)
+            entry = cached.get(policy_fp)
+            if entry is None:
+                if scorer is None:
+                    scorer = BatchScorer(user_profile, today)
+                    applicant = scorer.applicant
+                entry = (int(compile_requirements(policy.get('requirements', {})).check(applicant)),
+                         float(scorer.district_points(policy['district'])),
+                         float(batch_scorer.commute_points(policy)),
+                         float(batch_scorer.unit_points(policy.get('total_units', 0))),
+                         datetime.strptime(policy['publish_date'], '%Y-%m-%d').toordinal(),
+                         today_ord)
+                cached[policy_fp] = entry
+                new_rows.append((profile_fp, policy_fp) + entry)
+            elif entry[5] < today_ord:
+                cached[policy_fp] = entry[:5] + (today_ord,)
+                touched.append((today_ord, profile_fp, policy_fp))
+
+            eligible, district_points, commute_points, unit_points, publish_ord, _ = entry
+            if eligible:
+                # 与 BatchScorer.scores 相同的加法顺序，保证浮点结果一致
+                scored.append((policy, district_points + float(batch_scorer.recency_points(today_ord - publish_ord))
+                               + (commute_points + unit_points)))
+
+        self.last_misses = len(new_rows)
+        self.last_hits = len(policies) - len(new_rows)
+        self._save(new_rows, touched, today_ord)
+
+        # 稳定排序：分数相同的政策保持原有顺序
+        scored.sort(key=lambda x: x[1], reverse=True)
+        matched = []
+        for policy, score in scored:
+            policy['match_score'] = score
+            matched.append(policy)
+        return matched
+
+    def _save(self, new_rows, touched, today_ord):
+        with self._lock, self._conn:
+            if new_rows:
+                self._conn.executemany("INSERT OR REPLACE INTO scores VALUES (?, ?, ?, ?, ?, ?, ?, ?)", new_rows)
+            if touched:
+                self._conn.executemany(
+                    "UPDATE scores SET used_ord = ? WHERE profile_fp = ? AND policy_fp = ?", touched)
+            self._conn.execute("DELETE FROM scores WHERE used_ord < ?", (today_ord - KEEP_DAYS,))
+
+    def clear(self):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM scores")
+
+
+_shared_cache = None
+_shared_lock = threading.Lock()
+
+
+def get_score_cache():
+    """获取进程内共享的分数缓存"""
+    global _shared_cache
+    with _shared_lock:
+        if _shared_cache is None:
+            _shared_cache = ScoreCache()
+        return _shared_cache
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "clear":
+        get_score_cache().clear()
+        print("已清空分数缓存")
+        return
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    profile = {
+        "basic_info": {"hukou": "非深户", "age": 30, "social_insurance_years": 4},
+        "assets": {"annual_income": 300000},
+        "preferences": {"preferred_districts": ["南山区", "福田区", "龙华区"]}
+    }
+    policies = random_policies(count)
+    edited = copy.deepcopy(policies)
+    edited[0]['total_units'] = edited[0].get('total_units', 0) + 1000
+    runs = [("首次运行（全部计算）", policies), ("再次运行（只算发布时间分）", policies), ("修改一条政策后", edited)]
+
+    cache = ScoreCache(os.path.join(CONFIG_DIR, "score_cache_benchmark.db"))
+    cache.clear()
+    print(f"政策数: {count}")
+    run_policies = copy.deepcopy(policies)
+    start = time.perf_counter()
+    BatchScorer(profile).match(run_policies)
+    print(f"不使用缓存（批量计算）    : {(time.perf_counter() - start) * 1000:8.1f} ms")
+
+    consistent = True
+    for label, source in runs:
+        expected = [(p['title'], p['match_score']) for p in BatchScorer(profile).match(copy.deepcopy(source))]
+        run_policies = copy.deepcopy(source)
+        start = time.perf_counter()
+        matched = cache.match(run_policies, profile)
+        elapsed = time.perf_counter() - start
+        print(f"{label:<14}: {elapsed * 1000:8.1f} ms，命中 {cache.last_hits}，重新计算 {cache.last_misses}")
+        consistent = consistent and [(p['title'], p['match_score']) for p in matched] == expected
+    print(f"结果一致: {'是' if consistent else '否'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+运行参数加载
+合并 config.template.json 中的默认值与 ~/.sz-housing/config.json 中的 settings
+"""
+
+import json
+import os
+
+CONFIG_DIR = os.path.expanduser("~/.sz-housing")
+CONFIG_FILE = os.path.join(CONFIG_DIR, "config.json")
+TEMPLATE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "config.template.json")
+DEFAULT_AMAP_BASE_URL = "https://restapi.amap.com"
+
+
+def _merge(defaults, overrides):
+    """递归合并字典，overrides 优先"""
+    merged = dict(defaults)
+    for key, value in overrides.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = _merge(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+
+def _read_json(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def load_settings(config=None):
+    """加载 settings 配置段（用户配置缺省的项使用模板默认值）"""
+    defaults = _read_json(TEMPLATE_FILE).get('settings', {})
+    if config is None:
+        config = _read_json(CONFIG_FILE)
+    return _merge(defaults, config.get('settings') or {})
+
+
+def amap_url(path, settings=None):
+    """高德 Web 服务地址（settings.amap.base_url 可指向本地模拟服务）"""
+    settings = load_settings() if settings is None else settings
+    base_url = settings.get('amap', {}).get('base_url') or DEFAULT_AMAP_BASE_URL
+    return base_url.rstrip('/') + path
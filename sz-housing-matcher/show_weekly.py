@@ -3,15 +3,10 @@
 筛选并展示本周新增的保障房公告
 """
 
-import json
-import os
 from datetime import datetime, timedelta
 
-# 加载数据
-data_file = os.path.expanduser("~/.sz-housing/notices.json")
-
-with open(data_file, 'r', encoding='utf-8') as f:
-    all_notices = json.load(f)
+from notice_classifier import IRRELEVANT_TAG, is_application
+from notice_store import NoticeStore
 
 # 计算本周范围（最近7天）
 today = datetime.now()
@@ -23,12 +18,8 @@ print(f"查询时间：{today.strftime('%Y-%m-%d %H:%M:%S')}")
 print(f"时间范围：{week_ago.strftime('%Y-%m-%d')} 至 {today.strftime('%Y-%m-%d')}（最近7天）")
 print("=" * 80)
 
-# 筛选本周的公告
-weekly_notices = []
-for notice in all_notices:
-    notice_date = datetime.strptime(notice['date'], '%Y-%m-%d')
-    if notice_date >= week_ago:
-        weekly_notices.append(notice)
+# 查询本周的公告（按日期索引，不扫描全部历史）
+weekly_notices = NoticeStore().recent(7)
 
 # 按日期和来源分组
 grouped = {}
@@ -66,12 +57,11 @@ else:
         print(f"{'=' * 80}")
 
         for notice in notices:
-            # 过滤掉不太相关的公告
-            title = notice['title']
-            if any(kw in title for kw in ['采购', '内部', '会议', '培训', '资格考试']):
+            # 过滤掉不太相关的公告（采购、会议、培训等）
+            if IRRELEVANT_TAG in notice['tags']:
                 continue
 
-            print(f"\n  📌 {title}")
+            print(f"\n  📌 {notice['title']}")
             print(f"     🔗 {notice['url']}")
 
     # 重点推荐（安居房、人才房配售）
@@ -79,11 +69,7 @@ else:
     print("⭐ 重点推荐（正在申请中）")
     print(f"{'=' * 80}\n")
 
-    priority_notices = []
-    for notice in weekly_notices:
-        title = notice['title']
-        if any(kw in title for kw in ['配售通告', '配租', '认购', '选房']):
-            priority_notices.append(notice)
+    priority_notices = [notice for notice in weekly_notices if is_application(notice['tags'])]
 
     if priority_notices:
         for i, notice in enumerate(priority_notices, 1):
@@ -93,7 +79,7 @@ else:
             print(f"   🔗 {notice['url']}")
 
             # 尝试获取更多详情
-            if '安居房' in notice['title'] or '人才房' in notice['title']:
+            if '安居房' in notice['tags'] or '人才房' in notice['tags']:
                 print(f"   ✨ 推荐理由：符合您的申请条件（深圳户籍、硕士、社保满5年）")
     else:
         print("本周暂无正在申请的房源")
@@ -7,11 +7,22 @@
 import json
 import os
 import sys
-import requests
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional
 import re
 
+from amap_batch import BatchGeocoder
+from amap_cache import get_geocode_cache, get_route_cache
+from amap_client import AmapClient, get_amap_client
+from amap_governor import PRIORITY_COMMUTE, PRIORITY_HUB
+from batch_scorer import BatchScorer
+from distance_matrix import DistanceMatrix
+from eligibility import compile_requirements, normalize_profile
+from gazetteer import get_gazetteer
+from metro_stations import nearby_stations, refresh as refresh_stations
+from score_cache import get_score_cache
+from settings import load_settings
+
 class HousingMatcher:
     """保障房匹配器主类"""
 
@@ -21,7 +32,10 @@ class HousingMatcher:
         self.config_template = os.path.join(os.path.dirname(__file__), "config.template.json")
         self.urls_file = os.path.join(os.path.dirname(__file__), "urls.json")
         self.config = None
+        self._applicant = None  # 由 config['user_profile'] 规范化得到，配置变化时重建
         self.urls = None
+        self.geocode_cache = get_geocode_cache()
+        self.route_cache = get_route_cache()
 
         # 确保配置目录存在
         os.makedirs(self.home_dir, exist_ok=True)
@@ -48,6 +62,7 @@ class HousingMatcher:
         try:
             with open(self.config_file, 'r', encoding='utf-8') as f:
                 self.config = json.load(f)
+            self._applicant = None
         except Exception as e:
             print(f"加载配置文件失败：{e}")
             sys.exit(1)
@@ -115,6 +130,12 @@ class HousingMatcher:
 
         print("\n✅ 配置已保存！")
         self.config = config
+        self._applicant = None
+
+        # 附近地铁站只查本地站点列表，配置 Key 后先从高德下载完整列表
+        if use_amap and input("是否现在下载深圳地铁站列表？（y/n，约需十几次高德请求）：").lower() != 'n':
+            count = refresh_stations(config['api_keys']['amap'])
+            print(f"已更新 {count} 个地铁站" if count else "未获取到地铁站数据，可稍后运行 python metro_stations.py refresh")
 
     def search_policies(self) -> List[Dict]:
         """搜索最新的保障房政策"""
@@ -191,59 +212,44 @@ class HousingMatcher:
 
         return policies
 
-    def geocode(self, address: str) -> Optional[str]:
-        """地理编码：将地址转换为经纬度坐标"""
+    def _amap(self) -> Optional[AmapClient]:
+        """已配置高德 Key 时返回共享的高德客户端，否则返回 None"""
         amap_key = self.config['api_keys'].get('amap')
         if not amap_key or amap_key == "YOUR_AMAP_API_KEY_HERE":
             return None
+        return get_amap_client(amap_key)
 
-        # 优化：对于已知地址使用预设坐标，避免地理编码错误
-        known_locations = {
-            "龙华区大浪街道": "114.0366,22.6546",
-            "龙华大浪": "114.0366,22.6546",
-        }
-
-        for key, coord in known_locations.items():
-            if key in address:
-                return coord
-
-        url = "https://restapi.amap.com/v3/geocode/geo"
-        try:
-            response = requests.get(url, params={
-                "key": amap_key,
-                "address": address
-            }, timeout=10)
-            data = response.json()
-            if data['status'] == '1' and data['geocodes']:
-                return data['geocodes'][0]['location']
-        except Exception as e:
-            pass
-        return None
-
-    def calculate_route(self, origin: str, destination: str) -> tuple:
-        """路径规划：计算距离和时间"""
-        amap_key = self.config['api_keys'].get('amap')
-        if not amap_key or amap_key == "YOUR_AMAP_API_KEY_HERE":
+    def geocode(self, address: str) -> Optional[str]:
+        """地理编码：将地址转换为经纬度坐标（先查本地地名索引，不需要高德 Key）"""
+        # 地标、已核实和用户添加的地点直接使用本地坐标，避免地理编码错误
+        location = get_gazetteer().lookup(address)
+        if location:
+            return location
+
+        amap = self._amap()
+        if not amap:
+            return None
+        return self.geocode_cache.geocode(address, amap.geocode)
+
+    def geocode_many(self, addresses: List[str]) -> Dict[str, Optional[str]]:
+        """批量地理编码（每次请求最多10个地址），结果写入缓存供之后的 geocode 直接使用"""
+        amap = self._amap()
+        if not amap:
+            return {}
+        geocoder = BatchGeocoder(amap.amap_key, client=amap, cache=self.geocode_cache)
+        return geocoder.geocode_many(addresses)
+
+    def calculate_route(self, origin: str, destination: str, priority: int = PRIORITY_COMMUTE) -> tuple:
+        """路径规划：计算距离和时间；到交通枢纽的路线传 PRIORITY_HUB"""
+        amap = self._amap()
+        if not amap:
             return None, None
 
-        url = "https://restapi.amap.com/v3/direction/driving"
-        try:
-            response = requests.get(url, params={
-                "key": amap_key,
-                "origin": origin,
-                "destination": destination,
-                "extensions": "base"
-            }, timeout=10)
-            data = response.json()
-            # 优化：修复数据类型问题，API返回的是字符串需要转换为float
-            if data['status'] == '1' and data['route']['paths']:
-                path = data['route']['paths'][0]
-                distance = float(path['distance']) / 1000  # 转换为公里
-                duration = float(path['duration']) / 60  # 转换为分钟
-                return distance, duration
-        except Exception as e:
-            pass
-        return None, None
+        route = self.route_cache.route(origin, destination, lambda o, d: amap.driving(o, d, priority))
+        if not route:
+            return None, None
+        distance, duration = route
+        return distance / 1000, duration / 60  # 转换为公里、分钟
 
     def get_commute_score(self, duration: float) -> tuple:
         """根据通勤时间给出评分"""
@@ -257,25 +263,13 @@ class HousingMatcher:
             return "较远", "✗"
 
     def search_nearby(self, location: str, keywords: str = "地铁站", radius: int = 1000) -> List[Dict]:
-        """搜索附近设施"""
-        amap_key = self.config['api_keys'].get('amap')
-        if not amap_key or amap_key == "YOUR_AMAP_API_KEY_HERE":
+        """搜索附近设施（地铁站查本地站点索引，见 metro_stations.nearby_stations）"""
+        if keywords == "地铁站":
+            return nearby_stations(location, radius)
+        amap = self._amap()
+        if not amap:
             return []
-
-        url = "https://restapi.amap.com/v3/place/around"
-        try:
-            response = requests.get(url, params={
-                "key": amap_key,
-                "location": location,
-                "keywords": keywords,
-                "radius": radius
-            }, timeout=10)
-            data = response.json()
-            if data['status'] == '1' and data['pois']:
-                return data['pois'][:3]
-        except Exception as e:
-            pass
-        return []
+        return amap.around(location, keywords, radius)[:3]
 
     def calculate_transport(self, origin: str, destination: str) -> Dict:
         """使用高德地图 API 计算距离和时间（兼容旧接口）"""
@@ -296,47 +290,117 @@ class HousingMatcher:
         else:
             return {"error": "无法计算路线"}
 
-    def match_policies(self, policies: List[Dict]) -> List[Dict]:
-        """匹配用户条件并排序"""
-        matched_policies = []
+    def _transport_landmarks(self) -> Dict[str, tuple]:
+        """transport_info 中的键 -> (地标地址, 请求优先级)"""
+        landmarks = {}
+        company_address = self.config['user_profile']['transportation'].get('company_address')
+        if company_address:
+            landmarks['to_company'] = (company_address, PRIORITY_COMMUTE)
+        landmarks['to_shenzhen_north'] = ("深圳北站", PRIORITY_HUB)
+        landmarks['to_baoan_airport'] = ("深圳宝安国际机场", PRIORITY_HUB)
+        return landmarks
+
+    @staticmethod
+    def _transport_entry(distance_km: float, duration_min: float, origin: str, dest: str, method: str) -> Dict:
+        return {
+            "distance_km": round(distance_km, 1),
+            "duration_min": round(duration_min),
+            "origin_location": origin,
+            "dest_location": dest,
+            "method": method
+        }
 
+    def attach_transport(self, policies: List[Dict]):
+        """
+        批量计算所有房源到公司、深圳北站、宝安机场的驾车距离和时间，写入 policy['transport_info']
+        每个地标按每 100 个房源一次距离矩阵请求，而不是逐个房源规划路线
+        """
+        amap = self._amap()
+        if not amap:
+            return
+        landmarks = self._transport_landmarks()
+        addresses = [p['location'] for p in policies if p.get('location')]
+        # 先批量解析全部地址，之后的 geocode 直接命中缓存（已知坐标的地址仍优先使用预设坐标）
+        self.geocode_many(addresses + [address for address, _ in landmarks.values()])
+        coords = {address: self.geocode(address) for address in set(addresses)}
+        origins = [c for c in coords.values() if c]
+
+        matrix = DistanceMatrix(amap.amap_key, client=amap, cache=self.route_cache)
+        for key, (address, priority) in landmarks.items():
+            dest = self.geocode(address)
+            results = matrix.to_destination(origins, dest, priority) if dest else {}
+            for policy in policies:
+                origin = coords.get(policy.get('location'))
+                if not origin:
+                    continue
+                result = results.get(origin)
+                info = policy.setdefault('transport_info', {})
+                if result:
+                    info[key] = self._transport_entry(result[0] / 1000, result[1] / 60, origin, dest, "distance")
+                else:
+                    info[key] = {"error": "无法计算路线"}
+
+    def refine_transport(self, policies: List[Dict]) -> bool:
+        """对少量房源（通常是排名靠前的）逐条路径规划，替换距离矩阵的估算结果；有更新时返回 True"""
+        landmarks = self._transport_landmarks()
+        refined = False
         for policy in policies:
-            if self._check_requirements(policy):
-                # 计算匹配分数
-                score = self._calculate_score(policy)
-                policy['match_score'] = score
-                matched_policies.append(policy)
+            for key, info in policy.get('transport_info', {}).items():
+                if info.get('method') != "distance" or key not in landmarks:
+                    continue
+                origin, dest = info['origin_location'], info['dest_location']
+                distance, duration = self.calculate_route(origin, dest, landmarks[key][1])
+                if distance and duration:
+                    policy['transport_info'][key] = self._transport_entry(distance, duration, origin, dest, "driving")
+                    refined = True
+        return refined
+
+    def _attach_routes(self, policy: Dict, keys: List[str]):
+        """逐条路径规划房源到指定地标的驾车路线，写入 policy['transport_info']；房源地址无法解析时不写入"""
+        origin = self.geocode(policy['location']) if policy.get('location') else None
+        if not origin:
+            return
+        landmarks = self._transport_landmarks()
+        info = policy.setdefault('transport_info', {})
+        for key in keys:
+            if key not in landmarks:
+                continue
+            address, priority = landmarks[key]
+            dest = self.geocode(address)
+            distance, duration = self.calculate_route(origin, dest, priority) if dest else (None, None)
+            if distance and duration:
+                info[key] = self._transport_entry(distance, duration, origin, dest, "driving")
+            else:
+                info[key] = {"error": "无法计算路线"}
+
+    def rank_top_k(self, policies: List[Dict], k: int) -> tuple:
+        """
+        只取前 k 名（分支定界）：通勤分按上限估计，只为仍可能进入前 k 名的房源计算到公司的路线，
+        高德请求数与 k 相关而与房源总数无关；前 k 名再补充到深圳北站、宝安机场的路线
+        返回 (前 k 名, 符合条件的房源数)
+        """
+        attach = (lambda policy: self._attach_routes(policy, ['to_company'])) if self._amap() else None
+        top, total = BatchScorer(self.config['user_profile']).top_k(policies, k, attach)
+        if attach:
+            for policy in top:
+                self._attach_routes(policy, ['to_shenzhen_north', 'to_baoan_airport'])
+        return top, total
 
-        # 按匹配分数排序
-        matched_policies.sort(key=lambda x: x['match_score'], reverse=True)
-        return matched_policies
+    def match_policies(self, policies: List[Dict]) -> List[Dict]:
+        """
+        匹配用户条件并排序（结果与逐条 _check_requirements / _calculate_score 一致）
+        默认按列批量计算；开启 settings.score_cache 时未变化的政策只重新计算发布时间分
+        """
+        if load_settings().get('score_cache', False):
+            return get_score_cache().match(policies, self.config['user_profile'])
+        return BatchScorer(self.config['user_profile']).match(policies)
 
     def _check_requirements(self, policy: Dict) -> bool:
         """检查用户是否符合申请条件"""
         reqs = policy.get('requirements', {})
-        user = self.config['user_profile']
-
-        # 检查户籍
-        if reqs.get('hukou'):
-            if '深圳' in reqs['hukou'] and user['basic_info']['hukou'] != '深圳户籍':
-                return False
-
-        # 检查社保年限
-        if reqs.get('social_insurance'):
-            if user['basic_info']['social_insurance_years'] < reqs['social_insurance']:
-                return False
-
-        # 检查年龄
-        if reqs.get('age_min'):
-            if user['basic_info']['age'] < reqs['age_min']:
-                return False
-
-        # 检查收入
-        if reqs.get('income_max'):
-            if user['assets']['annual_income'] > reqs['income_max']:
-                return False
-
-        return True
+        if self._applicant is None:
+            self._applicant = normalize_profile(self.config['user_profile'])
+        return compile_requirements(reqs).check(self._applicant)
 
     def _calculate_score(self, policy: Dict) -> float:
         """计算匹配分数"""
@@ -385,15 +449,15 @@ class HousingMatcher:
 
         return score
 
-    def display_results(self, policies: List[Dict]):
-        """展示匹配结果"""
+    def display_results(self, policies: List[Dict], total: Optional[int] = None):
+        """展示匹配结果（total 为符合条件的房源总数，只传入前几名时使用）"""
         if not policies:
             print("\n未找到匹配的房源，请尝试放宽条件")
             return
 
         print(f"\n🏠 深圳市保障房匹配结果")
         print(f"搜索时间：{datetime.now().strftime('%Y-%m-%d %H:%M')}")
-        print(f"找到 {len(policies)} 个匹配房源\n")
+        print(f"找到 {total or len(policies)} 个匹配房源\n")
 
         medals = ['🥇', '🥈', '🥉']
         labels = ['[强烈推荐]', '[推荐]', '[备选]']
@@ -494,9 +558,26 @@ class HousingMatcher:
         # 搜索政策
         policies = self.search_policies()
 
+        # 设置了 top_k 时只为可能进入前几名的房源计算交通信息（不经过距离矩阵和分数缓存）
+        top_k = load_settings().get('top_k', 0)
+        if top_k:
+            matched, total = self.rank_top_k(policies, top_k)
+            self.display_results(matched, total)
+            return
+
+        # 批量计算交通信息（距离矩阵），用于通勤评分
+        self.attach_transport(policies)
+
         # 匹配用户条件
         matched = self.match_policies(policies)
 
+        # 排名靠前的房源用逐条路径规划校正通勤时间后重新排序
+        top = matched[:load_settings().get('amap', {}).get('refine_top', 3)]
+        if self.refine_transport(top):
+            for policy in top:
+                policy['match_score'] = self._calculate_score(policy)
+            matched.sort(key=lambda x: x['match_score'], reverse=True)
+
         # 显示结果
         self.display_results(matched)
 
@@ -6,17 +6,19 @@
 import sys
 import os
 import json
-import requests
+
+from amap_client import AmapClient
 
 def test_amap_api(api_key: str):
     """测试高德地图 API 是否可用"""
 
     print("=== 高德地图 API 测试 ===\n")
 
+    # 使用与主程序相同的客户端（连接池、重试、限速），但不经过结果缓存，直接检测接口本身
+    client = AmapClient(api_key)
+
     # 测试 1：地理编码
     print("测试 1：地理编码（地址 -> 坐标）")
-    geocode_url = "https://restapi.amap.com/v3/geocode/geo"
-
     test_addresses = [
         "深圳市南山区科技园",
         "深圳北站",
@@ -24,22 +26,15 @@ def test_amap_api(api_key: str):
     ]
 
     for address in test_addresses:
-        try:
-            response = requests.get(geocode_url, params={
-                "key": api_key,
-                "address": address
-            })
-
-            data = response.json()
+        data = client.get("/v3/geocode/geo", {"address": address})
 
-            if data.get('status') == '1' and data.get('geocodes'):
-                location = data['geocodes'][0]['location']
-                print(f"  ✓ {address} -> {location}")
-            else:
-                print(f"  ✗ {address} -> 失败：{data.get('info', '未知错误')}")
-
-        except Exception as e:
-            print(f"  ✗ {address} -> 错误：{e}")
+        if data is None:
+            print(f"  ✗ {address} -> 错误：请求失败")
+        elif data.get('status') == '1' and data.get('geocodes'):
+            location = data['geocodes'][0]['location']
+            print(f"  ✓ {address} -> {location}")
+        else:
+            print(f"  ✗ {address} -> 失败：{data.get('info', '未知错误')}")
 
     # 测试 2：路径规划
     print("\n测试 2：路径规划（距离和时间）")
@@ -47,55 +42,44 @@ def test_amap_api(api_key: str):
     origin = "113.946,22.539"  # 深圳科技园附近
     destination = "114.0325,22.6107"  # 深圳北站
 
-    driving_url = "https://restapi.amap.com/v3/direction/driving"
-
-    try:
-        response = requests.get(driving_url, params={
-            "key": api_key,
-            "origin": origin,
-            "destination": destination,
-            "extensions": "base"
-        })
-
-        data = response.json()
-
-        if data.get('status') == '1' and data.get('route'):
-            route = data['route']['paths'][0]
-            distance = int(route['distance']) / 1000  # 转换为公里
-            duration = int(route['duration']) / 60  # 转换为分钟
-            print(f"  ✓ 路径规划成功")
-            print(f"    距离：{distance:.1f} 公里")
-            print(f"    时间：{duration:.0f} 分钟")
-        else:
-            print(f"  ✗ 路径规划失败：{data.get('info', '未知错误')}")
-
-    except Exception as e:
-        print(f"  ✗ 路径规划错误：{e}")
+    data = client.get("/v3/direction/driving", {
+        "origin": origin,
+        "destination": destination,
+        "extensions": "base"
+    })
+
+    if data is None:
+        print(f"  ✗ 路径规划错误：请求失败")
+    elif data.get('status') == '1' and data.get('route'):
+        route = data['route']['paths'][0]
+        distance = int(route['distance']) / 1000  # 转换为公里
+        duration = int(route['duration']) / 60  # 转换为分钟
+        print(f"  ✓ 路径规划成功")
+        print(f"    距离：{distance:.1f} 公里")
+        print(f"    时间：{duration:.0f} 分钟")
+    else:
+        print(f"  ✗ 路径规划失败：{data.get('info', '未知错误')}")
 
     # 测试 3：周边搜索
     print("\n测试 3：周边搜索（查找附近地铁站）")
 
-    around_url = "https://restapi.amap.com/v3/place/around"
-
-    try:
-        response = requests.get(around_url, params={
-            "key": api_key,
-            "location": "113.946,22.539",
-            "keywords": "地铁站",
-            "radius": "1000"
-        })
-
-        data = response.json()
-
-        if data.get('status') == '1' and data.get('pois'):
-            print(f"  ✓ 找到 {len(data['pois'])} 个地铁站")
-            for poi in data['pois'][:3]:  # 只显示前 3 个
-                print(f"    - {poi['name']} ({poi.get('address', 'N/A')})")
-        else:
-            print(f"  ✗ 周边搜索失败：{data.get('info', '未知错误')}")
-
-    except Exception as e:
-        print(f"  ✗ 周边搜索错误：{e}")
+    data = client.get("/v3/place/around", {
+        "location": "113.946,22.539",
+        "keywords": "地铁站",
+        "radius": "1000"
+    })
+
+    if data is None:
+        print(f"  ✗ 周边搜索错误：请求失败")
+    elif data.get('status') == '1' and data.get('pois'):
+        print(f"  ✓ 找到 {len(data['pois'])} 个地铁站")
+        for poi in data['pois'][:3]:  # 只显示前 3 个
+            print(f"    - {poi['name']} ({poi.get('address', 'N/A')})")
+    else:
+        print(f"  ✗ 周边搜索失败：{data.get('info', '未知错误')}")
+
+    stats = client.stats()
+    print(f"\n请求统计：{stats['requests']}，今日已用 {stats['daily_used']}/{stats['daily_quota']}")
 
     print("\n=== 测试完成 ===")
 
@@ -3,51 +3,36 @@
 测试用户公司地址到主要交通枢纽的距离和时间
 """
 
-import requests
-import json
+from amap_cache import get_geocode_cache, get_route_cache
+from amap_client import get_amap_client
+from gazetteer import get_gazetteer
+
+def geocode(api_key, address):
+    """地理编码（先查本地地名索引和缓存），失败返回 None"""
+    return get_gazetteer().lookup(address) or get_geocode_cache().geocode(address, get_amap_client(api_key).geocode)
+
+def driving_route(api_key, origin_location, dest_location):
+    """驾车路径规划（优先使用本地缓存），返回 (距离米, 时间秒)，失败返回 None"""
+    return get_route_cache().route(origin_location, dest_location, get_amap_client(api_key).driving)
 
 def calculate_route(api_key, origin, destination, name):
     """计算两点间的距离和时间"""
 
     # 地理编码
-    geocode_url = "https://restapi.amap.com/v3/geocode/geo"
-
-    # 获取起点坐标
-    origin_resp = requests.get(geocode_url, params={
-        "key": api_key,
-        "address": origin
-    })
-    origin_coord = json.loads(origin_resp.text)
-
-    # 获取终点坐标
-    dest_resp = requests.get(geocode_url, params={
-        "key": api_key,
-        "address": destination
-    })
-    dest_coord = json.loads(dest_resp.text)
-
-    if not origin_coord.get('geocodes') or not dest_coord.get('geocodes'):
+    origin_location = geocode(api_key, origin)
+    dest_location = geocode(api_key, destination)
+
+    if not origin_location or not dest_location:
         print(f"  ✗ {name} - 无法解析地址")
         return
 
-    origin_location = origin_coord['geocodes'][0]['location']
-    dest_location = dest_coord['geocodes'][0]['location']
-
     # 路径规划
-    driving_url = "https://restapi.amap.com/v3/direction/driving"
-    route_resp = requests.get(driving_url, params={
-        "key": api_key,
-        "origin": origin_location,
-        "destination": dest_location,
-        "extensions": "base"
-    })
-
-    route_data = json.loads(route_resp.text)
-
-    if route_data.get('status') == '1' and route_data.get('route'):
-        route = route_data['route']['paths'][0]
-        distance_km = round(int(route['distance']) / 1000, 1)
-        duration_min = round(int(route['duration']) / 60)
+    route = driving_route(api_key, origin_location, dest_location)
+
+    if route:
+        distance, duration = route
+        distance_km = round(distance / 1000, 1)
+        duration_min = round(duration / 60)
 
         # 评分
         if duration_min <= 20:
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# 脚本按平铺模块互相导入，测试时把项目目录加入 sys.path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,35 @@
+"""配额计数库被其他进程锁住时，高德请求失败而不是抛出异常"""
+
+import sqlite3
+
+from amap_client import AmapClient
+from amap_governor import AmapGovernor
+from rate_limiter import HostRateLimiter
+
+
+class FailingSession:
+    def get(self, *args, **kwargs):
+        raise AssertionError("未获取名额时不应发出请求")
+
+
+def test_locked_governor_db_fails_single_request(tmp_path):
+    db_file = str(tmp_path / "amap_governor.db")
+    governor = AmapGovernor(db_file=db_file, lock_timeout=0.1)
+    client = AmapClient("test-key", settings={}, rate_limiter=HostRateLimiter(), governor=governor)
+    client.session = FailingSession()
+
+    # 另一个进程持有写锁
+    other = sqlite3.connect(db_file, isolation_level=None)
+    other.execute("BEGIN EXCLUSIVE")
+    try:
+        assert client.get("/v3/geocode/geo", {"address": "深圳北站"}) is None
+        assert client.geocode("深圳北站") is None
+        governor.record_throttled()
+    finally:
+        other.execute("ROLLBACK")
+        other.close()
+
+    assert client.errors["/v3/geocode/geo"] == 2
+    assert client.requests["/v3/geocode/geo"] == 0
+    # 锁释放后恢复正常获取名额
+    assert governor.acquire("/v3/geocode/geo") is True
@@ -0,0 +1,91 @@
+"""补抓历史公告：页数超过 max_pages 的数据源分多次运行翻完"""
+
+from crawl_state import CrawlState
+from robust_fetcher import PAGE_GONE, HousingDataFetcher
+
+PAGE_COUNT = 23
+PAGE_SIZE = 10
+
+
+class MemoryStore:
+    def __init__(self):
+        self.urls = set()
+
+    def has_url(self, url):
+        return url in self.urls
+
+
+def make_fetcher(tmp_path, max_pages=5):
+    """不加载配置和公告库，列表页来自模拟的数据源（每页 PAGE_SIZE 条，post 编号从新到旧递减到 1）"""
+    fetcher = HousingDataFetcher.__new__(HousingDataFetcher)
+    fetcher.sources = {"demo": {"name": "模拟数据源", "base_url": "https://example.gov.cn",
+                                "notice_url": "https://example.gov.cn/tzgg/"}}
+    fetcher.max_pages = max_pages
+    fetcher.store = MemoryStore()
+    fetcher.crawl_state = CrawlState(str(tmp_path / "crawl_state.json"))
+    fetcher.newest_id = PAGE_COUNT * PAGE_SIZE
+    fetcher.fetched = []
+
+    def fetch_list_page(url, base_url, source_key=None):
+        page = 0 if url.endswith("/tzgg/") else int(url.rsplit("_", 1)[1].split(".")[0])
+        fetcher.fetched.append(page)
+        top = fetcher.newest_id - page * PAGE_SIZE
+        if top <= 0:
+            return PAGE_GONE
+        return [{"url": f"https://example.gov.cn/tzgg/post_{post_id}.html", "date": "2026-01-01"}
+                for post_id in range(top, max(top - PAGE_SIZE, 0), -1)]
+
+    fetcher._fetch_list_page = fetch_list_page
+    return fetcher
+
+
+def crawl(fetcher):
+    fetcher.fetched = []
+    notices = fetcher.crawl_source("demo")
+    fetcher.store.urls.update(n["url"] for n in notices)
+    return notices
+
+
+def test_catch_up_resumes_past_max_pages(tmp_path):
+    fetcher = make_fetcher(tmp_path)
+
+    crawl(fetcher)
+    assert fetcher.fetched == [0, 1, 2, 3, 4]
+    assert fetcher.crawl_state.get("demo")["catch_up_page"] == 5
+    assert not fetcher.crawl_state.get("demo").get("full_history_at")
+
+    crawl(fetcher)
+    # 先抓第 0 页（全是已知公告即停），再从上次停下的页继续
+    assert fetcher.fetched == [0, 5, 6, 7, 8, 9]
+    assert fetcher.crawl_state.get("demo")["catch_up_page"] == 10
+
+    runs = 2
+    while not fetcher.crawl_state.get("demo").get("full_history_at"):
+        crawl(fetcher)
+        runs += 1
+        assert runs < 10
+    assert runs == 5
+    assert fetcher.crawl_state.get("demo")["catch_up_page"] is None
+    assert len(fetcher.store.urls) == PAGE_COUNT * PAGE_SIZE
+
+
+def test_steady_state_after_catch_up(tmp_path):
+    fetcher = make_fetcher(tmp_path, max_pages=50)
+    crawl(fetcher)
+    assert fetcher.crawl_state.get("demo").get("full_history_at")
+
+    # 新发布 3 条公告：只需翻到第一个只含已知公告的页面
+    fetcher.newest_id += 3
+    notices = crawl(fetcher)
+    assert fetcher.fetched == [0, 1]
+    assert len(fetcher.store.urls) == PAGE_COUNT * PAGE_SIZE + 3
+    assert len(notices) == 2 * PAGE_SIZE
+
+
+def test_new_notices_during_catch_up_are_not_skipped(tmp_path):
+    fetcher = make_fetcher(tmp_path)
+    crawl(fetcher)
+    fetcher.newest_id += 12  # 续抓前发布的新公告把旧公告往后推
+    while not fetcher.crawl_state.get("demo").get("full_history_at"):
+        crawl(fetcher)
+    assert len(fetcher.store.urls) == PAGE_COUNT * PAGE_SIZE + 12
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+交通分析并行执行
+把所有房源的交通分析展开成一张依赖图：先地理编码（房源、公司、交通枢纽，各地址只解析一次），
+再计算每个房源到各地标的路线并搜索周边设施；依赖满足的任务立即提交到有限大小的线程池，
+总耗时接近几次往返，而不是所有请求耗时之和。结果按房源原有顺序返回
+"""
+
+from collections import defaultdict, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from settings import load_settings
+
+
+class TaskGraph:
+    """有依赖关系的任务集合；上游任务结果为 None（失败）时，下游任务直接记为 None"""
+
+    def __init__(self):
+        self._tasks = {}  # 键 -> (函数, 依赖的键)
+
+    def add(self, key, func, deps=()):
+        """添加任务，func 以各依赖任务的结果为参数；相同的键只添加一次"""
+        if key not in self._tasks:
+            self._tasks[key] = (func, tuple(deps))
+        return key
+
+    def run(self, max_workers=8):
+        """执行全部任务，返回 {键: 结果}；任务抛出异常时结果为 None"""
+        results = {}
+        waiting = {key: set(deps) for key, (_, deps) in self._tasks.items()}
+        dependents = defaultdict(list)
+        for key, (_, deps) in self._tasks.items():
+            for dep in deps:
+                if dep not in self._tasks:
+                    raise KeyError(f"任务 {key} 依赖的 {dep} 不存在")
+                dependents[dep].append(key)
+
+        ready = deque(key for key, deps in waiting.items() if not deps)
+        running = {}
+
+        def finish(key, result):
+            results[key] = result
+            for dependent in dependents[key]:
+                waiting[dependent].discard(key)
+                if not waiting[dependent]:
+                    ready.append(dependent)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            while ready or running:
+                while ready:
+                    key = ready.popleft()
+                    func, deps = self._tasks[key]
+                    args = [results[dep] for dep in deps]
+                    if any(arg is None for arg in args):
+                        finish(key, None)
+                    else:
+                        running[executor.submit(func, *args)] = key
+                if not running:
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    key = running.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception:
+                        result = None
+                    finish(key, result)
+        return results
+
+
+def analyze_projects(projects, landmarks, geocode, route, nearby=None, max_workers=None):
+    """
+    并行分析多个房源的交通情况
+    projects: [(地址, 已知坐标或 None)]；landmarks: {名称: 地址}，如公司、深圳北站
+    geocode(地址) -> 坐标；route(房源坐标, 地标坐标, 地标名称) -> 路线结果；nearby(坐标) -> 周边设施
+    返回与 projects 顺序一致的 [{"coords", "routes": {名称: 路线结果}, "nearby"}]，
+    无法获取的项为 None
+    """
+    if max_workers is None:
+        max_workers = load_settings().get('amap', {}).get('transport_workers', 8)
+
+    graph = TaskGraph()
+    landmark_keys = {name: graph.add(("geo", address), lambda a=address: geocode(a))
+                     for name, address in landmarks.items()}
+
+    plan = []
+    for i, (address, coords) in enumerate(projects):
+        if coords:
+            coord_key = graph.add(("coords", i), lambda c=coords: c)
+        else:
+            coord_key = graph.add(("geo", address), lambda a=address: geocode(a))
+        route_keys = {name: graph.add(("route", i, name), lambda o, d, n=name: route(o, d, n),
+                                      deps=(coord_key, landmark_key))
+                      for name, landmark_key in landmark_keys.items()}
+        nearby_key = graph.add(("nearby", i), nearby, deps=(coord_key,)) if nearby else None
+        plan.append((coord_key, route_keys, nearby_key))
+
+    results = graph.run(max(1, max_workers))
+    return [{
+        "coords": results[coord_key],
+        "routes": {name: results[key] for name, key in route_keys.items()},
+        "nearby": results[nearby_key] if nearby_key else None
+    } for coord_key, route_keys, nearby_key in plan]
@@ -5,24 +5,52 @@
 """
 
 import json
-import requests
-from datetime import datetime, timedelta
+from datetime import datetime
 import os
 
+from amap_batch import BatchGeocoder
+from amap_cache import get_geocode_cache, get_route_cache
+from amap_client import get_amap_client
+from amap_governor import PRIORITY_COMMUTE, PRIORITY_HUB
+from eligibility import ANJUFANG_REQUIREMENTS, compile_requirements, normalize_profile
+from gazetteer import get_gazetteer
+from metro_stations import nearby_stations
+from notice_classifier import HOUSING_TYPES, is_sale
+from notice_store import NoticeStore
+from transport_executor import analyze_projects
+
+# 人工整理的重点项目（尚无自动提取的公告详情时使用）
+FALLBACK_PROJECTS = [
+    {
+        'name': '缙熙园安居房',
+        'location': '龙华区大浪街道缙熙园',
+        'type': '安居房',
+        'layout': '两房（68㎡）/三房（89㎡）',
+        'total': '331套',
+        'batch': '住保售〔2026〕005号',
+        'url': 'https://zjj.sz.gov.cn/xxgk/tzgg/content/post_12606797.html',
+        'apply_start': '2026-01-19',
+        'apply_end': '2026-01-25 18:00',
+        'queues': ['第一队列：安居房在册轮候家庭', '第二队列：非在册轮候家庭（新增开放）']
+    }
+]
+
 class HousingMatcher:
     def __init__(self):
         # 加载配置
         config_dir = os.path.expanduser("~/.sz-housing")
         config_file = os.path.join(config_dir, "config.json")
-        data_file = os.path.join(config_dir, "notices.json")
 
         with open(config_file, 'r', encoding='utf-8') as f:
             self.config = json.load(f)
-        with open(data_file, 'r', encoding='utf-8') as f:
-            self.notices = json.load(f)
+        self.store = NoticeStore()
 
         self.user = self.config['user_profile']
+        self.applicant = normalize_profile(self.user)
         self.amap_key = self.config['api_keys']['amap']
+        self.amap = get_amap_client(self.amap_key)
+        self.geocode_cache = get_geocode_cache()
+        self.route_cache = get_route_cache()
 
         # 重要地标
         self.landmarks = {
@@ -33,41 +61,21 @@ class HousingMatcher:
         }
 
     def geocode(self, address):
-        """地理编码：将地址转换为经纬度"""
-        url = "https://restapi.amap.com/v3/geocode/geo"
-        params = {
-            "key": self.amap_key,
-            "address": address
-        }
-        try:
-            response = requests.get(url, params=params, timeout=10)
-            data = response.json()
-            if data['status'] == '1' and data['geocodes']:
-                return data['geocodes'][0]['location']
-        except Exception as e:
-            pass
-        return None
-
-    def calculate_route(self, origin, destination):
-        """路径规划：计算距离和时间"""
-        url = "https://restapi.amap.com/v3/direction/driving"
-        params = {
-            "key": self.amap_key,
-            "origin": origin,
-            "destination": destination,
-            "extensions": "base"
-        }
-        try:
-            response = requests.get(url, params=params, timeout=10)
-            data = response.json()
-            if data['status'] == '1' and data['route']['paths']:
-                path = data['route']['paths'][0]
-                distance = float(path['distance']) / 1000  # 转换为公里
-                duration = float(path['duration']) / 60  # 转换为分钟
-                return distance, duration
-        except Exception as e:
-            pass
-        return None, None
+        """地理编码：将地址转换为经纬度（先查本地地名索引，再查缓存）"""
+        return get_gazetteer().lookup(address) or self.geocode_cache.geocode(address, self.amap.geocode)
+
+    def geocode_many(self, addresses):
+        """批量地理编码（每次请求最多10个地址），结果写入缓存供之后的 geocode 直接使用"""
+        return BatchGeocoder(self.amap_key, client=self.amap, cache=self.geocode_cache).geocode_many(addresses)
+
+    def calculate_route(self, origin, destination, priority=PRIORITY_COMMUTE):
+        """路径规划：计算距离和时间（优先使用本地缓存）；到交通枢纽的路线传 PRIORITY_HUB"""
+        route = self.route_cache.route(origin, destination,
+                                       lambda o, d: self.amap.driving(o, d, priority))
+        if not route:
+            return None, None
+        distance, duration = route
+        return distance / 1000, duration / 60  # 转换为公里、分钟
 
     def get_commute_score(self, duration):
         """根据通勤时间给出评分"""
@@ -81,41 +89,43 @@ class HousingMatcher:
             return "较远", "✗"
 
     def search_nearby(self, location, keywords="地铁站", radius=1000):
-        """搜索附近设施"""
-        url = "https://restapi.amap.com/v3/place/around"
-        params = {
-            "key": self.amap_key,
-            "location": location,
-            "keywords": keywords,
-            "radius": radius
-        }
-        try:
-            response = requests.get(url, params=params, timeout=10)
-            data = response.json()
-            if data['status'] == '1' and data['pois']:
-                return data['pois'][:3]  # 返回最近的3个
-        except Exception as e:
-            pass
-        return []
+        """搜索附近设施（地铁站查本地站点索引，见 metro_stations.nearby_stations）"""
+        if keywords == "地铁站":
+            return nearby_stations(location, radius)
+        return self.amap.around(location, keywords, radius)[:3]  # 返回最近的3个
+
+    def _route_or_none(self, origin, destination, landmark):
+        priority = PRIORITY_COMMUTE if landmark == 'company' else PRIORITY_HUB
+        distance, duration = self.calculate_route(origin, destination, priority)
+        return (distance, duration) if distance and duration else None
+
+    def analyze_transport_many(self, housing_addresses):
+        """
+        并行计算多个房源到公司、深圳北站、宝安机场的路线和附近地铁站
+        返回与 housing_addresses 顺序一致的分析结果，交给 print_transport 输出
+        """
+        landmarks = {name: self.landmarks[name] for name in ('company', 'shenzhen_north', 'baoan_airport')}
+        gazetteer = get_gazetteer()
+        projects = [(address, gazetteer.lookup(address)) for address in housing_addresses]
+        return analyze_projects(projects, landmarks, self.geocode, self._route_or_none,
+                                nearby=lambda coords: self.search_nearby(coords, "地铁站"))
 
     def analyze_transport(self, housing_address, housing_name):
         """分析交通便利性"""
+        self.print_transport(self.analyze_transport_many([housing_address])[0])
+
+    def print_transport(self, analysis):
+        """输出一个房源的交通分析结果"""
         print(f"🚗 交通便利性分析")
 
-        # 地理编码 - 优先使用已知的龙华大浪坐标
-        # 如果地址包含"龙华区大浪"，直接使用已知坐标
-        if "龙华" in housing_address and "大浪" in housing_address:
-            housing_coords = "114.0366,22.6546"
-        else:
-            housing_coords = self.geocode(housing_address)
-            if not housing_coords:
-                print(f"  ⚠️ 无法获取房源坐标")
-                return
+        if not analysis['coords']:
+            print(f"  ⚠️ 无法获取房源坐标")
+            return
+        routes = analysis['routes']
 
         # 分析到公司的路线
-        company_coords = self.geocode(self.landmarks['company'])
-        if company_coords:
-            distance, duration = self.calculate_route(housing_coords, company_coords)
+        if routes['company']:
+            distance, duration = routes['company']
             if distance and duration:
                 score, mark = self.get_commute_score(duration)
                 print(f"""
@@ -127,9 +137,8 @@ class HousingMatcher:
 └─────────────────────────────────────┘""")
 
         # 分析到深圳北站的路线
-        north_coords = self.geocode(self.landmarks['shenzhen_north'])
-        if north_coords:
-            distance, duration = self.calculate_route(housing_coords, north_coords)
+        if routes['shenzhen_north']:
+            distance, duration = routes['shenzhen_north']
             if distance and duration:
                 score, mark = self.get_commute_score(duration)
                 print(f"""
@@ -141,9 +150,8 @@ class HousingMatcher:
 └─────────────────────────────────────┘""")
 
         # 分析到宝安机场的路线
-        airport_coords = self.geocode(self.landmarks['baoan_airport'])
-        if airport_coords:
-            distance, duration = self.calculate_route(housing_coords, airport_coords)
+        if routes['baoan_airport']:
+            distance, duration = routes['baoan_airport']
             if distance and duration:
                 score, mark = self.get_commute_score(duration)
                 print(f"""
@@ -156,7 +164,7 @@ class HousingMatcher:
 
         # 搜索附近地铁站
         print(f"\n🚇 附近交通设施")
-        subways = self.search_nearby(housing_coords, "地铁站")
+        subways = analysis['nearby']
         if subways:
             for subway in subways[:2]:
                 distance = int(subway['distance'])
@@ -165,42 +173,28 @@ class HousingMatcher:
             print("- 地铁：暂无数据")
 
     def check_eligibility(self, project):
-        """检查用户是否符合条件"""
-        user = self.user
-        basic = user['basic_info']
-        assets = user['assets']
-
-        checks = []
-
-        # 户籍
-        if basic.get('hukou') == '深圳户籍':
-            checks.append(("户籍", "✓ 深圳户籍"))
-        else:
-            checks.append(("户籍", "✗ 非深户"))
-
-        # 社保
-        si_years = basic.get('social_insurance_years', 0)
-        if si_years >= 5:
-            checks.append(("社保", f"✓ 社保{si_years}年"))
-        elif si_years >= 3:
-            checks.append(("社保", f"✓ 社保{si_years}年（硕士学历）"))
-        else:
-            checks.append(("社保", f"✗ 社保仅{si_years}年"))
-
-        # 房产
-        if not assets.get('has_shenzhen_property'):
-            checks.append(("房产", "✓ 无深圳房产"))
-        else:
-            checks.append(("房产", "✗ 已有房产"))
-
-        # 年龄
-        age = basic.get('age', 0)
-        if basic.get('family_type') == '单身' and age < 35:
-            checks.append(("年龄", f"✗ 单身需35岁以上（当前{age}岁）"))
-        else:
-            checks.append(("年龄", f"✓ 年龄{age}岁符合要求"))
-
-        return checks
+        """检查用户是否符合条件，返回 [(条件名称, 状态)]；项目没有结构化条件时按安居房的一般条件"""
+        requirements = project.get('requirements') or ANJUFANG_REQUIREMENTS
+        return compile_requirements(requirements).checklist(self.applicant)
+
+    def _project_from_notice(self, notice):
+        """将公告详情转换为报告使用的项目信息"""
+        detail = notice['detail']
+        housing_type = next((t for t in HOUSING_TYPES if t in notice['tags']), '保障房')
+
+        layouts = detail.get('layouts', [])
+        return {
+            'name': f"{detail['project_name']}{housing_type}",
+            'location': detail.get('location', '待公布'),
+            'type': housing_type,
+            'layout': '/'.join(f"{l['type']}（{l['area']}）" for l in layouts) or '详见公告',
+            'total': f"{detail['total_units']}套" if 'total_units' in detail else '详见公告',
+            'batch': detail.get('batch', '详见公告'),
+            'url': notice['url'],
+            'apply_start': detail.get('application_start'),
+            'apply_end': detail.get('application_end'),
+            'queues': [f"{name}：{desc}" for name, desc in detail.get('queues', {}).items()]
+        }
 
     def generate_report(self):
         """生成完整报告"""
@@ -209,34 +203,23 @@ class HousingMatcher:
 
         # 筛选本周的配售房源
         today = datetime.now()
-        week_ago = today - timedelta(days=7)
-
-        weekly_housing = []
-        for notice in self.notices:
-            notice_date = datetime.strptime(notice['date'], '%Y-%m-%d')
-            if notice_date >= week_ago:
-                title = notice['title']
-                if any(kw in title for kw in ['配售通告', '安居型商品房', '人才房配售']):
-                    weekly_housing.append(notice)
-
-        # 重点推荐缙熙园
-        key_projects = [
-            {
-                'name': '缙熙园安居房',
-                'location': '龙华区大浪街道缙熙园',
-                'type': '安居房',
-                'layout': '两房（68㎡）/三房（89㎡）',
-                'total': '331套',
-                'batch': '住保售〔2026〕005号',
-                'url': 'https://zjj.sz.gov.cn/xxgk/tzgg/content/post_12606797.html',
-                'apply_start': '2026-01-19',
-                'apply_end': '2026-01-25 18:00',
-                'queues': ['第一队列：安居房在册轮候家庭', '第二队列：非在册轮候家庭（新增开放）']
-            }
-        ]
+        weekly_housing = [n for n in self.store.recent(7) if is_sale(n['tags'])]
+
+        # 优先使用抓取时自动提取的公告详情；尚无详情时沿用人工整理的缙熙园信息
+        key_projects = [self._project_from_notice(n) for n in weekly_housing
+                        if n.get('detail', {}).get('project_name')]
+        if not key_projects:
+            key_projects = FALLBACK_PROJECTS
 
         print(f"找到 {len(weekly_housing)} 个本周新增配售房源\n")
 
+        # 先批量解析本次报告涉及的全部地址，再并行计算所有房源的交通情况
+        housing_addresses = [p['location'] for p in key_projects if p['location'] != '待公布']
+        addresses = [self.landmarks['company'], self.landmarks['shenzhen_north'], self.landmarks['baoan_airport']]
+        addresses += housing_addresses
+        self.geocode_many(addresses)
+        transport = dict(zip(housing_addresses, self.analyze_transport_many(housing_addresses)))
+
         # 显示重点推荐
         for i, project in enumerate(key_projects, 1):
             medal = "🥇" if i == 1 else "🥈" if i == 2 else "🥉"
@@ -255,7 +238,8 @@ class HousingMatcher:
             print(f"- 批次编号：{project['batch']}")
 
             # 交通分析
-            self.analyze_transport(project['location'], project['name'])
+            if project['location'] != '待公布':
+                self.print_transport(transport[project['location']])
 
             # 申请条件
             print(f"\n📋 申请条件")
@@ -264,8 +248,11 @@ class HousingMatcher:
                 print(f"{status}")
 
             print(f"\n⏰ 重要时间")
-            print(f"- 申请时间：{project['apply_start']} 至 {project['apply_end']}")
-            print(f"- ⚠️ 距离截止仅剩 {(today - datetime.strptime(project['apply_end'].split(' ')[0], '%Y-%m-%d')).days * -1} 天！")
+            if project['apply_end']:
+                print(f"- 申请时间：{project['apply_start']} 至 {project['apply_end']}")
+                print(f"- ⚠️ 距离截止仅剩 {(today - datetime.strptime(project['apply_end'].split(' ')[0], '%Y-%m-%d')).days * -1} 天！")
+            else:
+                print(f"- 申请时间：详见公告")
 
             # 申请队列
             print(f"\n👥 申请队列")